@@ -1,3 +1,139 @@
+from django.conf import settings
 from django.contrib import admin
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
 
-# Register your models here.
+from api.models import Category, MenuItem, Cart, Order, OrderItem, Job, AuditEvent, WebhookEndpoint
+
+
+def estimate_row_count(model, using: str) -> int:
+    """Row count of the model table from planner statistics or primary key range, None when the backend has neither."""
+    connection = connections[using]
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass", [table])
+            row = cursor.fetchone()
+            # -1 until the table is vacuumed or analyzed
+            return row[0] if row and row[0] >= 0 else None
+
+        if connection.vendor == 'sqlite':
+            # First number of any index stat is the table row count, rows exist only after ANALYZE
+            cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'sqlite_stat1'")
+            if cursor.fetchone():
+                cursor.execute("SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1", [table])
+                row = cursor.fetchone()
+                if row:
+                    return int(row[0].split()[0])
+            # Min and max of the rowid are index lookups, deleted rows make it an overestimate
+            pk_column = connection.ops.quote_name(model._meta.pk.column)
+            cursor.execute(f"SELECT MAX({pk_column}) - MIN({pk_column}) + 1 FROM {connection.ops.quote_name(table)}")
+            return cursor.fetchone()[0] or 0
+    return None
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Changelist paginator of large tables that never counts more than `ADMIN_EXACT_COUNT_LIMIT` rows.
+
+    Unfiltered tables bigger than the limit report the estimated row count, filtered and
+    searched changelists count up to the limit, pages past it are not linked.
+    """
+    @cached_property
+    def count(self) -> int:
+        queryset = self.object_list
+        limit = settings.ADMIN_EXACT_COUNT_LIMIT
+        if not queryset.query.where:
+            estimate = estimate_row_count(model=queryset.model, using=queryset.db)
+            if estimate is not None and estimate > limit:
+                return estimate
+        return queryset[:limit].count()
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """Constant time changelist: no exact counts and no `SELECT COUNT(*)` for the "show all" total."""
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    list_per_page = 50
+
+
+@admin.register(Category)
+class CategoryAdmin(admin.ModelAdmin):
+    list_display = ('id', 'title', 'slug')
+    search_fields = ('title', 'slug')
+    prepopulated_fields = {'slug': ('title',)}
+
+
+@admin.register(MenuItem)
+class MenuItemAdmin(admin.ModelAdmin):
+    list_display = ('id', 'title', 'price', 'featured', 'category', 'stock', 'popularity', 'popularity_7d')
+    list_select_related = ('category',)
+    list_filter = ('featured', 'category')
+    search_fields = ('title',)
+    readonly_fields = ('popularity', 'popularity_7d')
+
+
+@admin.register(Cart)
+class CartAdmin(LargeTableAdmin):
+    list_display = ('id', 'user', 'menuitem', 'quantity', 'unit_price', 'price')
+    list_select_related = ('user', 'menuitem')
+    raw_id_fields = ('user',)
+    autocomplete_fields = ('menuitem',)
+
+
+class OrderItemInline(admin.TabularInline):
+    """Order lines as they were checked out, editing them would break the order total and summary columns."""
+    model = OrderItem
+    fields = ('menuitem', 'quantity', 'unit_price', 'price')
+    readonly_fields = fields
+    extra = 0
+    max_num = 0
+    can_delete = False
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('menuitem')
+
+
+@admin.register(Order)
+class OrderAdmin(LargeTableAdmin):
+    list_display = ('id', 'user', 'delivery_crew', 'status', 'total', 'date', 'item_count', 'items_preview')
+    list_select_related = ('user', 'delivery_crew')
+    list_filter = ('status',)
+    date_hierarchy = 'date'
+    raw_id_fields = ('user', 'delivery_crew')
+    readonly_fields = ('version', 'item_count', 'items_preview')
+    inlines = (OrderItemInline,)
+
+
+@admin.register(OrderItem)
+class OrderItemAdmin(LargeTableAdmin):
+    list_display = ('id', 'order', 'menuitem', 'quantity', 'unit_price', 'price')
+    list_select_related = ('order', 'menuitem')
+    raw_id_fields = ('order',)
+    autocomplete_fields = ('menuitem',)
+
+
+@admin.register(Job)
+class JobAdmin(LargeTableAdmin):
+    list_display = ('id', 'name', 'status', 'run_at', 'attempts', 'max_attempts', 'locked_by', 'finished_at')
+    list_filter = ('status', 'name')
+    readonly_fields = ('attempts', 'locked_by', 'locked_until', 'unique_key', 'last_error', 'created_at', 'finished_at')
+
+
+@admin.register(AuditEvent)
+class AuditEventAdmin(LargeTableAdmin):
+    list_display = ('id', 'created_at', 'actor', 'action', 'entity', 'entity_id')
+    list_select_related = ('actor',)
+    list_filter = ('action', 'entity')
+    date_hierarchy = 'created_at'
+    raw_id_fields = ('actor',)
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(WebhookEndpoint)
+class WebhookEndpointAdmin(admin.ModelAdmin):
+    list_display = ('name', 'url', 'is_active', 'last_event_id', 'failures', 'next_attempt_at')
+    readonly_fields = ('failures', 'next_attempt_at', 'last_error')
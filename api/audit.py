@@ -0,0 +1,121 @@
+"""
+Audit log of manager actions, written off the request path.
+
+`record_audit_event()` appends the field values of an `AuditEvent` to a per-process buffer when
+the request transaction commits. A flusher thread writes the buffer with one `insert_rows()`
+every `AUDIT_FLUSH_INTERVAL` seconds, or as soon as `AUDIT_BUFFER_SIZE` events are waiting,
+and the rest is flushed at interpreter exit. Events of a failed flush are put back and
+retried with the next one, at most `AUDIT_MAX_BUFFERED` events are kept, the oldest are dropped.
+"""
+import atexit
+import logging
+import os
+import threading
+
+from django.conf import settings
+from django.db import DatabaseError, close_old_connections, transaction
+from django.utils import timezone
+
+from api.db import insert_rows
+from api.models import AuditEvent
+
+
+logger = logging.getLogger(__name__)
+
+
+class AuditBuffer:
+    def __init__(self) -> None:
+        self.reset()
+
+    def reset(self) -> None:
+        # Also runs in a forked child, locks held by parent threads and the flusher thread are not inherited
+        self.lock = threading.Lock()
+        self.flush_lock = threading.Lock()
+        self.flush_requested = threading.Event()
+        self.events = []
+        self.flusher = None
+
+    def ensure_flusher(self) -> None:
+        if self.flusher is not None:
+            return
+        with self.lock:
+            if self.flusher is None:
+                self.flusher = threading.Thread(target=self.run_flusher, name='audit-flusher', daemon=True)
+                self.flusher.start()
+
+    def add(self, events: list) -> None:
+        self.ensure_flusher()
+        with self.lock:
+            self.events.extend(events)
+            is_full = len(self.events) >= settings.AUDIT_BUFFER_SIZE
+        if is_full:
+            self.flush_requested.set()
+
+    def flush(self) -> int:
+        """Write buffered events, returns the number written."""
+        with self.flush_lock:
+            with self.lock:
+                events, self.events = self.events, []
+            if not events:
+                return 0
+            try:
+                insert_rows(AuditEvent, events)
+            except DatabaseError:
+                logger.exception("Audit log flush of %s events failed, retrying with the next flush.", len(events))
+                with self.lock:
+                    self.events = (events + self.events)[-settings.AUDIT_MAX_BUFFERED:]
+                return 0
+            return len(events)
+
+    def run_flusher(self) -> None:
+        while True:
+            self.flush_requested.wait(settings.AUDIT_FLUSH_INTERVAL)
+            self.flush_requested.clear()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Audit log flush failed.")
+            finally:
+                close_old_connections()
+
+
+audit_buffer = AuditBuffer()
+atexit.register(audit_buffer.flush)
+os.register_at_fork(after_in_child=audit_buffer.reset)
+
+
+def record_audit_event(actor, action: str, entity: str, entity_id: int = None, changes: dict = None) -> None:
+    """Buffer an audit event, it is dropped when the current transaction rolls back."""
+    record_audit_events(actor=actor, action=action, entity=entity, changes_by_entity_id={entity_id: changes})
+
+
+def record_audit_events(actor, action: str, entity: str, changes_by_entity_id: dict) -> None:
+    """Buffer events of one action on many entities {entity_id: changes} with a single commit callback."""
+    created_at = timezone.now()
+    actor_id = getattr(actor, 'id', None)
+    events = [
+        {
+            'actor_id': actor_id,
+            'action': action,
+            'entity': entity,
+            'entity_id': entity_id,
+            'changes': changes or {},
+            'created_at': created_at,
+        }
+        for entity_id, changes in changes_by_entity_id.items()
+    ]
+    transaction.on_commit(lambda: audit_buffer.add(events))
+
+
+def get_field_changes(instance, new_values: dict) -> dict:
+    """{field: [old, new]} of fields whose value differs from `instance`."""
+    changes = {}
+    for field_name, new_value in new_values.items():
+        old_value = getattr(instance, field_name, None)
+        if hasattr(old_value, 'pk'):
+            old_value = old_value.pk
+        if hasattr(new_value, 'pk'):
+            new_value = new_value.pk
+        if old_value != new_value:
+            changes[field_name] = [old_value, new_value]
+    return changes
@@ -0,0 +1,60 @@
+"""
+Cart lines expire `CART_TTL_DAYS` after they were last added or changed (`Cart.updated_at`).
+
+Expired lines are invisible right away, every cart read goes through `get_active_cart_lines()`,
+and are deleted later in small batches by `evict_expired_cart_lines()` (the `evict_expired_carts`
+job and `manage.py evict_expired_carts`), so correctness does not depend on the sweeper.
+"""
+import datetime
+import time
+
+from django.conf import settings
+from django.utils import timezone
+
+from api.models import Cart
+
+
+class CartChanged(Exception):
+    """Cart lines read for checkout were deleted meanwhile, e.g. by a concurrent checkout, the transaction should be rolled back."""
+
+
+def get_cart_expiry_cutoff() -> datetime.datetime:
+    """Lines last touched at or before this moment are expired."""
+    return timezone.now() - datetime.timedelta(days=settings.CART_TTL_DAYS)
+
+
+def get_active_cart_lines(user):
+    return Cart.objects.filter(user=user, updated_at__gt=get_cart_expiry_cutoff())
+
+
+def delete_expired_cart_line(user, menu_item_id: int) -> int:
+    """Expired line of the same menu item would make adding it again fail on `unique_together`."""
+    deleted, _ = Cart.objects.filter(user=user, menuitem_id=menu_item_id, updated_at__lte=get_cart_expiry_cutoff()).delete()
+    return deleted
+
+
+def evict_expired_cart_lines(batch_size: int, max_batches: int = None, progress=None) -> int:
+    """
+    Delete expired lines oldest first, `batch_size` ids per `DELETE` with `CART_EVICTION_PAUSE` seconds
+    between batches so checkout writes are not blocked. Returns deleted count.
+    """
+    cutoff = get_cart_expiry_cutoff()
+    expired = Cart.objects.filter(updated_at__lte=cutoff)
+    deleted = 0
+    batches = 0
+
+    while max_batches is None or batches < max_batches:
+        cart_ids = list(expired.order_by('updated_at').values_list('id', flat=True)[:batch_size])
+        if not cart_ids:
+            break
+
+        # A line touched since it was selected is kept
+        batch_deleted, _ = expired.filter(id__in=cart_ids).delete()
+        deleted += batch_deleted
+        batches += 1
+        if progress:
+            progress(batches, deleted)
+        if len(cart_ids) < batch_size:
+            break
+        time.sleep(settings.CART_EVICTION_PAUSE)
+    return deleted
@@ -0,0 +1,89 @@
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from api.models import Category, MenuItem, CatalogChange, CatalogSyncState
+
+
+def record_catalog_changes(entity: str, object_ids, action: str) -> None:
+    """Move changed rows to the head of the change feed, older entries of the same rows are dropped."""
+    object_ids = list(object_ids)
+    if not object_ids:
+        return
+    
+    with transaction.atomic():
+        CatalogChange.objects.filter(entity=entity, object_id__in=object_ids).delete()
+        CatalogChange.objects.bulk_create(
+            CatalogChange(entity=entity, object_id=object_id, action=action) for object_id in object_ids
+        )
+
+
+def get_purged_seq() -> int:
+    state = CatalogSyncState.objects.filter(pk=1).first()
+    return state.purged_seq if state else 0
+
+
+def get_latest_seq() -> int:
+    return CatalogChange.objects.aggregate(seq=Max('id'))['seq'] or 0
+
+
+def get_catalog_changes(since: int, limit: int, full_sync: bool = False) -> dict:
+    """
+    Changed rows and tombstones after `since` sequence, full catalog when tombstones were compacted since then.
+
+    Pages of a full sync can end below the compacted sequence, the client continues them with
+    `full_sync=True` until `has_more` is false, and then drops the rows it was not sent.
+    """
+    purged_seq = get_purged_seq()
+    if since < purged_seq and not full_sync:
+        full_sync, since = True, 0
+    
+    changes = list(
+        CatalogChange.objects.filter(id__gt=since).order_by('id').values_list('id', 'entity', 'object_id', 'action')[:limit + 1]
+    )
+    has_more = len(changes) > limit
+    changes = changes[:limit]
+    
+    upserts = {CatalogChange.ENTITY_CATEGORY: [], CatalogChange.ENTITY_MENU_ITEM: []}
+    deletes = {CatalogChange.ENTITY_CATEGORY: [], CatalogChange.ENTITY_MENU_ITEM: []}
+    for _, entity, object_id, action in changes:
+        (upserts if action == CatalogChange.ACTION_UPSERT else deletes)[entity].append(object_id)
+    
+    seq = changes[-1][0] if changes else since
+    if full_sync and not has_more:
+        # Every row left below the compacted sequence was sent
+        seq = max(seq, purged_seq)
+    
+    categories = Category.objects.filter(id__in=upserts[CatalogChange.ENTITY_CATEGORY]).order_by('id')
+    menu_items = MenuItem.objects.select_related('category').filter(id__in=upserts[CatalogChange.ENTITY_MENU_ITEM]).order_by('id')
+    
+    return {
+        # Not the latest seq, a change committed after the query above would be skipped
+        'seq': seq,
+        'has_more': has_more,
+        'full_sync': full_sync,
+        'categories': categories,
+        'menu_items': menu_items,
+        'deleted': {
+            'categories': deletes[CatalogChange.ENTITY_CATEGORY],
+            'menu_items': deletes[CatalogChange.ENTITY_MENU_ITEM],
+        },
+    }
+
+
+def compact_catalog_changes(tombstone_age: timezone.timedelta) -> int:
+    """Delete tombstones older than `tombstone_age`, clients behind them are sent a full sync. Returns deleted count."""
+    cutoff = timezone.now() - tombstone_age
+    tombstones = CatalogChange.objects.filter(action=CatalogChange.ACTION_DELETE, created_at__lt=cutoff)
+    
+    with transaction.atomic():
+        purged_seq = tombstones.aggregate(seq=Max('id'))['seq']
+        if purged_seq is None:
+            return 0
+        
+        deleted, _ = tombstones.filter(id__lte=purged_seq).delete()
+        state, _ = CatalogSyncState.objects.get_or_create(pk=1)
+        if purged_seq > state.purged_seq:
+            state.purged_seq = purged_seq
+            state.save(update_fields=['purged_seq'])
+    return deleted
@@ -0,0 +1,183 @@
+"""
+Catalog snapshot: all categories and menu items pre-rendered to JSON in one memory-mapped file.
+
+`build_catalog_snapshot()` renders every row once with the API serializers and JSON encoder
+and writes one view per list: all categories, all menu items and the menu items of every
+category slug. A view is its rows joined with commas plus an offset index of the rows, so
+any page is a single slice of the file, and the whole list is also stored gzip-compressed.
+
+The file is written next to the live one and moved over it with `os.replace()`. Workers map
+the file and check its inode on every read, a new snapshot is mapped on the first read after
+the swap while requests that still hold the old mapping finish with it, readers never wait
+for the builder. A snapshot older than `CATALOG_SNAPSHOT_MAX_AGE` is not served, lists fall
+back to the database when `manage.py build_catalog_snapshot --loop` is not running.
+
+Layout: 8 bytes magic, 8 bytes header length, JSON header, then 8-byte aligned index, data
+and gzip sections of every view.
+"""
+import array
+import gzip
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+
+from django.conf import settings
+
+from api.catalog import get_latest_seq
+from api.models import Category, MenuItem
+from api.renderers import dumps
+from api.serializers import CategorySerializer, MenuItemSerializer
+
+
+MAGIC = b'LLCSNAP1'
+HEADER_LENGTH = struct.Struct('<Q')
+
+
+def menu_items_view_name(category_slug: str) -> str:
+    return f"menuitem:{category_slug.lower()}"
+
+
+def render_rows(items, serializer_class) -> list:
+    return [dumps(row) for row in serializer_class(items, many=True).data]
+
+
+def get_snapshot_views() -> dict:
+    """{view name: rendered rows}, querysets are the ones of the unfiltered list endpoints to keep their row order."""
+    menu_items = MenuItem.objects.select_related('category')
+    views = {
+        Category._meta.model_name: render_rows(Category.objects.all(), CategorySerializer),
+        MenuItem._meta.model_name: render_rows(menu_items, MenuItemSerializer),
+    }
+    for slug in {slug.lower() for slug in Category.objects.values_list('slug', flat=True)}:
+        views[menu_items_view_name(slug)] = render_rows(menu_items.filter(category__slug__iexact=slug), MenuItemSerializer)
+    return views
+
+
+def pad(length: int) -> bytes:
+    return b'\0' * (-length % 8)
+
+
+def build_catalog_snapshot(path=None) -> dict:
+    """Render the catalog and atomically replace the snapshot file. Returns the snapshot header."""
+    path = str(path or settings.CATALOG_SNAPSHOT_PATH)
+    # Sequence is read first, a change during rendering makes the next build run again
+    seq = get_latest_seq()
+    views = get_snapshot_views()
+
+    sections = []
+    header = {'seq': seq, 'built_at': time.time(), 'views': {}}
+    offset = 0
+    for name, rows in views.items():
+        data = b','.join(rows)
+        # Row i is data[index[i]:index[i + 1] - 1], the last entry points past an implied trailing comma
+        index = array.array('Q', [0])
+        for row in rows:
+            index.append(index[-1] + len(row) + 1)
+        compressed = gzip.compress(b'[' + data + b']', compresslevel=settings.RESPONSE_COMPRESSION_GZIP_LEVEL, mtime=0)
+
+        view = {'count': len(rows)}
+        for section_name, content in (('index', index.tobytes()), ('data', data), ('gzip', compressed)):
+            view[section_name] = [offset, offset + len(content)]
+            sections.extend((content, pad(len(content))))
+            offset += len(content) + len(pad(len(content)))
+        header['views'][name] = view
+
+    # Section offsets in the header are relative to the end of the padded header
+    header_bytes = json.dumps(header, separators=(',', ':')).encode()
+    header_bytes += pad(len(MAGIC) + HEADER_LENGTH.size + len(header_bytes))
+
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    temporary_path = f"{path}.{os.getpid()}.tmp"
+    with open(temporary_path, 'wb') as file:
+        file.write(MAGIC)
+        file.write(HEADER_LENGTH.pack(len(header_bytes)))
+        file.write(header_bytes)
+        for content in sections:
+            file.write(content)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temporary_path, path)
+    return header
+
+
+class CatalogSnapshot:
+    """Read-only mapping of one snapshot file, it stays valid after the file is replaced."""
+    def __init__(self, path: str) -> None:
+        with open(path, 'rb') as file:
+            self.stat = os.fstat(file.fileno())
+            self.buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if self.buffer[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path} is not a catalog snapshot")
+        (header_length,) = HEADER_LENGTH.unpack_from(self.buffer, len(MAGIC))
+        start = len(MAGIC) + HEADER_LENGTH.size
+        header = json.loads(self.buffer[start:start + header_length].rstrip(b'\0'))
+        base = start + header_length
+
+        self.seq = header['seq']
+        self.built_at = header['built_at']
+        self.views = header['views']
+        for view in self.views.values():
+            for section_name in ('index', 'data', 'gzip'):
+                view[section_name] = [base + position for position in view[section_name]]
+        self.indexes = {
+            name: memoryview(self.buffer)[view['index'][0]:view['index'][1]].cast('Q')
+            for name, view in self.views.items()
+        }
+
+    def get_page(self, name: str, page: int, perpage: int) -> bytes:
+        """JSON array of rows on the page, same pages as `django.core.paginator.Paginator`, unknown view is empty."""
+        view = self.views.get(name)
+        if view is None:
+            return b'[]'
+
+        first = (page - 1) * perpage
+        if first >= view['count']:
+            return b'[]'
+        last = min(first + perpage, view['count'])
+        index = self.indexes[name]
+        data_start = view['data'][0]
+        return b'[' + self.buffer[data_start + index[first]:data_start + index[last] - 1] + b']'
+
+    def get_compressed(self, name: str) -> bytes:
+        """Whole view as gzip-compressed JSON array, None for an unknown view."""
+        view = self.views.get(name)
+        if view is None:
+            return None
+        return self.buffer[view['gzip'][0]:view['gzip'][1]]
+
+    def get_count(self, name: str) -> int:
+        view = self.views.get(name)
+        return view['count'] if view else 0
+
+
+_snapshot = None
+_snapshot_lock = threading.Lock()
+
+
+def get_catalog_snapshot() -> CatalogSnapshot:
+    """Current snapshot of this process, None when there is no file or it is older than `CATALOG_SNAPSHOT_MAX_AGE`."""
+    global _snapshot
+    try:
+        stat = os.stat(settings.CATALOG_SNAPSHOT_PATH)
+    except FileNotFoundError:
+        return None
+
+    snapshot = _snapshot
+    if snapshot is None or (snapshot.stat.st_ino, snapshot.stat.st_mtime_ns) != (stat.st_ino, stat.st_mtime_ns):
+        with _snapshot_lock:
+            snapshot = _snapshot
+            if snapshot is None or (snapshot.stat.st_ino, snapshot.stat.st_mtime_ns) != (stat.st_ino, stat.st_mtime_ns):
+                try:
+                    snapshot = _snapshot = CatalogSnapshot(settings.CATALOG_SNAPSHOT_PATH)
+                except (FileNotFoundError, ValueError):
+                    return None
+
+    if time.time() - snapshot.built_at > settings.CATALOG_SNAPSHOT_MAX_AGE:
+        return None
+    return snapshot
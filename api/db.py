@@ -0,0 +1,36 @@
+"""Database helpers of write paths that insert thousands of rows at once."""
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+
+def insert_rows(model, rows: list) -> None:
+    """
+    Insert rows [{field attname: value}, ...] of `model` with one `executemany()`, all rows have the same keys.
+
+    Values are prepared by the model fields like `bulk_create()` does, but all of them before the
+    statement runs, so the write lock is held only while the database inserts. Defaults, `auto_now_add`
+    and signals are not applied and primary keys are not set on anything.
+    """
+    if not rows:
+        return
+
+    connection = connections[DEFAULT_DB_ALIAS]
+    fields = [model._meta.get_field(name) for name in rows[0]]
+    # Values shared by all rows, like a timestamp or an event type, are prepared once
+    prepared = {}
+
+    def prepare(field, value):
+        try:
+            return prepared[field, value]
+        except KeyError:
+            prepared[field, value] = field.get_db_prep_save(value, connection)
+            return prepared[field, value]
+        except TypeError:  # unhashable, e.g. JSON objects
+            return field.get_db_prep_save(value, connection)
+
+    params = [[prepare(field, row[field.attname]) for field in fields] for row in rows]
+
+    quote_name = connection.ops.quote_name
+    columns = ', '.join(quote_name(field.column) for field in fields)
+    placeholders = ', '.join(['%s'] * len(fields))
+    with transaction.atomic(savepoint=False), connection.cursor() as cursor:
+        cursor.executemany(f"INSERT INTO {quote_name(model._meta.db_table)} ({columns}) VALUES ({placeholders})", params)
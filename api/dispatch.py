@@ -0,0 +1,130 @@
+import heapq
+from collections import defaultdict
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import Count
+
+from api.models import Order
+from api.orders import record_delivery_assignments, update_orders_fields
+from api.webhooks import ORDER_PAYLOAD_COLUMNS
+
+
+class DeliveryDispatcher:
+    """
+    Assign unassigned orders to delivery crew members with the least outstanding (undelivered) orders.
+
+    Courier load is kept in a min-heap of (load, courier_id) between cycles. Heap entries are not
+    updated in place, a popped entry whose load differs from `self.loads` is stale and skipped.
+    Loads are reloaded from the database every `refresh_every` cycles to account for delivered
+    and manually assigned orders, in between only couriers added or removed from the group are synced.
+    """
+    def __init__(self, batch_size: int, refresh_every: int) -> None:
+        self.batch_size = batch_size
+        self.refresh_every = refresh_every
+        self.loads = {}
+        self.heap = []
+        self.cycles = 0
+
+    @staticmethod
+    def get_courier_ids() -> set:
+        return set(
+            User.objects.filter(groups__name=settings.DELIVERY_CREW_GROUP_NAME, is_active=True).values_list('id', flat=True)
+        )
+
+    @staticmethod
+    def get_loads(courier_ids) -> dict:
+        """Outstanding orders per courier in one aggregate query."""
+        loads = dict(
+            Order.objects.filter(delivery_crew__in=courier_ids, status=False)
+            .values_list('delivery_crew').annotate(load=Count('id')).order_by()
+        )
+        return {courier_id: loads.get(courier_id, 0) for courier_id in courier_ids}
+
+    def refresh(self) -> None:
+        """Reload all couriers loads."""
+        self.loads = self.get_loads(self.get_courier_ids())
+        self.heap = [(load, courier_id) for courier_id, load in self.loads.items()]
+        heapq.heapify(self.heap)
+
+    def sync_couriers(self) -> None:
+        """Pick up couriers added to or removed from the delivery crew group since the last cycle."""
+        courier_ids = self.get_courier_ids()
+        for courier_id in set(self.loads) - courier_ids:
+            del self.loads[courier_id]  # its heap entries become stale
+
+        added_loads = self.get_loads(courier_ids - set(self.loads))
+        for courier_id, load in added_loads.items():
+            self.loads[courier_id] = load
+            heapq.heappush(self.heap, (load, courier_id))
+
+    def set_load(self, courier_id: int, load: int) -> None:
+        self.loads[courier_id] = load
+        heapq.heappush(self.heap, (load, courier_id))
+
+    def pop_least_loaded(self) -> tuple:
+        while self.heap:
+            load, courier_id = heapq.heappop(self.heap)
+            if self.loads.get(courier_id) == load:
+                return load, courier_id
+        return None, None
+
+    def assign(self, order_ids: list) -> dict:
+        """Balance orders over couriers in memory, returns {courier_id: [order_id, ...]}"""
+        assignments = defaultdict(list)
+        for order_id in order_ids:
+            load, courier_id = self.pop_least_loaded()
+            if courier_id is None:
+                break
+            assignments[courier_id].append(order_id)
+            self.set_load(courier_id, load + 1)
+        return assignments
+
+    def dispatch(self) -> int:
+        """Run a single dispatch cycle, returns number of assigned orders."""
+        if self.cycles % self.refresh_every == 0:
+            self.refresh()
+        else:
+            self.sync_couriers()
+        self.cycles += 1
+
+        # Rows instead of model instances, they are only read for the events payloads
+        pending_orders = {
+            order.id: order
+            for order in Order.objects.filter(delivery_crew__isnull=True, status=False).order_by('date', 'id')
+            .values_list(*ORDER_PAYLOAD_COLUMNS, named=True)[:self.batch_size]
+        }
+        if not pending_orders:
+            return 0
+
+        assignments = self.assign(list(pending_orders))
+        try:
+            assigned_orders = self.save_assignments(assignments, pending_orders)
+        except Exception:
+            # Loads already count the rolled back assignments, reload them with the next cycle
+            self.cycles = 0
+            raise
+        return len(assigned_orders)
+
+    def save_assignments(self, assignments: dict, pending_orders: dict) -> list:
+        """Update assigned orders and record their events in one transaction, returns the orders actually assigned."""
+        assigned_orders = []
+        with transaction.atomic():
+            for courier_id, order_ids in assignments.items():
+                # Orders changed by a manager in the meantime have a newer version and are kept as they are
+                conflicts = update_orders_fields(
+                    versions={order_id: pending_orders[order_id].version for order_id in order_ids},
+                    chunk_size=settings.DELIVERY_DISPATCH_UPDATE_CHUNK, delivery_crew_id=courier_id,
+                )
+                if conflicts:
+                    self.set_load(courier_id, self.loads[courier_id] - len(conflicts))
+                # An order updated at the version it was read with is that row plus our change, no need to read it again
+                assigned_orders.extend(
+                    pending_orders[order_id]._replace(delivery_crew_id=courier_id, version=pending_orders[order_id].version + 1)
+                    for order_id in order_ids if order_id not in conflicts
+                )
+
+            # Same outbox, audit and SSE events as a manual assignment, only for orders actually assigned
+            record_delivery_assignments(actor=None, orders=assigned_orders, previous_delivery_crew_ids={})
+        return assigned_orders
@@ -0,0 +1,217 @@
+"""
+In-process pub/sub of order events for the `orders/events` Server-Sent Events stream.
+
+Every streaming connection subscribes an asyncio queue to its user channel (`user:<id>`).
+Events are published from sync views after the transaction commits and handed to the
+subscribers' event loops thread safely. A connection waiting on an empty queue is just a
+suspended coroutine, so idle connections cost no threads and no DB queries.
+
+Events published in one process reach subscribers of other worker processes
+through the fan-out backend from `ORDER_EVENTS_FANOUT` setting.
+"""
+import asyncio
+import datetime
+import logging
+import os
+import socket
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import Max
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from api.models import OrderEventListener, OrderEventMessage
+
+
+logger = logging.getLogger(__name__)
+
+
+def user_channel(user_id: int) -> str:
+    return f"user:{user_id}"
+
+
+class BaseFanout:
+    """
+    Cross-process fan-out backend, default one keeps events inside the process.
+
+    Implementations send events published here to other processes with `publish()` and call
+    `deliver(channel, event)` (broker `publish_local`) for events received from them, `start()`
+    is called once with that callback before the first subscription.
+    """
+    def start(self, deliver) -> None:
+        pass
+
+    def publish(self, channel: str, event: dict) -> None:
+        pass
+
+    def publish_many(self, messages: list) -> None:
+        """Messages [(channel, event), ...] published together, backends can send them at once."""
+        for channel, event in messages:
+            self.publish(channel, event)
+
+
+class DatabaseFanout(BaseFanout):
+    """
+    Fan-out through the `OrderEventMessage` table, reaches every process using the same database.
+
+    Events published together are inserted as one row per channel with the id of the publishing
+    process. Every process with SSE subscribers polls rows after its cursor every
+    `ORDER_EVENTS_FANOUT_POLL_INTERVAL` seconds in a daemon thread and delivers those of other
+    processes, e.g. of `manage.py dispatch_orders`.
+
+    Polling processes keep an `OrderEventListener` row fresh, publishers skip the insert while
+    no other process has one newer than `ORDER_EVENTS_FANOUT_LISTENER_TIMEOUT`, the check is
+    cached for a poll interval. Old rows are deleted by the `purge_order_event_messages` job.
+    """
+    def __init__(self) -> None:
+        self.cursor = None
+        self.heartbeat_at = None
+        self.listeners_checked_at = None
+        self.has_listeners = False
+
+    def start(self, deliver) -> None:
+        # Called from the event loop of the first subscription, queries run in the poller thread
+        threading.Thread(target=self.run_poller, args=(deliver,), name='order-events-fanout', daemon=True).start()
+
+    def publish(self, channel: str, event: dict) -> None:
+        self.publish_many([(channel, event)])
+
+    def is_listened(self) -> bool:
+        """Some other process polls the messages."""
+        now = time.monotonic()
+        if self.listeners_checked_at is None or now - self.listeners_checked_at >= settings.ORDER_EVENTS_FANOUT_POLL_INTERVAL:
+            seen_after = timezone.now() - datetime.timedelta(seconds=settings.ORDER_EVENTS_FANOUT_LISTENER_TIMEOUT)
+            self.has_listeners = (
+                OrderEventListener.objects.filter(seen_at__gt=seen_after).exclude(origin=get_process_id()).exists()
+            )
+            self.listeners_checked_at = now
+        return self.has_listeners
+
+    def publish_many(self, messages: list) -> None:
+        if not self.is_listened():
+            return
+
+        events_by_channel = defaultdict(list)
+        for channel, event in messages:
+            events_by_channel[channel].append(event)
+        origin = get_process_id()
+        OrderEventMessage.objects.bulk_create(
+            OrderEventMessage(origin=origin, channel=channel, events=events) for channel, events in events_by_channel.items()
+        )
+
+    def heartbeat(self) -> None:
+        now = time.monotonic()
+        if self.heartbeat_at is None or now - self.heartbeat_at >= settings.ORDER_EVENTS_FANOUT_HEARTBEAT_INTERVAL:
+            OrderEventListener.objects.update_or_create(origin=get_process_id(), defaults={'seen_at': timezone.now()})
+            self.heartbeat_at = now
+
+    def poll(self, deliver) -> int:
+        # Announced before the cursor is set, publishers write every message after it
+        self.heartbeat()
+        if self.cursor is None:
+            self.cursor = OrderEventMessage.objects.aggregate(id=Max('id'))['id'] or 0
+        origin = get_process_id()
+        messages = list(
+            OrderEventMessage.objects.filter(id__gt=self.cursor).order_by('id')
+            .values_list('id', 'origin', 'channel', 'events')[:settings.ORDER_EVENTS_FANOUT_BATCH_SIZE]
+        )
+        for message_id, message_origin, channel, events in messages:
+            self.cursor = message_id
+            # Events of this process were delivered locally when they were published
+            if message_origin != origin:
+                for event in events:
+                    deliver(channel, event)
+        return len(messages)
+
+    def run_poller(self, deliver) -> None:
+        while True:
+            try:
+                if self.poll(deliver) == settings.ORDER_EVENTS_FANOUT_BATCH_SIZE:
+                    continue
+            except Exception:
+                logger.exception("Order events fan-out poll failed.")
+            finally:
+                close_old_connections()
+            time.sleep(settings.ORDER_EVENTS_FANOUT_POLL_INTERVAL)
+
+
+def purge_order_event_messages(age: datetime.timedelta) -> int:
+    """Delete fan-out messages and listeners of stopped processes older than `age`. Returns deleted messages count."""
+    deleted, _ = OrderEventMessage.objects.filter(created_at__lt=timezone.now() - age).delete()
+    OrderEventListener.objects.filter(seen_at__lt=timezone.now() - age).delete()
+    return deleted
+
+
+def get_process_id() -> str:
+    # Read on every call, workers forked from a preloaded app have their own pid
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class OrderEventBroker:
+    def __init__(self, fanout: BaseFanout) -> None:
+        self.fanout = fanout
+        self._lock = threading.Lock()
+        self._subscribers = defaultdict(set)
+        self._started = False
+
+    def subscribe(self, channel: str) -> asyncio.Queue:
+        """Subscribe a queue of the running event loop to channel."""
+        if not self._started:
+            self.fanout.start(self.publish_local)
+            self._started = True
+
+        queue = asyncio.Queue(maxsize=settings.ORDER_EVENTS_QUEUE_SIZE)
+        with self._lock:
+            self._subscribers[channel].add((asyncio.get_running_loop(), queue))
+        return queue
+
+    def unsubscribe(self, channel: str, queue: asyncio.Queue) -> None:
+        with self._lock:
+            subscribers = self._subscribers.get(channel, set())
+            subscribers.difference_update({subscriber for subscriber in subscribers if subscriber[1] is queue})
+            if not subscribers:
+                self._subscribers.pop(channel, None)
+
+    def publish_local(self, channel: str, event: dict) -> None:
+        """Deliver event to subscribers of this process, can be called from any thread."""
+        with self._lock:
+            subscribers = list(self._subscribers.get(channel, ()))
+
+        for loop, queue in subscribers:
+            loop.call_soon_threadsafe(self._put, queue, event)
+
+    @staticmethod
+    def _put(queue: asyncio.Queue, event: dict) -> None:
+        # Slow client that does not read its stream loses events instead of growing memory
+        if not queue.full():
+            queue.put_nowait(event)
+
+    def publish(self, channel: str, event: dict) -> None:
+        self.publish_local(channel, event)
+        self.fanout.publish(channel, event)
+
+    def publish_many(self, messages: list) -> None:
+        for channel, event in messages:
+            self.publish_local(channel, event)
+        self.fanout.publish_many(messages)
+
+
+broker = OrderEventBroker(fanout=import_string(settings.ORDER_EVENTS_FANOUT)())
+
+
+def publish_order_events(events: list) -> None:
+    """Publish events [(user_ids, event_type, order), ...] to users channels once the current transaction commits."""
+    messages = []
+    for user_ids, event_type, order in events:
+        event = {"type": event_type, "order": order}
+        messages.extend((user_channel(user_id), event) for user_id in set(user_ids) if user_id is not None)
+    if messages:
+        transaction.on_commit(lambda: broker.publish_many(messages))
+
+
+def publish_order_event(user_ids, event_type: str, order: dict) -> None:
+    publish_order_events([(user_ids, event_type, order)])
@@ -0,0 +1,303 @@
+"""
+Background jobs stored in the `Job` table and run by `manage.py runworker`.
+
+Jobs are plain functions registered by name with `@job` (see api.tasks) and called with the
+JSON `kwargs` of their row. `enqueue()` inserts a row, inside a request transaction the job
+becomes visible to workers only when the request commits.
+
+A worker claims due jobs with a conditional `UPDATE` (status, lease), so a job is run by one
+worker at a time. While it runs, the worker extends the lease every poll, a job of a crashed
+worker is claimed again when the lease passes. A failed job is retried after
+`JOBS_RETRY_BACKOFF * 2 ** (attempt - 1)` seconds (capped by `JOBS_RETRY_BACKOFF_MAX`) until
+it has run `max_attempts` times.
+
+Every worker also enqueues the periodic jobs of `JOBS_SCHEDULE` (cron expressions in
+`TIME_ZONE`), each slot has a unique key, so it runs at most once across all workers.
+"""
+import datetime
+import inspect
+import logging
+import os
+import random
+import socket
+import threading
+import traceback
+import uuid
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from django.utils.module_loading import autodiscover_modules
+
+from api.models import Job
+
+
+logger = logging.getLogger(__name__)
+
+JOBS = {}
+
+
+def job(name: str = None):
+    """Register a function as a job under `name`, the function name by default."""
+    def decorator(func):
+        JOBS[name or func.__name__] = func
+        return func
+    return decorator
+
+
+def get_job_function(name: str):
+    # Job modules are imported on first use, `api.tasks` of every installed app
+    if not JOBS:
+        autodiscover_modules('tasks')
+    return JOBS.get(name)
+
+
+def check_job_kwargs(name: str, kwargs: dict) -> None:
+    """Raises ValueError when the job function can't be called with `kwargs`, a bad call would fail on every attempt."""
+    try:
+        inspect.signature(get_job_function(name)).bind(**kwargs)
+    except TypeError as e:
+        raise ValueError(f"Invalid arguments of job {name!r}: {e}.")
+
+
+def enqueue(name: str, kwargs: dict = None, run_at: datetime.datetime = None, max_attempts: int = None, unique_key: str = None) -> Job:
+    """Add a job to the queue, ValueError for an unknown job name or arguments it does not take."""
+    if get_job_function(name) is None:
+        raise ValueError(f"Unknown job {name!r}. Available jobs: {', '.join(sorted(JOBS))}.")
+    check_job_kwargs(name, kwargs or {})
+    return Job.objects.create(
+        name=name,
+        kwargs=kwargs or {},
+        run_at=run_at or timezone.now(),
+        max_attempts=max_attempts or settings.JOBS_MAX_ATTEMPTS,
+        unique_key=unique_key,
+    )
+
+
+def get_retry_delay(attempts: int) -> float:
+    """Exponential backoff with jitter, so jobs that failed together are not retried together."""
+    delay = min(settings.JOBS_RETRY_BACKOFF * 2 ** (attempts - 1), settings.JOBS_RETRY_BACKOFF_MAX)
+    return delay * random.uniform(0.8, 1.2)
+
+
+# Cron schedules
+def parse_cron_field(field: str, low: int, high: int) -> set:
+    """Values of one cron field: `*`, `5`, `1-5`, `*/15`, `0-30/10` and comma separated lists of them."""
+    values = set()
+    for part in field.split(','):
+        value_range, _, step = part.partition('/')
+        if value_range == '*':
+            start, end = low, high
+        elif '-' in value_range:
+            start, end = (int(value) for value in value_range.split('-', 1))
+        else:
+            start = end = int(value_range)
+        step = int(step) if step else 1
+        if start < low or end > high or start > end or step < 1:
+            raise ValueError(f"Invalid cron field {field!r}, values are {low}-{high}.")
+        values.update(range(start, end + 1, step))
+    return values
+
+
+class CronSchedule:
+    """Five field cron expression `minute hour day month weekday`, weekday 0 or 7 is Sunday."""
+    def __init__(self, expression: str) -> None:
+        fields = expression.split()
+        if len(fields) != 5:
+            raise ValueError(f"Cron expression {expression!r} must have 5 fields.")
+        self.expression = expression
+        self.minutes = parse_cron_field(fields[0], 0, 59)
+        self.hours = parse_cron_field(fields[1], 0, 23)
+        self.days = parse_cron_field(fields[2], 1, 31)
+        self.months = parse_cron_field(fields[3], 1, 12)
+        self.weekdays = {weekday % 7 for weekday in parse_cron_field(fields[4], 0, 7)}
+        self.any_day = fields[2] == '*'
+        self.any_weekday = fields[4] == '*'
+
+    def matches_day(self, moment: datetime.datetime) -> bool:
+        day_matches = moment.day in self.days
+        weekday_matches = (moment.weekday() + 1) % 7 in self.weekdays
+        # Like cron, restricted day and weekday match either of them
+        if not self.any_day and not self.any_weekday:
+            return day_matches or weekday_matches
+        return day_matches and weekday_matches
+
+    def next_after(self, moment: datetime.datetime) -> datetime.datetime:
+        """First matching minute after `moment`, ValueError if there is none within 5 years (e.g. `0 0 30 2 *`)."""
+        moment = moment.replace(second=0, microsecond=0) + datetime.timedelta(minutes=1)
+        last_year = moment.year + 5
+        while moment.year <= last_year:
+            if moment.month not in self.months:
+                moment = (moment.replace(day=1, hour=0, minute=0) + datetime.timedelta(days=32)).replace(day=1)
+            elif not self.matches_day(moment):
+                moment = moment.replace(hour=0, minute=0) + datetime.timedelta(days=1)
+            elif moment.hour not in self.hours:
+                moment = moment.replace(minute=0) + datetime.timedelta(hours=1)
+            elif moment.minute not in self.minutes:
+                moment += datetime.timedelta(minutes=1)
+            else:
+                return moment
+        raise ValueError(f"Cron expression {self.expression!r} never matches.")
+
+
+class Scheduler:
+    """Enqueues periodic jobs of `JOBS_SCHEDULE` when their slot comes, slots missed while no worker ran are skipped."""
+    def __init__(self, schedule: dict) -> None:
+        now = timezone.localtime()
+        self.entries = {}
+        for schedule_name, entry in schedule.items():
+            # A bad entry would fail every slot, the worker refuses to start instead
+            try:
+                if get_job_function(entry['job']) is None:
+                    raise ValueError(f"Unknown job {entry['job']!r}. Available jobs: {', '.join(sorted(JOBS))}.")
+                check_job_kwargs(entry['job'], entry.get('kwargs') or {})
+                cron = CronSchedule(entry['cron'])
+            except ValueError as e:
+                raise ValueError(f"Invalid JOBS_SCHEDULE entry {schedule_name!r}: {e}")
+            self.entries[schedule_name] = (entry, cron, cron.next_after(now))
+
+    def enqueue_due(self, now: datetime.datetime = None) -> list:
+        now = timezone.localtime(now)
+        enqueued = []
+        for schedule_name, (entry, cron, slot) in self.entries.items():
+            if slot > now:
+                continue
+            try:
+                with transaction.atomic():
+                    enqueued.append(enqueue(
+                        name=entry['job'], kwargs=entry.get('kwargs'), run_at=slot,
+                        unique_key=f"{schedule_name}:{slot.isoformat(timespec='minutes')}",
+                    ))
+            except IntegrityError:
+                # Another worker enqueued this slot
+                pass
+            self.entries[schedule_name] = (entry, cron, cron.next_after(max(slot, now)))
+        return enqueued
+
+
+# Queue
+def fail_expired_jobs() -> int:
+    """Jobs whose worker died on their last attempt are failed, they would never be claimed again."""
+    return Job.objects.filter(
+        status=Job.STATUS_RUNNING, locked_until__lt=timezone.now(), attempts__gte=F('max_attempts')
+    ).update(status=Job.STATUS_FAILED, last_error='Worker lost the job on its last attempt.', finished_at=timezone.now())
+
+
+def claim_jobs(worker_id: str, limit: int) -> list:
+    """Claim up to `limit` due jobs, queued or with an expired lease, for `worker_id`."""
+    now = timezone.now()
+    claimable = Job.objects.filter(
+        Q(status=Job.STATUS_QUEUED, run_at__lte=now) | Q(status=Job.STATUS_RUNNING, locked_until__lt=now),
+        attempts__lt=F('max_attempts'),
+    )
+    job_ids = list(claimable.order_by('run_at', 'id').values_list('id', flat=True)[:limit])
+    if not job_ids:
+        return []
+
+    # Conditions are checked again by the UPDATE, a job claimed by another worker meanwhile is skipped
+    claim_token = f"{worker_id}:{uuid.uuid4().hex[:8]}"
+    claimable.filter(id__in=job_ids).update(
+        status=Job.STATUS_RUNNING,
+        locked_by=claim_token,
+        locked_until=now + datetime.timedelta(seconds=settings.JOBS_LEASE),
+        attempts=F('attempts') + 1,
+    )
+    return list(Job.objects.filter(id__in=job_ids, locked_by=claim_token, status=Job.STATUS_RUNNING))
+
+
+def extend_leases(worker_id: str) -> int:
+    return Job.objects.filter(status=Job.STATUS_RUNNING, locked_by__startswith=f"{worker_id}:").update(
+        locked_until=timezone.now() + datetime.timedelta(seconds=settings.JOBS_LEASE)
+    )
+
+
+def purge_finished_jobs(age: datetime.timedelta) -> int:
+    """Delete done and failed jobs finished more than `age` ago. Returns deleted count."""
+    deleted, _ = Job.objects.filter(
+        status__in=[Job.STATUS_DONE, Job.STATUS_FAILED], finished_at__lt=timezone.now() - age
+    ).delete()
+    return deleted
+
+
+def run_job(job: Job) -> bool:
+    """Run a claimed job and store the outcome, True on success."""
+    claimed = Job.objects.filter(id=job.id, locked_by=job.locked_by, status=Job.STATUS_RUNNING)
+    try:
+        func = get_job_function(job.name)
+        if func is None:
+            raise LookupError(f"Unknown job {job.name!r}.")
+        func(**job.kwargs)
+    except Exception:
+        error = traceback.format_exc()
+        logger.exception("Job %s failed on attempt %s of %s.", job, job.attempts, job.max_attempts)
+        if job.attempts >= job.max_attempts:
+            claimed.update(status=Job.STATUS_FAILED, last_error=error, finished_at=timezone.now(), locked_until=None)
+        else:
+            claimed.update(
+                status=Job.STATUS_QUEUED, last_error=error, locked_until=None,
+                run_at=timezone.now() + datetime.timedelta(seconds=get_retry_delay(job.attempts)),
+            )
+        return False
+    claimed.update(status=Job.STATUS_DONE, finished_at=timezone.now(), locked_until=None)
+    return True
+
+
+def run_job_in_thread(job: Job) -> bool:
+    try:
+        return run_job(job)
+    finally:
+        close_old_connections()
+
+
+class Worker:
+    """Claims and runs jobs in `concurrency` threads until `stop()`, every worker process runs the scheduler too."""
+    def __init__(self, concurrency: int, poll_interval: float, schedule: dict = None) -> None:
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.scheduler = Scheduler(schedule) if schedule else None
+        self.stopping = threading.Event()
+        self.processed = 0
+
+    def stop(self) -> None:
+        self.stopping.set()
+
+    def poll(self, executor: ThreadPoolExecutor, running: set) -> None:
+        """Enqueue due periodic jobs, extend leases of `running` jobs and add newly claimed ones to it."""
+        if self.scheduler:
+            self.scheduler.enqueue_due()
+        if running:
+            extend_leases(self.worker_id)
+        fail_expired_jobs()
+
+        if len(running) < self.concurrency:
+            jobs = claim_jobs(self.worker_id, self.concurrency - len(running))
+            running.update(executor.submit(run_job_in_thread, job) for job in jobs)
+
+    def run(self, burst: bool = False) -> int:
+        """Run until stopped, with `burst` until no job is due. Returns the number of jobs run."""
+        running = set()
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='job') as executor:
+            while not self.stopping.is_set():
+                try:
+                    self.poll(executor, running)
+                except Exception:
+                    # e.g. "database is locked", running jobs are not affected and the next poll tries again
+                    logger.exception("Worker %s poll failed.", self.worker_id)
+                finally:
+                    close_old_connections()
+
+                if burst and not running:
+                    break
+                if running:
+                    done, running = wait(running, timeout=self.poll_interval, return_when=FIRST_COMPLETED)
+                    self.processed += len(done)
+                else:
+                    self.stopping.wait(self.poll_interval)
+
+            # Jobs that already started are finished before exit
+            done, _ = wait(running)
+            self.processed += len(done)
+        return self.processed
@@ -0,0 +1,18 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api.order_summary import backfill_order_summaries
+
+
+class Command(BaseCommand):
+    help = "Fill `item_count` and `items_preview` of orders created before the summary columns existed."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=settings.ORDER_SUMMARY_BACKFILL_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        def progress(updated):
+            self.stdout.write(f"{updated} orders updated")
+
+        updated = backfill_order_summaries(batch_size=options['batch_size'], progress=progress)
+        self.stdout.write(self.style.SUCCESS(f"Backfilled summary of {updated} orders."))
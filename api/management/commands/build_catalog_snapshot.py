@@ -0,0 +1,37 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from api.catalog import get_latest_seq
+from api.catalog_snapshot import build_catalog_snapshot
+
+
+class Command(BaseCommand):
+    help = "Render categories and menu items lists to the memory-mapped catalog snapshot file."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--loop', action='store_true',
+            help="Keep running, rebuild on every catalog change and at least every CATALOG_SNAPSHOT_REFRESH seconds."
+        )
+        parser.add_argument('--interval', type=float, default=settings.CATALOG_SNAPSHOT_INTERVAL)
+        parser.add_argument('--path', default=settings.CATALOG_SNAPSHOT_PATH)
+
+    def handle(self, *args, **options):
+        built_seq, built_at = None, 0.0
+
+        while True:
+            close_old_connections()
+            if get_latest_seq() != built_seq or time.monotonic() - built_at >= settings.CATALOG_SNAPSHOT_REFRESH:
+                started = time.perf_counter()
+                header = build_catalog_snapshot(path=options['path'])
+                built_seq, built_at = header['seq'], time.monotonic()
+                self.stdout.write(
+                    f"Built catalog snapshot at seq {header['seq']} with {len(header['views'])} lists "
+                    f"in {time.perf_counter() - started:.3f}s."
+                )
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from api.recommendations import build_recommendations
+
+
+class Command(BaseCommand):
+    help = "Fold new orders into the menu items co-occurrence matrix and refresh \"frequently ordered together\" relations."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help="Rebuild from the whole order history.")
+
+    def handle(self, *args, **options):
+        def progress(order_items):
+            self.stdout.write(f"{order_items} order items folded")
+
+        result = build_recommendations(full=options['full'], progress=progress)
+        self.stdout.write(self.style.SUCCESS(
+            f"Folded {result['order_items']} order items, stored {result['relations']} relations of {result['menu_items']} menu items."
+        ))
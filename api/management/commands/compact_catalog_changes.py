@@ -0,0 +1,20 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api.catalog import compact_catalog_changes
+
+
+class Command(BaseCommand):
+    help = "Delete old tombstones from the catalog change feed, clients that synced before them get a full sync."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--tombstone-days', type=int, default=settings.CATALOG_TOMBSTONE_RETENTION_DAYS,
+            help="Keep tombstones younger than this number of days."
+        )
+
+    def handle(self, *args, **options):
+        deleted = compact_catalog_changes(tombstone_age=timedelta(days=options['tombstone_days']))
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} catalog tombstones."))
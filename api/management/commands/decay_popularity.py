@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from api.popularity import decay_popularity
+
+
+class Command(BaseCommand):
+    help = "Subtract sales older than the popularity window from menu items `popularity_7d`, run it daily."
+
+    def handle(self, *args, **options):
+        updated = decay_popularity()
+        self.stdout.write(self.style.SUCCESS(f"Decayed popularity of {updated} menu items."))
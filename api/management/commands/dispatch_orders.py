@@ -0,0 +1,49 @@
+import logging
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from api.dispatch import DeliveryDispatcher
+
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = "Assign unassigned orders to delivery crew members balanced by their outstanding orders."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true', help="Keep dispatching every --interval seconds.")
+        parser.add_argument('--interval', type=float, default=settings.DELIVERY_DISPATCH_INTERVAL)
+        parser.add_argument('--batch-size', type=int, default=settings.DELIVERY_DISPATCH_BATCH_SIZE)
+        parser.add_argument(
+            '--refresh-every', type=int, default=settings.DELIVERY_DISPATCH_REFRESH_EVERY,
+            help="Reload couriers loads from the database every N cycles."
+        )
+
+    def handle(self, *args, **options):
+        dispatcher = DeliveryDispatcher(batch_size=options['batch_size'], refresh_every=options['refresh_every'])
+
+        while True:
+            close_old_connections()
+            started = time.perf_counter()
+            try:
+                assigned = dispatcher.dispatch()
+            except Exception:
+                if not options['loop']:
+                    raise
+                # e.g. "database is locked", a failed cycle is retried with the next one
+                logger.exception("Dispatch cycle failed.")
+                time.sleep(options['interval'])
+                continue
+            elapsed = time.perf_counter() - started
+
+            if assigned or not options['loop']:
+                self.stdout.write(f"Assigned {assigned} orders to {len(dispatcher.loads)} couriers in {elapsed:.3f}s.")
+            if not options['loop']:
+                break
+            # Keep going without sleeping while there is a backlog
+            if assigned < options['batch_size']:
+                time.sleep(options['interval'])
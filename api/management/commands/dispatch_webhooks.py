@@ -0,0 +1,31 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from api.webhooks import dispatch_webhooks, get_session
+
+
+class Command(BaseCommand):
+    help = "Send order webhook events from the outbox to the active webhook endpoints."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true', help="Keep dispatching every --interval seconds.")
+        parser.add_argument('--interval', type=float, default=settings.WEBHOOK_DISPATCH_INTERVAL)
+        parser.add_argument('--workers', type=int, default=settings.WEBHOOK_DISPATCH_WORKERS, help="Endpoints served at once.")
+
+    def handle(self, *args, **options):
+        session = get_session()
+        with ThreadPoolExecutor(max_workers=options['workers'], thread_name_prefix='webhook') as executor:
+            while True:
+                close_old_connections()
+                sent, backlog = dispatch_webhooks(session=session, executor=executor)
+                if sent or not options['loop']:
+                    self.stdout.write(f"Sent {sent} webhook events.")
+                if not options['loop']:
+                    break
+                # Keep going without sleeping while an endpoint has a backlog
+                if not backlog:
+                    time.sleep(options['interval'])
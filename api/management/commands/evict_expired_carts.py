@@ -0,0 +1,20 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api.carts import evict_expired_cart_lines
+
+
+class Command(BaseCommand):
+    help = "Delete cart lines not touched for CART_TTL_DAYS in small batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=settings.CART_EVICTION_BATCH_SIZE)
+        parser.add_argument('--max-batches', type=int, default=None)
+
+    def handle(self, *args, **options):
+        deleted = evict_expired_cart_lines(
+            batch_size=options['batch_size'],
+            max_batches=options['max_batches'],
+            progress=lambda batches, deleted: self.stdout.write(f"Batch {batches}: {deleted} cart lines deleted."),
+        )
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} expired cart lines."))
@@ -0,0 +1,33 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from api.purge import parse_purge_filters, purge_orders
+
+
+class Command(BaseCommand):
+    help = "Delete orders and their items by date range, user and status in small batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start-date', help="YYYY-MM-DD, inclusive")
+        parser.add_argument('--end-date', help="YYYY-MM-DD, inclusive")
+        parser.add_argument('--user-id', type=int)
+        parser.add_argument('--status', choices=['0', '1'], help="0 - in process, 1 - delivered")
+        parser.add_argument('--batch-size', type=int, default=settings.ORDERS_PURGE_BATCH_SIZE)
+        parser.add_argument('--dry-run', action='store_true', help="Only count matching orders.")
+
+    def handle(self, *args, **options):
+        try:
+            filters = parse_purge_filters(options)
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        def progress(batches, deleted):
+            self.stdout.write(f"batch {batches}: {deleted} orders deleted")
+
+        result = purge_orders(
+            filters=filters, batch_size=options['batch_size'], dry_run=options['dry_run'], progress=progress
+        )
+        if options['dry_run']:
+            self.stdout.write(f"{result['matched']} orders match, nothing deleted (dry run).")
+        else:
+            self.stdout.write(self.style.SUCCESS(f"Deleted {result['deleted']} orders in {result['batches']} batches."))
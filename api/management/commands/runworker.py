@@ -0,0 +1,33 @@
+import signal
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from api.jobs import Worker
+
+
+class Command(BaseCommand):
+    help = "Run background jobs from the job queue and enqueue periodic jobs of JOBS_SCHEDULE."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=settings.JOBS_WORKER_CONCURRENCY, help="Jobs run at once.")
+        parser.add_argument('--poll-interval', type=float, default=settings.JOBS_POLL_INTERVAL)
+        parser.add_argument('--burst', action='store_true', help="Exit when no job is due instead of waiting for more.")
+        parser.add_argument('--no-schedule', action='store_true', help="Do not enqueue periodic jobs from this worker.")
+
+    def handle(self, *args, **options):
+        try:
+            worker = Worker(
+                concurrency=options['concurrency'],
+                poll_interval=options['poll_interval'],
+                schedule=None if options['no_schedule'] else settings.JOBS_SCHEDULE,
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+        # Running jobs are finished before exit
+        for signal_number in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(signal_number, lambda *_: worker.stop())
+
+        self.stdout.write(f"Worker {worker.worker_id} started with {options['concurrency']} threads.")
+        processed = worker.run(burst=options['burst'])
+        self.stdout.write(self.style.SUCCESS(f"Worker {worker.worker_id} stopped after {processed} jobs."))
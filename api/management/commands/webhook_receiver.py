@@ -0,0 +1,55 @@
+import json
+import random
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from django.core.management.base import BaseCommand
+
+from api.webhooks import SIGNATURE_HEADER, verify_signature
+
+
+class Command(BaseCommand):
+    help = "Local stand-in webhook receiver: checks signatures and prints received events."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=8099)
+        parser.add_argument('--secret', required=True, help="Secret of the webhook endpoint pointing here.")
+        parser.add_argument('--fail-rate', type=float, default=0.0, help="Share of requests answered with 503 to test retries.")
+        parser.add_argument('--delay', type=float, default=0.0, help="Seconds to wait before answering.")
+
+    def handle(self, *args, **options):
+        command = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                time.sleep(options['delay'])
+
+                if not verify_signature(options['secret'], body, self.headers.get(SIGNATURE_HEADER, '')):
+                    command.stderr.write("Rejected a request with an invalid signature.")
+                    return self.answer(401)
+                if random.random() < options['fail_rate']:
+                    command.stdout.write("Answering 503 on purpose.")
+                    return self.answer(503)
+
+                for event in json.loads(body)['events']:
+                    command.stdout.write(f"#{event['id']} {event['type']} {json.dumps(event['data'])}")
+                self.answer(204)
+
+            def answer(self, status_code: int) -> None:
+                self.send_response(status_code)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer((options['host'], options['port']), Handler)
+        self.stdout.write(f"Receiving webhooks on http://{options['host']}:{options['port']}/")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
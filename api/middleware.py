@@ -0,0 +1,134 @@
+import gzip
+
+from django.conf import settings
+from django.contrib.auth.middleware import AuthenticationMiddleware
+from django.contrib.messages.middleware import MessageMiddleware
+from django.contrib.sessions.middleware import SessionMiddleware
+from django.middleware.csrf import CsrfViewMiddleware
+from django.utils.cache import patch_vary_headers
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+def parse_accept_encoding(header: str) -> dict:
+    """Parse `Accept-Encoding` header into {coding: q-value}."""
+    codings = {}
+    for part in header.split(','):
+        coding, _, params = part.strip().partition(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        quality = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        codings[coding] = quality
+    return codings
+
+
+def negotiate_encoding(header: str) -> str:
+    """Pick the best supported content coding, brotli is preferred over gzip on equal quality."""
+    codings = parse_accept_encoding(header)
+    supported = ('br', 'gzip') if brotli is not None else ('gzip',)
+
+    best, best_quality = None, 0.0
+    for coding in supported:
+        quality = codings.get(coding, codings.get('*', 0.0))
+        if quality > best_quality:
+            best, best_quality = coding, quality
+    return best
+
+
+def compress(content: bytes, encoding: str) -> bytes:
+    if encoding == 'br':
+        return brotli.compress(content, quality=settings.RESPONSE_COMPRESSION_BROTLI_QUALITY)
+    return gzip.compress(content, compresslevel=settings.RESPONSE_COMPRESSION_GZIP_LEVEL, mtime=0)
+
+
+class CompressionMiddleware:
+    """
+    Compress large responses with brotli or gzip negotiated by `Accept-Encoding`.
+
+    Responses smaller than `RESPONSE_COMPRESSION_MIN_SIZE` bytes are sent as is, compressing
+    a single object costs more CPU than it saves on the wire. Brotli is used only when
+    the `brotli` package is installed. Streaming responses are never buffered.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+
+        if response.streaming or response.has_header('Content-Encoding'):
+            return response
+        if len(response.content) < settings.RESPONSE_COMPRESSION_MIN_SIZE:
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+
+        encoding = negotiate_encoding(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if encoding is None:
+            return response
+
+        compressed_content = compress(response.content, encoding)
+        if len(compressed_content) >= len(response.content):
+            return response
+
+        response.content = compressed_content
+        response.headers['Content-Length'] = str(len(compressed_content))
+        response.headers['Content-Encoding'] = encoding
+
+        # Strong ETag is not valid for a different representation
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+
+        return response
+
+
+# Lean middleware profile for token authenticated API requests
+def is_token_api_request(request) -> bool:
+    """Request to `TOKEN_API_PATH_PREFIX` with `Authorization: Token <key>` header."""
+    return (
+        request.path_info.startswith(settings.TOKEN_API_PATH_PREFIX)
+        and request.META.get('HTTP_AUTHORIZATION', '').startswith('Token ')
+    )
+
+
+class TokenAPIBypassMixin:
+    """
+    Pass token authenticated API requests straight to the next middleware.
+
+    They carry no session cookie and no CSRF token and get no messages, DRF authenticates them
+    with TokenAuthentication only, so the session, CSRF, auth and messages layers are pure overhead.
+    Any other request (admin, browsable API with a session) runs the middleware as usual.
+    """
+    def __call__(self, request):
+        if is_token_api_request(request):
+            return self.get_response(request)
+        return super().__call__(request)
+
+
+class TokenAPISessionMiddleware(TokenAPIBypassMixin, SessionMiddleware):
+    pass
+
+
+class TokenAPICsrfViewMiddleware(TokenAPIBypassMixin, CsrfViewMiddleware):
+    def process_view(self, request, callback, callback_args, callback_kwargs):
+        if is_token_api_request(request):
+            return None
+        return super().process_view(request, callback, callback_args, callback_kwargs)
+
+
+class TokenAPIAuthenticationMiddleware(TokenAPIBypassMixin, AuthenticationMiddleware):
+    pass
+
+
+class TokenAPIMessageMiddleware(TokenAPIBypassMixin, MessageMiddleware):
+    pass
@@ -0,0 +1,46 @@
+# Generated by Django 5.0.1 on 2026-10-19 09:42
+
+from django.db import migrations, models
+
+
+def seed_catalog_changes(apps, schema_editor):
+    """Existing catalog rows start the change feed, so `?since=0` returns the full catalog."""
+    Category = apps.get_model('api', 'Category')
+    MenuItem = apps.get_model('api', 'MenuItem')
+    CatalogChange = apps.get_model('api', 'CatalogChange')
+    
+    CatalogChange.objects.bulk_create(
+        [CatalogChange(entity='category', object_id=pk, action='upsert') for pk in Category.objects.order_by('id').values_list('id', flat=True)]
+        + [CatalogChange(entity='menuitem', object_id=pk, action='upsert') for pk in MenuItem.objects.order_by('id').values_list('id', flat=True)]
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_orderitem_quantity_alter_orderitem_order'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CatalogSyncState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('purged_seq', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='CatalogChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('entity', models.CharField(choices=[('category', 'Category'), ('menuitem', 'Menu item')], max_length=16)),
+                ('object_id', models.BigIntegerField()),
+                ('action', models.CharField(choices=[('upsert', 'Upsert'), ('delete', 'Delete')], max_length=6)),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+            ],
+            options={
+                'unique_together': {('entity', 'object_id')},
+            },
+        ),
+        migrations.RunPython(seed_catalog_changes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,62 @@
+# Generated by Django 5.0.1 on 2026-10-19 09:51
+
+import datetime
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Sum
+
+
+def backfill_popularity(apps, schema_editor):
+    """Counters and daily sales buckets of the current window from existing order items."""
+    MenuItem = apps.get_model('api', 'MenuItem')
+    MenuItemSales = apps.get_model('api', 'MenuItemSales')
+    OrderItem = apps.get_model('api', 'OrderItem')
+    
+    for menuitem_id, sold in OrderItem.objects.values_list('menuitem').annotate(sold=Sum('quantity')).order_by():
+        MenuItem.objects.filter(id=menuitem_id).update(popularity=sold)
+    
+    window_start = datetime.date.today() - datetime.timedelta(days=settings.MENU_POPULARITY_WINDOW_DAYS - 1)
+    daily_sales = (
+        OrderItem.objects.filter(order__date__gte=window_start)
+        .values_list('menuitem', 'order__date').annotate(sold=Sum('quantity')).order_by()
+    )
+    MenuItemSales.objects.bulk_create(
+        MenuItemSales(menuitem_id=menuitem_id, date=date, quantity=sold) for menuitem_id, date, sold in daily_sales
+    )
+    for menuitem_id, sold in MenuItemSales.objects.values_list('menuitem').annotate(sold=Sum('quantity')).order_by():
+        MenuItem.objects.filter(id=menuitem_id).update(popularity_7d=sold)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_menuitem_stock'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='menuitem',
+            name='popularity',
+            field=models.PositiveIntegerField(db_index=True, default=0),
+        ),
+        migrations.AddField(
+            model_name='menuitem',
+            name='popularity_7d',
+            field=models.PositiveIntegerField(db_index=True, default=0),
+        ),
+        migrations.CreateModel(
+            name='MenuItemSales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(db_index=True)),
+                ('quantity', models.PositiveIntegerField(default=0)),
+                ('menuitem', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='api.menuitem')),
+            ],
+            options={
+                'unique_together': {('menuitem', 'date')},
+            },
+        ),
+        migrations.RunPython(backfill_popularity, migrations.RunPython.noop),
+    ]
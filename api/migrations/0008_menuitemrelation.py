@@ -0,0 +1,27 @@
+# Generated by Django 5.0.1 on 2026-10-19 09:53
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_menuitem_popularity'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MenuItemRelation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.PositiveIntegerField()),
+                ('menuitem', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='relations', to='api.menuitem')),
+                ('related', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='api.menuitem')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['menuitem', '-score'], name='api_menuite_menuite_e5ca84_idx')],
+                'unique_together': {('menuitem', 'related')},
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.0.1 on 2026-10-19 09:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_menuitemrelation'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='item_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='items_preview',
+            field=models.CharField(blank=True, default='', max_length=255),
+        ),
+    ]
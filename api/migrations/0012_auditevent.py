@@ -0,0 +1,33 @@
+# Generated by Django 5.0.1 on 2026-10-19 10:18
+
+import django.core.serializers.json
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0011_cart_updated_at'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AuditEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('action', models.CharField(max_length=32)),
+                ('entity', models.CharField(max_length=32)),
+                ('entity_id', models.BigIntegerField(null=True)),
+                ('changes', models.JSONField(default=dict, encoder=django.core.serializers.json.DjangoJSONEncoder)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('actor', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['actor', '-created_at'], name='api_auditev_actor_i_583e25_idx'), models.Index(fields=['entity', 'entity_id', '-created_at'], name='api_auditev_entity_3df1c7_idx'), models.Index(fields=['-created_at'], name='api_auditev_created_291531_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.0.1 on 2026-10-19 14:05
+
+from django.db import migrations
+
+
+def delete_order_event_messages(apps, schema_editor):
+    # Short-lived messages of the old single event format, subscribers have received them already
+    apps.get_model('api', 'OrderEventMessage').objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0014_order_event_messages'),
+    ]
+
+    operations = [
+        migrations.RunPython(delete_order_event_messages, migrations.RunPython.noop),
+        migrations.RenameField(
+            model_name='ordereventmessage',
+            old_name='event',
+            new_name='events',
+        ),
+    ]
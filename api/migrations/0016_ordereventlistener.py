@@ -0,0 +1,21 @@
+# Generated by Django 5.0.1 on 2026-10-19 15:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0015_order_event_message_events'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderEventListener',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('origin', models.CharField(max_length=255, unique=True)),
+                ('seen_at', models.DateTimeField(db_index=True)),
+            ],
+        ),
+    ]
@@ -1,5 +1,7 @@
 from django.db import models
 from django.contrib.auth.models import User
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
 
 
 class Category(models.Model):
@@ -15,9 +17,40 @@ class MenuItem(models.Model):
     price = models.DecimalField(max_digits=6, decimal_places=2, db_index=True)
     featured = models.BooleanField(db_index=True)
     category = models.ForeignKey(Category, on_delete=models.PROTECT)
+    # Units left, NULL means stock is not tracked and item is always available
+    stock = models.PositiveIntegerField(null=True, blank=True, default=None)
+    # Units sold all-time and in the last `MENU_POPULARITY_WINDOW_DAYS` days, updated at checkout
+    popularity = models.PositiveIntegerField(default=0, db_index=True)
+    popularity_7d = models.PositiveIntegerField(default=0, db_index=True)
 
     def __str__(self):
         return self.title
+    
+    @property
+    def is_available(self) -> bool:
+        return self.stock is None or self.stock > 0
+
+
+class MenuItemSales(models.Model):
+    """Units sold per menu item per day, buckets older than the popularity window are subtracted and deleted."""
+    menuitem = models.ForeignKey(MenuItem, on_delete=models.CASCADE)
+    date = models.DateField(db_index=True)
+    quantity = models.PositiveIntegerField(default=0)
+    
+    class Meta:
+        unique_together = ('menuitem', 'date')
+
+
+class MenuItemRelation(models.Model):
+    """Top-K menu items most often ordered together with `menuitem`, built by `manage.py build_recommendations`."""
+    menuitem = models.ForeignKey(MenuItem, on_delete=models.CASCADE, related_name='relations')
+    related = models.ForeignKey(MenuItem, on_delete=models.CASCADE, related_name='+')
+    # Number of orders that contain both items
+    score = models.PositiveIntegerField()
+    
+    class Meta:
+        unique_together = ('menuitem', 'related')
+        indexes = [models.Index(fields=['menuitem', '-score'])]
 
 
 class Cart(models.Model):
@@ -26,6 +59,8 @@ class Cart(models.Model):
     price = models.DecimalField(max_digits=6, decimal_places=2)
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     menuitem = models.ForeignKey(MenuItem, on_delete=models.CASCADE)
+    # Last time the line was added or changed, lines older than `CART_TTL_DAYS` are expired
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
     
     class Meta:
         unique_together = ('user', 'menuitem')
@@ -37,6 +72,11 @@ class Order(models.Model):
     date = models.DateField(db_index=True)
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     delivery_crew = models.ForeignKey(User, on_delete=models.SET_NULL, related_name="delivery_crew", null=True)
+    # Optimistic concurrency control, every update is `UPDATE ... WHERE version=?` and increments it
+    version = models.PositiveIntegerField(default=0)
+    # Denormalized summary of order items written at checkout, order lists do not join OrderItem
+    item_count = models.PositiveIntegerField(default=0)
+    items_preview = models.CharField(max_length=255, blank=True, default='')
 
 
 class OrderItem(models.Model):
@@ -48,3 +88,123 @@ class OrderItem(models.Model):
     
     class Meta:
         unique_together = ('order', 'menuitem')
+
+
+class CatalogChange(models.Model):
+    """Change feed of the menu catalog, `id` is the catalog sequence. Only the latest change of each row is kept."""
+    ENTITY_CATEGORY = 'category'
+    ENTITY_MENU_ITEM = 'menuitem'
+    ACTION_UPSERT = 'upsert'
+    ACTION_DELETE = 'delete'
+    
+    entity = models.CharField(max_length=16, choices=[(ENTITY_CATEGORY, 'Category'), (ENTITY_MENU_ITEM, 'Menu item')])
+    object_id = models.BigIntegerField()
+    action = models.CharField(max_length=6, choices=[(ACTION_UPSERT, 'Upsert'), (ACTION_DELETE, 'Delete')])
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    
+    class Meta:
+        unique_together = ('entity', 'object_id')
+
+
+class CatalogSyncState(models.Model):
+    """Single row, clients that synced before `purged_seq` lost tombstones and have to do a full sync."""
+    purged_seq = models.BigIntegerField(default=0)
+
+
+class Job(models.Model):
+    """Background job queue of `manage.py runworker`, see api.jobs."""
+    STATUS_QUEUED = 'queued'
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+    
+    name = models.CharField(max_length=100)
+    kwargs = models.JSONField(default=dict, blank=True)
+    status = models.CharField(
+        max_length=7, default=STATUS_QUEUED,
+        choices=[(STATUS_QUEUED, 'Queued'), (STATUS_RUNNING, 'Running'), (STATUS_DONE, 'Done'), (STATUS_FAILED, 'Failed')]
+    )
+    run_at = models.DateTimeField()
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField()
+    # Worker that claimed the job, the claim is lost when `locked_until` passes without a heartbeat
+    locked_by = models.CharField(max_length=100, blank=True, default='')
+    locked_until = models.DateTimeField(null=True, blank=True)
+    # Periodic slot "<schedule>:<time>", a slot is enqueued once however many workers run the scheduler
+    unique_key = models.CharField(max_length=200, null=True, blank=True, unique=True)
+    last_error = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        indexes = [models.Index(fields=['status', 'run_at'])]
+    
+    def __str__(self):
+        return f"{self.name} #{self.id}"
+
+
+class AuditEvent(models.Model):
+    """Manager action, buffered in memory and written in batches by api.audit."""
+    actor = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, related_name='+')
+    action = models.CharField(max_length=32)
+    entity = models.CharField(max_length=32)
+    entity_id = models.BigIntegerField(null=True)
+    # {field: [old, new]} or action arguments
+    changes = models.JSONField(default=dict, encoder=DjangoJSONEncoder)
+    # Time of the action, not of the flush
+    created_at = models.DateTimeField(default=timezone.now)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['actor', '-created_at']),
+            models.Index(fields=['entity', 'entity_id', '-created_at']),
+            models.Index(fields=['-created_at']),
+        ]
+
+
+class OrderEventMessage(models.Model):
+    """Order events of a channel published together for SSE subscribers of other processes by api.events.DatabaseFanout."""
+    # Host and pid of the publishing process, which delivered the events itself
+    origin = models.CharField(max_length=255)
+    channel = models.CharField(max_length=64)
+    events = models.JSONField(encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+
+class OrderEventListener(models.Model):
+    """Process polling `OrderEventMessage` for its SSE subscribers, publishers write messages only while one is alive."""
+    origin = models.CharField(max_length=255, unique=True)
+    # Refreshed every `ORDER_EVENTS_FANOUT_HEARTBEAT_INTERVAL` seconds by the polling thread
+    seen_at = models.DateTimeField(db_index=True)
+
+
+class WebhookEndpoint(models.Model):
+    """Receiver of order webhooks, events after `last_event_id` are sent by `manage.py dispatch_webhooks`."""
+    name = models.CharField(max_length=100, unique=True)
+    url = models.URLField()
+    # HMAC-SHA256 key of the `X-Webhook-Signature` header
+    secret = models.CharField(max_length=255)
+    # Subscribed event types, empty list is all of them
+    event_types = models.JSONField(default=list, blank=True)
+    is_active = models.BooleanField(default=True)
+    # Delivery cursor, a new endpoint starts at the latest event instead of the whole outbox
+    last_event_id = models.BigIntegerField(null=True, blank=True)
+    # Retry state of the undelivered batch
+    failures = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True, default='')
+    
+    def __str__(self):
+        return self.name
+    
+    def save(self, *args, **kwargs):
+        if self.last_event_id is None:
+            self.last_event_id = WebhookEvent.objects.aggregate(id=models.Max('id'))['id'] or 0
+        super().save(*args, **kwargs)
+
+
+class WebhookEvent(models.Model):
+    """Outbox of order webhooks, written in the transaction of the order change."""
+    event_type = models.CharField(max_length=32)
+    payload = models.JSONField(encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
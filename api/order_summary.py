@@ -0,0 +1,65 @@
+from django.conf import settings
+from django.db import transaction
+
+from api.models import Order, OrderItem
+
+
+def summarize_order_items(lines) -> tuple:
+    """
+    (item_count, items_preview) of order lines [(menu item title, quantity), ...]
+    
+    item_count is the number of units, preview lists titles e.g. "Greek salad x2, Lemon dessert, +3 more"
+    cut to fit `ORDER_ITEMS_PREVIEW_LENGTH`.
+    """
+    lines = list(lines)
+    max_length = settings.ORDER_ITEMS_PREVIEW_LENGTH
+    item_count = sum(quantity for _, quantity in lines)
+    
+    parts = [f"{title} x{quantity}" if quantity > 1 else title for title, quantity in lines]
+    preview = ''
+    for index, part in enumerate(parts):
+        rest = len(parts) - index - 1
+        suffix = f", +{rest} more" if rest else ''
+        candidate = f"{preview}, {part}" if preview else part
+        if len(candidate) + len(suffix) <= max_length:
+            preview = candidate
+        elif preview:
+            # Fits, it was checked with the same suffix when the previous part was added
+            preview = f"{preview}, +{rest + 1} more"
+            break
+        else:
+            preview = part[:max_length - len(suffix) - 3] + '...' + suffix
+            break
+    
+    return item_count, preview
+
+
+def backfill_order_summaries(batch_size: int, progress=None) -> int:
+    """Fill summary of orders created before it existed, batch of orders per transaction, returns number of updated orders."""
+    updated = 0
+    last_id = 0
+    while True:
+        order_ids = list(
+            Order.objects.filter(id__gt=last_id, item_count=0).order_by('id').values_list('id', flat=True)[:batch_size]
+        )
+        if not order_ids:
+            return updated
+        
+        lines = {order_id: [] for order_id in order_ids}
+        order_items = OrderItem.objects.filter(order_id__in=order_ids).order_by('order_id', 'id')
+        for order_id, title, quantity in order_items.values_list('order_id', 'menuitem__title', 'quantity'):
+            lines[order_id].append((title, quantity))
+        
+        orders = []
+        for order_id, order_lines in lines.items():
+            if order_lines:
+                item_count, items_preview = summarize_order_items(order_lines)
+                orders.append(Order(id=order_id, item_count=item_count, items_preview=items_preview))
+        
+        with transaction.atomic():
+            Order.objects.bulk_update(orders, ['item_count', 'items_preview'])
+        
+        updated += len(orders)
+        last_id = order_ids[-1]
+        if progress is not None:
+            progress(updated)
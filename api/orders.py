@@ -0,0 +1,86 @@
+"""
+Order changes shared by the order endpoints and the delivery dispatcher.
+
+Orders are updated with conditional `UPDATE`s on their `version`, a change based on an older
+version updates nothing and is reported as a conflict. Side effects of a change (webhook outbox,
+audit log, SSE events) are recorded in the transaction of the change, whoever made it.
+"""
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+
+from api.audit import record_audit_events
+from api.events import publish_order_events
+from api.models import Order
+from api.webhooks import record_webhook_events
+
+
+def update_order_fields(order: Order, expected_version: int, **fields) -> bool:
+    """Conditional `UPDATE ... WHERE id=? AND version=?` of the changed fields only, False on a version conflict."""
+    updated = Order.objects.filter(id=order.id, version=expected_version).update(version=F('version') + 1, **fields)
+    if not updated:
+        return False
+
+    for field_name, value in fields.items():
+        setattr(order, field_name, value)
+    order.version = expected_version + 1
+    return True
+
+
+def update_orders_fields(versions: dict, chunk_size: int = None, **fields) -> set:
+    """
+    Conditional update of many orders {order_id: expected_version}, returns ids with a version conflict.
+
+    Orders expecting the same version are updated per chunk with one `UPDATE ... WHERE id IN (...) AND version=?`.
+    When it updates fewer rows than the chunk has, the chunk is rolled back to its savepoint and updated one
+    order at a time, a version read after the update can't tell our change from a concurrent one.
+    """
+    chunk_size = chunk_size or settings.ORDERS_BULK_UPDATE_CHUNK
+    ids_by_version = defaultdict(list)
+    for order_id, version in versions.items():
+        ids_by_version[version].append(order_id)
+
+    conflicts = set()
+    with transaction.atomic():
+        for version, order_ids in ids_by_version.items():
+            for start in range(0, len(order_ids), chunk_size):
+                chunk = order_ids[start:start + chunk_size]
+                savepoint = transaction.savepoint()
+                updated = Order.objects.filter(id__in=chunk, version=version).update(version=F('version') + 1, **fields)
+                if updated == len(chunk):
+                    transaction.savepoint_commit(savepoint)
+                    continue
+
+                transaction.savepoint_rollback(savepoint)
+                for order_id in chunk:
+                    if not Order.objects.filter(id=order_id, version=version).update(version=F('version') + 1, **fields):
+                        conflicts.add(order_id)
+    return conflicts
+
+
+def record_delivery_assignments(actor, orders, previous_delivery_crew_ids: dict) -> list:
+    """
+    Webhook, audit and SSE events of orders assigned to delivery crew, call it inside the assignment transaction.
+
+    `actor` is None for the dispatcher, `previous_delivery_crew_ids` is {order_id: delivery crew id before the change}.
+    Each kind of event is written once for all `orders`. Returns the order payloads.
+    """
+    payloads = record_webhook_events(event_type='order.assigned', orders=orders)
+    events = []
+    for order in payloads:
+        previous_delivery_crew_id = previous_delivery_crew_ids.get(order['id'])
+        events.append(([order['delivery_crew']], 'order.assigned', order))
+        if previous_delivery_crew_id not in (None, order['delivery_crew']):
+            events.append(([previous_delivery_crew_id], 'order.unassigned', order))
+    # Commit hooks run in order, SSE events go out before the audit flush takes the database write lock
+    publish_order_events(events)
+    record_audit_events(
+        actor=actor, action='assign_delivery', entity='order',
+        changes_by_entity_id={
+            order['id']: {"delivery_crew": [previous_delivery_crew_ids.get(order['id']), order['delivery_crew']]}
+            for order in payloads
+        }
+    )
+    return payloads
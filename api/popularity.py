@@ -0,0 +1,153 @@
+"""
+Popularity counters of menu items.
+
+Checkout adds sold units to `MenuItem.popularity` (all-time) and `popularity_7d` with a single
+UPDATE and to today's `MenuItemSales` bucket. The daily `decay_popularity` job subtracts buckets
+which left the window from `popularity_7d` and deletes them, so no request aggregates `OrderItem`.
+"""
+import datetime
+import heapq
+import threading
+import time
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Case, F, PositiveIntegerField, Sum, When
+
+from api.models import MenuItem, MenuItemSales
+
+
+POPULARITY_FIELDS = {'all': 'popularity', '7d': 'popularity_7d'}
+
+
+def add_per_menu_item(field: str, quantities: dict) -> Case:
+    """`CASE WHEN id=? THEN field + ? ... END` expression for {menu_item_id: quantity}"""
+    return Case(
+        *(When(id=menu_item_id, then=F(field) + quantity) for menu_item_id, quantity in quantities.items()),
+        default=F(field),
+        output_field=PositiveIntegerField(),
+    )
+
+
+def record_sales(quantities: dict) -> None:
+    """Add sold units {menu_item_id: quantity} to popularity counters and today's sales bucket, call it inside the checkout transaction."""
+    if not quantities:
+        return
+    if any(quantity <= 0 for quantity in quantities.values()):
+        raise ValueError("Quantities should be positive.")
+
+    MenuItem.objects.filter(id__in=quantities).update(
+        popularity=add_per_menu_item('popularity', quantities),
+        popularity_7d=add_per_menu_item('popularity_7d', quantities),
+    )
+
+    # Concurrent checkouts add to the same bucket row, upsert increments it instead of overwriting
+    quote_name = connection.ops.quote_name
+    table = quote_name(MenuItemSales._meta.db_table)
+    today = datetime.date.today()
+    values = ', '.join(['(%s, %s, %s)'] * len(quantities))
+    params = [param for menu_item_id, quantity in quantities.items() for param in (menu_item_id, today, quantity)]
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {table} ({quote_name('menuitem_id')}, {quote_name('date')}, {quote_name('quantity')}) VALUES {values} "
+            f"ON CONFLICT ({quote_name('menuitem_id')}, {quote_name('date')}) "
+            f"DO UPDATE SET {quote_name('quantity')} = {table}.{quote_name('quantity')} + excluded.{quote_name('quantity')}",
+            params
+        )
+
+    def offer_to_top_sellers():
+        scores = MenuItem.objects.filter(id__in=quantities).values_list('id', *POPULARITY_FIELDS.values())
+        for menu_item_id, *menu_item_scores in scores:
+            for top_sellers, score in zip(TOP_SELLERS.values(), menu_item_scores):
+                top_sellers.offer(menu_item_id, score)
+
+    transaction.on_commit(offer_to_top_sellers)
+
+
+def decay_popularity(today: datetime.date = None) -> int:
+    """Subtract sales buckets older than the window from `popularity_7d` and delete them, returns number of updated menu items."""
+    today = today or datetime.date.today()
+    window_start = today - datetime.timedelta(days=settings.MENU_POPULARITY_WINDOW_DAYS - 1)
+
+    with transaction.atomic():
+        expired_buckets = MenuItemSales.objects.filter(date__lt=window_start)
+        expired = dict(expired_buckets.values_list('menuitem').annotate(sold=Sum('quantity')).order_by())
+        if expired:
+            MenuItem.objects.filter(id__in=expired).update(
+                popularity_7d=add_per_menu_item('popularity_7d', {menu_item_id: -sold for menu_item_id, sold in expired.items()})
+            )
+        expired_buckets.delete()
+
+    return len(expired)
+
+
+class TopSellers:
+    """
+    Bounded in-process cache of the `size` most popular menu items by a popularity field.
+
+    Scores live in `self.scores` and a min-heap of (score, menu_item_id), a heap entry whose score
+    differs from `self.scores` is stale and skipped, like in DeliveryDispatcher. The heap is loaded
+    from the field index every `ttl` seconds to pick up sales of other processes and the decay job,
+    checkouts of this process are applied in between with `offer()`.
+    """
+    def __init__(self, field: str, size: int, ttl: int) -> None:
+        self.field = field
+        self.size = size
+        self.ttl = ttl
+        self.scores = {}
+        self.heap = []
+        self.loaded_at = None
+        self._lock = threading.Lock()
+
+    def refresh(self) -> None:
+        """Top `size` rows by the indexed field, no aggregation."""
+        rows = (
+            MenuItem.objects.filter(**{f'{self.field}__gt': 0})
+            .order_by(f'-{self.field}', 'id').values_list('id', self.field)[:self.size]
+        )
+        with self._lock:
+            self.scores = dict(rows)
+            self.heap = [(score, menu_item_id) for menu_item_id, score in self.scores.items()]
+            heapq.heapify(self.heap)
+            self.loaded_at = time.monotonic()
+
+    def _least_popular(self) -> tuple:
+        """Live heap top (score, menu_item_id), stale entries on top are dropped."""
+        while self.scores.get(self.heap[0][1]) != self.heap[0][0]:
+            heapq.heappop(self.heap)
+        return self.heap[0]
+
+    def offer(self, menu_item_id: int, score: int) -> None:
+        """Update score of menu item, it enters the heap when it beats the least popular one."""
+        if self.loaded_at is None or score <= 0:
+            return
+
+        with self._lock:
+            if menu_item_id not in self.scores and len(self.scores) >= self.size:
+                least_score, least_menu_item_id = self._least_popular()
+                if score <= least_score:
+                    return
+                heapq.heappop(self.heap)
+                del self.scores[least_menu_item_id]
+
+            self.scores[menu_item_id] = score
+            heapq.heappush(self.heap, (score, menu_item_id))
+            # Drop stale entries before they outgrow the live ones
+            if len(self.heap) > 4 * self.size:
+                self.heap = [(score, menu_item_id) for menu_item_id, score in self.scores.items()]
+                heapq.heapify(self.heap)
+
+    def top(self, limit: int) -> list:
+        """[(menu_item_id, score), ...] the most popular first."""
+        if self.loaded_at is None or time.monotonic() - self.loaded_at > self.ttl:
+            self.refresh()
+
+        with self._lock:
+            top = heapq.nlargest(limit, ((score, -menu_item_id) for menu_item_id, score in self.scores.items()))
+        return [(-negative_id, score) for score, negative_id in top]
+
+
+TOP_SELLERS = {
+    window: TopSellers(field=field, size=settings.MENU_TOP_SELLERS_SIZE, ttl=settings.MENU_TOP_SELLERS_TTL)
+    for window, field in POPULARITY_FIELDS.items()
+}
@@ -0,0 +1,73 @@
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.db import transaction
+from django.db.models import Case, DecimalField, ExpressionWrapper, F, Max, Value, When
+
+from api.catalog import record_catalog_changes
+from api.models import Cart, MenuItem, CatalogChange
+
+
+PRICE_FIELD = MenuItem._meta.get_field('price')
+MAX_PRICE = Decimal(10) ** (PRICE_FIELD.max_digits - PRICE_FIELD.decimal_places) - Decimal('0.01')
+MIN_PRICE = Decimal('0.01')
+PRICE_OUTPUT_FIELD = DecimalField(max_digits=PRICE_FIELD.max_digits, decimal_places=PRICE_FIELD.decimal_places)
+
+
+def check_cart_line_prices(new_prices: dict) -> None:
+    """Raises ValueError when a cart line of menu items {menu_item_id: new price} would exceed the price column."""
+    # Cart line price has the same precision as menu item price
+    max_quantities = Cart.objects.filter(menuitem_id__in=new_prices).values('menuitem_id').annotate(
+        max_quantity=Max('quantity')
+    ).order_by().values_list('menuitem_id', 'max_quantity')
+    if any(new_prices[menu_item_id] * max_quantity > MAX_PRICE for menu_item_id, max_quantity in max_quantities):
+        raise ValueError(f"New price of cart lines would exceed {MAX_PRICE}.")
+
+
+def reprice_cart_lines(menu_item_id: int, price: Decimal) -> int:
+    """Set new price of menu item to all cart lines with a single UPDATE, returns number of updated lines. ValueError like `check_cart_line_prices()`."""
+    check_cart_line_prices({menu_item_id: price})
+    return Cart.objects.filter(menuitem_id=menu_item_id).update(unit_price=price, price=F('quantity') * price)
+
+
+def change_category_prices(category_slug: str, percent: Decimal) -> list:
+    """
+    Change prices of all menu items of category by percent and reprice their cart lines in one transaction.
+    
+    New prices are rounded half up in Python and written as they are, menu items and cart lines
+    are updated with one statement each. Raises ValueError when a new price is out of range, returns updated menu item ids.
+    """
+    factor = 1 + percent / 100
+    
+    with transaction.atomic():
+        prices = dict(
+            MenuItem.objects.select_for_update().filter(category__slug__iexact=category_slug).values_list('id', 'price')
+        )
+        if not prices:
+            return []
+        
+        new_prices = {
+            menu_item_id: (price * factor).quantize(MIN_PRICE, rounding=ROUND_HALF_UP) for menu_item_id, price in prices.items()
+        }
+        if min(new_prices.values()) < MIN_PRICE or max(new_prices.values()) > MAX_PRICE:
+            raise ValueError(f"New prices should be between {MIN_PRICE} and {MAX_PRICE}.")
+        check_cart_line_prices(new_prices)
+        
+        menu_item_ids = list(prices)
+        MenuItem.objects.filter(id__in=menu_item_ids).update(
+            price=Case(*(When(id=menu_item_id, then=Value(price)) for menu_item_id, price in new_prices.items()), output_field=PRICE_OUTPUT_FIELD)
+        )
+        
+        new_price = Case(
+            *(When(menuitem_id=menu_item_id, then=Value(price)) for menu_item_id, price in new_prices.items()), output_field=PRICE_OUTPUT_FIELD
+        )
+        Cart.objects.filter(menuitem_id__in=menu_item_ids).update(
+            unit_price=new_price,
+            price=ExpressionWrapper(F('quantity') * new_price, output_field=PRICE_OUTPUT_FIELD),
+        )
+        
+        # Queryset update does not send post_save
+        record_catalog_changes(
+            entity=CatalogChange.ENTITY_MENU_ITEM, object_ids=menu_item_ids, action=CatalogChange.ACTION_UPSERT
+        )
+    
+    return menu_item_ids
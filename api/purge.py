@@ -0,0 +1,85 @@
+import datetime
+import time
+
+from django.conf import settings
+from django.db import connection, transaction
+
+from api.models import Order, OrderItem
+
+
+def parse_purge_filters(data) -> dict:
+    """Validate purge filters start_date, end_date, user_id and status, raises ValueError"""
+    filters = {}
+    try:
+        if data.get('start_date'):
+            filters['date__gte'] = datetime.date.fromisoformat(str(data['start_date']))
+        if data.get('end_date'):
+            filters['date__lte'] = datetime.date.fromisoformat(str(data['end_date']))
+    except ValueError:
+        raise ValueError("start_date and end_date should be dates in YYYY-MM-DD format.")
+    
+    if data.get('user_id') not in (None, ''):
+        try:
+            filters['user_id'] = int(data['user_id'])
+        except (TypeError, ValueError):
+            raise ValueError("user_id should be an integer.")
+    
+    if data.get('status') not in (None, ''):
+        if str(data['status']) not in ('0', '1'):
+            raise ValueError("Invalid status value. It should be 0 (in process) or 1 (delivered).")
+        filters['status'] = str(data['status']) == '1'
+    
+    if not filters:
+        raise ValueError("At least one of start_date, end_date, user_id or status filters is required.")
+    return filters
+
+
+def delete_orders_batch(order_ids: list) -> int:
+    """
+    Delete orders and their order items with raw DELETE statements in one short transaction.
+    
+    Django cascade collector would load every related row into memory first. Tables with
+    a foreign key to Order have to be cleaned up here as well.
+    """
+    if not order_ids:
+        return 0
+    
+    quote_name = connection.ops.quote_name
+    placeholders = ', '.join(['%s'] * len(order_ids))
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(
+            f"DELETE FROM {quote_name(OrderItem._meta.db_table)} WHERE {quote_name('order_id')} IN ({placeholders})", order_ids
+        )
+        cursor.execute(
+            f"DELETE FROM {quote_name(Order._meta.db_table)} WHERE {quote_name('id')} IN ({placeholders})", order_ids
+        )
+        return cursor.rowcount
+
+
+def purge_orders(filters: dict, batch_size: int, dry_run: bool = False, max_batches: int = None, progress=None) -> dict:
+    """
+    Delete orders matching filters in batches of `batch_size` ids, each batch in its own transaction.
+    
+    Write lock is released between batches (with `ORDERS_PURGE_PAUSE` seconds pause), so checkout
+    requests can get in. `max_batches` bounds the run time, `done` is False when orders are left.
+    """
+    orders = Order.objects.filter(**filters)
+    if dry_run:
+        return {"matched": orders.count(), "deleted": 0, "batches": 0, "done": True}
+    
+    deleted = 0
+    batches = 0
+    last_id = 0
+    while max_batches is None or batches < max_batches:
+        order_ids = list(orders.filter(id__gt=last_id).order_by('id').values_list('id', flat=True)[:batch_size])
+        if not order_ids:
+            return {"matched": deleted, "deleted": deleted, "batches": batches, "done": True}
+        
+        deleted += delete_orders_batch(order_ids)
+        batches += 1
+        last_id = order_ids[-1]
+        if progress is not None:
+            progress(batches, deleted)
+        time.sleep(settings.ORDERS_PURGE_PAUSE)
+    
+    return {"matched": deleted, "deleted": deleted, "batches": batches, "done": not orders.filter(id__gt=last_id).exists()}
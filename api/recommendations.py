@@ -0,0 +1,154 @@
+"""
+"Frequently ordered together" recommendations.
+
+Order history is folded into a sparse menu item x menu item co-occurrence matrix, `A.T @ A` where
+`A` is the order x menu item incidence matrix of a chunk of order items. The matrix is kept in
+`RECOMMENDATIONS_MATRIX_PATH` with the last folded order id, so a run reads only orders created
+since the previous one. Top-K of every menu item touched by the new orders is stored in
+MenuItemRelation, which is all the `menu-items/<id>/related/` endpoint reads.
+"""
+import os
+
+import numpy as np
+from scipy import sparse
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max
+
+from api.models import MenuItem, MenuItemRelation, Order, OrderItem
+
+
+def empty_matrix() -> sparse.csr_matrix:
+    return sparse.csr_matrix((0, 0), dtype=np.int64)
+
+
+def load_matrix(path) -> tuple:
+    """(co-occurrence matrix, last folded order id), empty matrix when it was never built."""
+    if not os.path.exists(path):
+        return empty_matrix(), 0
+
+    with np.load(path) as data:
+        matrix = sparse.csr_matrix((data['data'], data['indices'], data['indptr']), shape=tuple(data['shape']))
+        return matrix, int(data['last_order_id'])
+
+
+def save_matrix(path, matrix: sparse.csr_matrix, last_order_id: int) -> None:
+    """Write to a temporary file and swap it in, a crashed run keeps the previous matrix."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_path = f"{path}.tmp"
+    with open(temp_path, 'wb') as file:
+        np.savez(
+            file, data=matrix.data, indices=matrix.indices, indptr=matrix.indptr,
+            shape=np.array(matrix.shape), last_order_id=np.array(last_order_id)
+        )
+    os.replace(temp_path, path)
+
+
+def iter_order_item_chunks(after_order_id: int, until_order_id: int, chunk_size: int):
+    """
+    Yield (order_ids, menu_item_ids) arrays of order items with order id in (after_order_id, until_order_id].
+
+    Chunks hold whole orders only, rows of the last order cut by the chunk limit are read again with the next chunk.
+    """
+    order_items = OrderItem.objects.filter(order_id__lte=until_order_id).order_by('order_id')
+    while True:
+        rows = list(order_items.filter(order_id__gt=after_order_id).values_list('order_id', 'menuitem_id')[:chunk_size])
+        if not rows:
+            return
+
+        pairs = np.array(rows, dtype=np.int64)
+        if len(rows) == chunk_size:
+            complete = pairs[:, 0] < pairs[-1, 0]
+            if complete.any():
+                pairs = pairs[complete]
+            else:
+                # Single order larger than a chunk
+                pairs = np.array(
+                    list(order_items.filter(order_id=int(pairs[-1, 0])).values_list('order_id', 'menuitem_id')), dtype=np.int64
+                )
+
+        yield pairs[:, 0], pairs[:, 1]
+        after_order_id = int(pairs[-1, 0])
+
+
+def cooccurrence(order_ids: np.ndarray, menu_item_ids: np.ndarray, size: int) -> sparse.csr_matrix:
+    """Number of orders containing each pair of menu items, menu item ids are the row and column indexes."""
+    _, order_rows = np.unique(order_ids, return_inverse=True)
+    incidence = sparse.csr_matrix(
+        (np.ones(len(order_rows), dtype=np.int64), (order_rows, menu_item_ids)),
+        shape=(order_rows.max() + 1, size)
+    )
+    incidence.data[:] = 1
+
+    matrix = (incidence.T @ incidence).tocsr()
+    # Diagonal is the number of orders of the item itself
+    matrix = (matrix - sparse.diags(matrix.diagonal(), format='csr', dtype=matrix.dtype)).tocsr()
+    matrix.eliminate_zeros()
+    return matrix
+
+
+def fold(matrix: sparse.csr_matrix, order_ids: np.ndarray, menu_item_ids: np.ndarray) -> sparse.csr_matrix:
+    """Add co-occurrences of a chunk of order items, the matrix grows with new menu item ids."""
+    size = max(matrix.shape[0], int(menu_item_ids.max()) + 1)
+    matrix.resize((size, size))
+    return (matrix + cooccurrence(order_ids, menu_item_ids, size)).tocsr()
+
+
+def top_k(matrix: sparse.csr_matrix, row: int, k: int) -> tuple:
+    """(menu item ids, scores) of the k largest values of row, unordered."""
+    if row >= matrix.shape[0]:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+
+    start, end = matrix.indptr[row], matrix.indptr[row + 1]
+    columns, scores = matrix.indices[start:end], matrix.data[start:end]
+    if len(scores) > k:
+        best = np.argpartition(-scores, k)[:k]
+        columns, scores = columns[best], scores[best]
+    return columns, scores
+
+
+def save_relations(matrix: sparse.csr_matrix, menu_item_ids, k: int, replace_all: bool = False) -> int:
+    """Replace top-K relations of menu items, returns number of stored relations."""
+    existing_ids = set(MenuItem.objects.values_list('id', flat=True))
+    menu_item_ids = [int(menu_item_id) for menu_item_id in menu_item_ids if int(menu_item_id) in existing_ids]
+
+    relations = []
+    for menu_item_id in menu_item_ids:
+        columns, scores = top_k(matrix, menu_item_id, k)
+        relations.extend(
+            MenuItemRelation(menuitem_id=menu_item_id, related_id=int(related_id), score=int(score))
+            for related_id, score in zip(columns, scores) if int(related_id) in existing_ids
+        )
+
+    with transaction.atomic():
+        stale_relations = MenuItemRelation.objects.all() if replace_all else MenuItemRelation.objects.filter(menuitem_id__in=menu_item_ids)
+        stale_relations.delete()
+        MenuItemRelation.objects.bulk_create(relations, batch_size=1000)
+    return len(relations)
+
+
+def build_recommendations(full: bool = False, progress=None) -> dict:
+    """
+    Fold orders created since the last run into the co-occurrence matrix and refresh top-K of touched menu items.
+
+    `full` rebuilds the matrix and all relations from the whole order history.
+    """
+    path = settings.RECOMMENDATIONS_MATRIX_PATH
+    matrix, last_order_id = (empty_matrix(), 0) if full else load_matrix(path)
+    until_order_id = Order.objects.aggregate(last_id=Max('id'))['last_id'] or 0
+
+    touched_ids = np.empty(0, dtype=np.int64)
+    folded_order_items = 0
+    for order_ids, menu_item_ids in iter_order_item_chunks(last_order_id, until_order_id, settings.RECOMMENDATIONS_CHUNK_SIZE):
+        matrix = fold(matrix, order_ids, menu_item_ids)
+        touched_ids = np.union1d(touched_ids, menu_item_ids)
+        folded_order_items += len(order_ids)
+        if progress is not None:
+            progress(folded_order_items)
+
+    save_matrix(path, matrix, max(last_order_id, until_order_id))
+    relations = save_relations(
+        matrix, np.arange(matrix.shape[0]) if full else touched_ids, settings.RECOMMENDATIONS_TOP_K, replace_all=full
+    )
+    return {"order_items": folded_order_items, "menu_items": len(touched_ids), "relations": relations}
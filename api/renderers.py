@@ -0,0 +1,97 @@
+"""
+Fast JSON renderer and parser backed by orjson.
+
+Serializers hand over `Decimal` and `date` objects as they are
+(`COERCE_DECIMAL_TO_STRING` and `DATE_FORMAT` in `REST_FRAMEWORK`), the encoder
+writes prices as the same fixed-point strings DRF would produce ("5.26")
+and dates as ISO 8601, without coercing every field in Python first.
+When orjson is not installed both classes fall back to the stdlib `json` module.
+"""
+import codecs
+from decimal import Decimal
+
+from django.conf import settings
+from django.utils.encoding import force_str
+from django.utils.functional import Promise
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class DecimalJSONEncoder(JSONEncoder):
+    """stdlib fallback, same as DRF encoder but keeps Decimal as a fixed-point string instead of float"""
+    def default(self, obj):
+        if isinstance(obj, Decimal):
+            return format(obj, 'f')
+        return super().default(obj)
+
+
+_fallback_encoder = DecimalJSONEncoder()
+
+
+def encode_default(obj):
+    """Types orjson can not serialize natively."""
+    if isinstance(obj, Decimal):
+        return format(obj, 'f')
+    if isinstance(obj, Promise):
+        return force_str(obj)
+    return _fallback_encoder.default(obj)
+
+
+def dumps(data) -> bytes:
+    """Encode data to JSON bytes the same way as the API responses."""
+    if orjson is None:
+        return ORJSONRenderer().render(data)
+
+    content = orjson.dumps(data, default=encode_default, option=orjson.OPT_NON_STR_KEYS)
+    # Keep output a strict javascript subset like DRF JSONRenderer does
+    if b'\xe2\x80\xa8' in content or b'\xe2\x80\xa9' in content:
+        content = content.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+    return content
+
+
+class ORJSONRenderer(JSONRenderer):
+    """Renderer which serializes to JSON with orjson."""
+    encoder_class = DecimalJSONEncoder
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+
+        # Indented output is only asked by the browsable API, orjson supports 2 spaces indent only
+        indent = self.get_indent(accepted_media_type, renderer_context or {})
+        if orjson is None or indent is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        return dumps(data)
+
+
+class ORJSONParser(JSONParser):
+    """
+    Parses JSON-serialized data with orjson.
+
+    Numbers with a fraction are parsed as float, DecimalField converts them back
+    through their shortest repr so `5.26` stays `Decimal('5.26')`.
+    """
+    renderer_class = ORJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        if orjson is None:
+            return super().parse(stream, media_type, parser_context)
+
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+
+        try:
+            content = stream.read()
+            if codecs.lookup(encoding).name != 'utf-8':
+                content = content.decode(encoding)
+            return orjson.loads(content)
+        except (ValueError, UnicodeDecodeError) as exc:
+            raise ParseError('JSON parse error - %s' % str(exc))
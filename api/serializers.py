@@ -1,24 +1,63 @@
 from rest_framework import serializers
 
-from .models import Category, MenuItem, Cart, Order, OrderItem
+from .models import Category, MenuItem, Cart, Order, OrderItem, Job, AuditEvent
 from django.contrib.auth.models import User, Group
 from django.conf import settings
+from django.db import transaction
 
+from .pricing import reprice_cart_lines
+from .jobs import check_job_kwargs, enqueue, get_job_function
 
-class CategorySerializer(serializers.ModelSerializer):
+
+class SparseFieldsetMixin:
+    """Serializer outputs only `fields` passed to constructor, used by `?fields=` query param."""
+    def __init__(self, *args, **kwargs):
+        fields = kwargs.pop('fields', None)
+        super().__init__(*args, **kwargs)
+        
+        if fields is not None:
+            for field_name in set(self.fields) - set(fields):
+                self.fields.pop(field_name)
+
+
+class CategorySerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = Category
         fields = ['id', 'title', 'slug']
 
 
-# TODO: Add validation POST request for price, stock fields
-class MenuItemSerializer(serializers.ModelSerializer):
+class MenuItemSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     category = CategorySerializer(read_only=True)
     category_id = serializers.IntegerField(write_only=True)
+    available = serializers.BooleanField(source='is_available', read_only=True)
     
     class Meta:
         model = MenuItem
-        fields = ['id', 'title', 'price', 'featured', 'category', 'category_id']
+        fields = ['id', 'title', 'price', 'featured', 'category', 'category_id', 'stock', 'available', 'popularity', 'popularity_7d']
+        read_only_fields = ['popularity', 'popularity_7d']
+        # Model columns of computed fields for `?fields=` query param
+        sparse_field_sources = {'available': ['stock']}
+    
+    def validate_price(self, value):
+        if value <= 0:
+            raise serializers.ValidationError("Price should be greater than 0.")
+        return value
+    
+    def update(self, instance, validated_data):
+        price_changed = 'price' in validated_data and validated_data['price'] != instance.price
+        for attr, value in validated_data.items():
+            setattr(instance, attr, value)
+        
+        with transaction.atomic():
+            # Stock is decremented by concurrent checkouts, write back only the changed columns
+            instance.save(update_fields=list(validated_data))
+            # Open carts are charged the current price
+            if price_changed:
+                try:
+                    reprice_cart_lines(menu_item_id=instance.id, price=instance.price)
+                except ValueError as e:
+                    raise serializers.ValidationError({'price': str(e)})
+        return instance
 
 
 class GroupSerializer(serializers.ModelSerializer):
@@ -46,13 +85,14 @@ class CartSerializer(serializers.ModelSerializer):
         fields = ['user', 'menuitem', 'quantity', 'unit_price', 'price']
 
 
-class OrderSerializer(serializers.ModelSerializer):
+class OrderSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     #user = UserSerializer(read_only=True)
     #delivery_crew = UserSerializer(read_only=True)
     
     class Meta:
         model = Order
-        fields = ['id', 'user', 'status', 'delivery_crew', 'date', 'total']
+        fields = ['id', 'user', 'status', 'delivery_crew', 'date', 'total', 'version', 'item_count', 'items_preview']
+        read_only_fields = ['version', 'item_count', 'items_preview']
         
         
 class OrderItemSerializer(serializers.ModelSerializer):
@@ -62,3 +102,39 @@ class OrderItemSerializer(serializers.ModelSerializer):
     class Meta:
         model = OrderItem
         fields = ['order', 'menuitem', 'quantity', 'unit_price', 'price']
+
+
+class JobSerializer(serializers.ModelSerializer):
+    run_at = serializers.DateTimeField(required=False)
+    max_attempts = serializers.IntegerField(required=False, min_value=1, max_value=100)
+    
+    class Meta:
+        model = Job
+        fields = ['id', 'name', 'kwargs', 'status', 'run_at', 'attempts', 'max_attempts', 'last_error', 'created_at', 'finished_at']
+        read_only_fields = ['status', 'attempts', 'last_error', 'created_at', 'finished_at']
+    
+    def validate_name(self, value):
+        if get_job_function(value) is None:
+            raise serializers.ValidationError(f"Unknown job {value!r}.")
+        return value
+    
+    def validate_kwargs(self, value):
+        if not isinstance(value, dict):
+            raise serializers.ValidationError("Must be an object of job arguments.")
+        return value
+    
+    def validate(self, attrs):
+        try:
+            check_job_kwargs(attrs['name'], attrs.get('kwargs') or {})
+        except ValueError as e:
+            raise serializers.ValidationError({'kwargs': str(e)})
+        return attrs
+    
+    def create(self, validated_data):
+        return enqueue(**validated_data)
+
+
+class AuditEventSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = AuditEvent
+        fields = ['id', 'actor', 'action', 'entity', 'entity_id', 'changes', 'created_at']
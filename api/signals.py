@@ -0,0 +1,22 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from api.models import Category, MenuItem, CatalogChange
+from api.catalog import record_catalog_changes
+
+
+# Catalog change feed
+@receiver(post_save, sender=Category)
+@receiver(post_save, sender=MenuItem)
+def record_catalog_upsert(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    entity = CatalogChange.ENTITY_CATEGORY if sender is Category else CatalogChange.ENTITY_MENU_ITEM
+    record_catalog_changes(entity=entity, object_ids=[instance.pk], action=CatalogChange.ACTION_UPSERT)
+
+
+@receiver(post_delete, sender=Category)
+@receiver(post_delete, sender=MenuItem)
+def record_catalog_delete(sender, instance, **kwargs):
+    entity = CatalogChange.ENTITY_CATEGORY if sender is Category else CatalogChange.ENTITY_MENU_ITEM
+    record_catalog_changes(entity=entity, object_ids=[instance.pk], action=CatalogChange.ACTION_DELETE)
@@ -0,0 +1,88 @@
+"""
+Single-flight request coalescing: concurrent identical computations run once and share the result.
+
+In a process, the first thread for a key is the leader and the rest wait on its event.
+Across processes, the leaders take a lock with `cache.add()` (atomic in the shared cache
+backend), the winner computes and stores the result for `SINGLE_FLIGHT_RESULT_TTL`
+seconds and the others poll for it. Pollers keep contending for the lock, when the lock of
+a crashed or stuck leader expires after `SINGLE_FLIGHT_LOCK_TIMEOUT` one of them takes over
+and the rest wait for its result. Only a waiter that got nothing for `SINGLE_FLIGHT_LOCK_TIMEOUT +
+SINGLE_FLIGHT_WAIT_TIMEOUT` seconds, e.g. with a broken cache, computes the result itself.
+"""
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+
+
+MISSING = object()
+
+
+class Flight:
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.result = MISSING
+
+
+_flights = {}
+_flights_lock = threading.Lock()
+
+
+def single_flight(key: str, compute):
+    """Return compute() result shared by concurrent callers with the same key, result has to be picklable."""
+    with _flights_lock:
+        flight = _flights.get(key)
+        is_leader = flight is None
+        if is_leader:
+            flight = _flights[key] = Flight()
+
+    if not is_leader:
+        # Longer than the leader waits, a leader stuck behind another process gives up first
+        if not flight.done.wait(get_max_wait() + settings.SINGLE_FLIGHT_WAIT_TIMEOUT):
+            return compute()
+        if flight.result is MISSING:
+            # Leader failed, the followers contend again instead of all computing at once
+            return single_flight(key, compute)
+        return flight.result
+
+    try:
+        flight.result = coalesce_across_processes(key, compute)
+        return flight.result
+    finally:
+        with _flights_lock:
+            _flights.pop(key, None)
+        flight.done.set()
+
+
+def get_max_wait() -> float:
+    return settings.SINGLE_FLIGHT_LOCK_TIMEOUT + settings.SINGLE_FLIGHT_WAIT_TIMEOUT
+
+
+def coalesce_across_processes(key: str, compute):
+    result_key = f"singleflight:{key}:result"
+    lock_key = f"singleflight:{key}:lock"
+    token = uuid.uuid4().hex
+    deadline = time.monotonic() + get_max_wait()
+    interval = settings.SINGLE_FLIGHT_POLL_INTERVAL
+
+    while True:
+        result = cache.get(result_key, MISSING)
+        if result is not MISSING:
+            return result
+
+        if cache.add(lock_key, token, settings.SINGLE_FLIGHT_LOCK_TIMEOUT):
+            try:
+                result = compute()
+                cache.set(result_key, result, settings.SINGLE_FLIGHT_RESULT_TTL)
+                return result
+            finally:
+                # Lock may have expired and been taken by another leader meanwhile
+                if cache.get(lock_key) == token:
+                    cache.delete(lock_key)
+
+        if time.monotonic() >= deadline:
+            return compute()
+        time.sleep(interval)
+        interval = min(interval * 2, 0.25)
@@ -0,0 +1,54 @@
+from django.db.models import Case, F, PositiveIntegerField, Q, When
+
+from api.catalog import record_catalog_changes
+from api.models import MenuItem, CatalogChange
+
+
+class InsufficientStock(Exception):
+    """Some menu items have less stock than requested, the transaction should be rolled back."""
+
+
+def decrement_stock(quantities: dict) -> None:
+    """
+    Decrement stock of menu items {menu_item_id: quantity} with a single conditional UPDATE, without row locks.
+    
+    `UPDATE ... SET stock = CASE WHEN id=? THEN stock - ? ... END WHERE (id=? AND stock >= ?) OR ...`
+    Items with not tracked stock (NULL) match the condition and stay NULL. Raises InsufficientStock when
+    fewer rows were updated than requested, call it inside `transaction.atomic()` so the rows
+    decremented so far are rolled back.
+    """
+    if not quantities:
+        return
+    if any(quantity <= 0 for quantity in quantities.values()):
+        raise ValueError("Quantities should be positive.")
+    
+    condition = Q()
+    for menu_item_id, quantity in quantities.items():
+        condition |= Q(id=menu_item_id) & (Q(stock__isnull=True) | Q(stock__gte=quantity))
+    
+    updated = MenuItem.objects.filter(condition).update(
+        stock=Case(
+            *(When(id=menu_item_id, then=F('stock') - quantity) for menu_item_id, quantity in quantities.items()),
+            default=F('stock'),
+            output_field=PositiveIntegerField(),
+        )
+    )
+    if updated < len(quantities):
+        raise InsufficientStock()
+    
+    # Queryset update does not send post_save. Only items that ran out are recorded, a change on every
+    # checkout would invalidate the catalog caches, stock counts in cached lists lag until they refresh.
+    # Restocking is a save of the item, which is recorded by the post_save handler.
+    sold_out_ids = MenuItem.objects.filter(id__in=quantities, stock=0).values_list('id', flat=True)
+    record_catalog_changes(entity=CatalogChange.ENTITY_MENU_ITEM, object_ids=sold_out_ids, action=CatalogChange.ACTION_UPSERT)
+
+
+def get_stock_shortages(quantities: dict) -> dict:
+    """Menu items with less stock than requested, {menu_item_id: stock}. Deleted items have 0 stock."""
+    stocks = dict(MenuItem.objects.filter(id__in=quantities).values_list('id', 'stock'))
+    shortages = {}
+    for menu_item_id, quantity in quantities.items():
+        stock = stocks.get(menu_item_id, 0)
+        if stock is not None and stock < quantity:
+            shortages[menu_item_id] = stock
+    return shortages
@@ -0,0 +1,58 @@
+"""Jobs run by `manage.py runworker`, periodic ones are scheduled in `JOBS_SCHEDULE`."""
+import datetime
+
+from django.conf import settings
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+
+from api.carts import evict_expired_cart_lines
+from api.catalog import compact_catalog_changes
+from api.events import purge_order_event_messages
+from api.jobs import job, purge_finished_jobs
+from api.popularity import decay_popularity
+from api.webhooks import purge_webhook_events
+
+
+@job('decay_popularity')
+def decay_popularity_job():
+    decay_popularity()
+
+
+@job('compact_catalog_changes')
+def compact_catalog_changes_job(tombstone_days: int = None):
+    compact_catalog_changes(tombstone_age=datetime.timedelta(days=tombstone_days or settings.CATALOG_TOMBSTONE_RETENTION_DAYS))
+
+
+@job('build_recommendations')
+def build_recommendations_job(full: bool = False):
+    # numpy and scipy are imported only by the worker that runs it
+    from api.recommendations import build_recommendations
+    build_recommendations(full=full)
+
+
+@job('delete_expired_tokens')
+def delete_expired_tokens():
+    """Auth tokens older than `AUTH_TOKEN_MAX_AGE_DAYS`, tokens never expire when it is None."""
+    if settings.AUTH_TOKEN_MAX_AGE_DAYS is None:
+        return
+    Token.objects.filter(created__lt=timezone.now() - datetime.timedelta(days=settings.AUTH_TOKEN_MAX_AGE_DAYS)).delete()
+
+
+@job('evict_expired_carts')
+def evict_expired_carts():
+    evict_expired_cart_lines(batch_size=settings.CART_EVICTION_BATCH_SIZE)
+
+
+@job('purge_jobs')
+def purge_jobs():
+    purge_finished_jobs(age=datetime.timedelta(days=settings.JOBS_RETENTION_DAYS))
+
+
+@job('purge_webhook_events')
+def purge_webhook_events_job():
+    purge_webhook_events(age=datetime.timedelta(days=settings.WEBHOOK_EVENTS_RETENTION_DAYS))
+
+
+@job('purge_order_event_messages')
+def purge_order_event_messages_job():
+    purge_order_event_messages(age=datetime.timedelta(seconds=settings.ORDER_EVENTS_FANOUT_RETENTION))
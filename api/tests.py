@@ -1,3 +1,955 @@
-from django.test import TestCase
+import asyncio
+import datetime
+import gzip
+import io
+import os
+import tempfile
+import threading
+import time
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+import orjson
+import requests
+from django.conf import settings
+from django.contrib.auth.models import User, Group
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import OperationalError, connection
+from django.http import HttpResponse
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from api import jobs, views
+from api.audit import audit_buffer
+from api.carts import evict_expired_cart_lines
+from api.catalog import compact_catalog_changes
+from api.dispatch import DeliveryDispatcher
+from api.events import DatabaseFanout, broker, purge_order_event_messages, user_channel
+from api.management.commands import dispatch_orders
+from api.models import AuditEvent, Category, MenuItem, MenuItemSales, Cart, Order, OrderItem, Job, WebhookEndpoint, OrderEventListener, OrderEventMessage, WebhookEvent
+from api.order_summary import summarize_order_items
+from api.orders import update_orders_fields
+from api.popularity import TOP_SELLERS, TopSellers, decay_popularity
+from api.renderers import dumps
+from api.serializers import OrderSerializer
+from api.singleflight import single_flight
+from api.stock import decrement_stock
+from api.webhooks import SIGNATURE_HEADER, dispatch_webhooks, record_webhook_events, sign, verify_signature
+
+
+@override_settings(
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+    CATALOG_SNAPSHOT_PATH='/nonexistent/catalog.snapshot',
+)
+class APITestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        manager_group = Group.objects.create(name=settings.MANAGER_GROUP_NAME)
+        delivery_crew_group = Group.objects.create(name=settings.DELIVERY_CREW_GROUP_NAME)
+        self.manager = User.objects.create_user('manager', password='password')
+        self.manager.groups.add(manager_group)
+        self.courier = User.objects.create_user('courier', password='password')
+        self.courier.groups.add(delivery_crew_group)
+        self.customer = User.objects.create_user('customer', password='password')
+
+        self.category = Category.objects.create(slug='main-dish', title='Main dish')
+        self.menu_items = [
+            MenuItem.objects.create(title=f'Item {i}', price='2.50', featured=False, category=self.category)
+            for i in range(3)
+        ]
+
+    def client_for(self, user) -> APIClient:
+        client = APIClient()
+        client.force_authenticate(user=user)
+        return client
+
+    def create_order(self, **fields) -> Order:
+        return Order.objects.create(user=self.customer, date=datetime.date.today(), total='2.50', status=False, **fields)
+
+
+class OrderVersionTests(APITestCase):
+    def test_stale_version_field_is_a_conflict(self):
+        order = self.create_order()
+        client = self.client_for(self.manager)
+
+        response = client.put(f'/api/v1/orders/{order.id}', {'username': 'courier', 'version': 0}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['ETag'], '"1"')
+
+        response = client.put(f'/api/v1/orders/{order.id}', {'username': 'courier', 'version': 0}, format='json')
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()['version'], 1)
+
+    def test_stale_if_match_is_a_failed_precondition(self):
+        order = self.create_order()
+        Order.objects.filter(id=order.id).update(version=3)
+
+        response = self.client_for(self.courier).patch(
+            f'/api/v1/orders/{order.id}', {'status': '1'}, format='json', HTTP_IF_MATCH='"2"'
+        )
+        self.assertEqual(response.status_code, 412)
+        order.refresh_from_db()
+        self.assertFalse(order.status)
+        self.assertEqual(order.version, 3)
+
+
+class CheckoutStockTests(APITestCase):
+    def test_shortage_rolls_back_the_whole_checkout(self):
+        plenty, short = self.menu_items[:2]
+        MenuItem.objects.filter(id=plenty.id).update(stock=5)
+        MenuItem.objects.filter(id=short.id).update(stock=3)
+        client = self.client_for(self.customer)
+        client.post('/api/v1/cart/menu-items', {'menuitem': plenty.id, 'quantity': 2}, format='json')
+        client.post('/api/v1/cart/menu-items', {'menuitem': short.id, 'quantity': 3}, format='json')
+        # Sold to someone else after it was added to the cart
+        MenuItem.objects.filter(id=short.id).update(stock=1)
+
+        response = client.post('/api/v1/orders/', format='json')
+        self.assertEqual(response.status_code, 409)
+        self.assertIn(str(short.id), response.json()['detail'])
+        self.assertEqual(MenuItem.objects.get(id=plenty.id).stock, 5)
+        self.assertEqual(Cart.objects.filter(user=self.customer).count(), 2)
+        self.assertFalse(Order.objects.exists())
+
+    def test_checkout_decrements_stock(self):
+        menu_item = self.menu_items[0]
+        MenuItem.objects.filter(id=menu_item.id).update(stock=5)
+        client = self.client_for(self.customer)
+        client.post('/api/v1/cart/menu-items', {'menuitem': menu_item.id, 'quantity': 2}, format='json')
+
+        self.assertEqual(client.post('/api/v1/orders/', format='json').status_code, 201)
+        self.assertEqual(MenuItem.objects.get(id=menu_item.id).stock, 3)
+        self.assertFalse(Cart.objects.filter(user=self.customer).exists())
+
+    def test_non_positive_quantities_are_rejected(self):
+        menu_item = self.menu_items[0]
+        MenuItem.objects.filter(id=menu_item.id).update(stock=5)
+        client = self.client_for(self.customer)
+
+        for quantity in (0, -5):
+            response = client.post('/api/v1/cart/menu-items', {'menuitem': menu_item.id, 'quantity': quantity}, format='json')
+            self.assertEqual(response.status_code, 400)
+        self.assertFalse(Cart.objects.exists())
+
+        with self.assertRaises(ValueError):
+            decrement_stock({menu_item.id: -5})
+        self.assertEqual(MenuItem.objects.get(id=menu_item.id).stock, 5)
+
+
+class CatalogChangesTests(APITestCase):
+    def sync(self, client, limit: int) -> tuple:
+        """Follow the feed like a client until `has_more` is false, returns (menu item ids, seq, pages)"""
+        menu_item_ids, since, full_sync, pages = [], 0, False, 0
+        while True:
+            query = f'?since={since}&limit={limit}' + ('&full_sync=1' if full_sync else '')
+            page = client.get(f'/api/v1/catalog/changes/{query}').json()
+            pages += 1
+            self.assertLess(pages, 50, "Sync does not terminate.")
+            menu_item_ids += [menu_item['id'] for menu_item in page['menu_items']]
+            since, full_sync = page['seq'], page['full_sync'] and page['has_more']
+            if not page['has_more']:
+                return menu_item_ids, since, pages
+
+    def test_full_sync_pages_past_compacted_changes(self):
+        client = self.client_for(self.customer)
+        for i in range(8):
+            MenuItem.objects.create(title=f'Extra {i}', price='1.00', featured=False, category=self.category)
+        MenuItem.objects.filter(title='Extra 3').delete()
+        # Every client is behind the compacted tombstone
+        compact_catalog_changes(tombstone_age=datetime.timedelta(seconds=-1))
+
+        menu_item_ids, seq, pages = self.sync(client, limit=2)
+        self.assertGreater(pages, 1)
+        self.assertCountEqual(menu_item_ids, MenuItem.objects.values_list('id', flat=True))
+
+        page = client.get(f'/api/v1/catalog/changes/?since={seq}').json()
+        self.assertFalse(page['full_sync'])
+        self.assertEqual(page['menu_items'], [])
+
+    def test_delta_after_sync(self):
+        client = self.client_for(self.customer)
+        _, seq, _ = self.sync(client, limit=100)
+        menu_item = self.menu_items[1]
+        menu_item.title = 'Renamed'
+        menu_item.save()
+
+        page = client.get(f'/api/v1/catalog/changes/?since={seq}').json()
+        self.assertEqual([item['title'] for item in page['menu_items']], ['Renamed'])
+        self.assertGreater(page['seq'], seq)
+
+
+class BatchTests(APITestCase):
+    # Consecutive reads run in pool threads with their own connections, which don't see the test transaction
+    def test_sub_requests_run_in_order(self):
+        client = self.client_for(self.customer)
+        response = client.post('/api/v1/batch', [
+            {'method': 'GET', 'path': '/api/v1/menu-items/?perpage=10'},
+            {'method': 'POST', 'path': '/api/v1/cart/menu-items', 'body': {'menuitem': self.menu_items[0].id, 'quantity': 2}},
+            {'method': 'GET', 'path': '/api/v1/cart/menu-items'},
+        ], format='json')
+
+        self.assertEqual(response.status_code, 200)
+        results = response.json()
+        self.assertEqual([result['status'] for result in results], [200, 200, 200])
+        self.assertEqual(len(results[0]['body']), 3)
+        self.assertEqual(len(results[2]['body']), 1)
+
+    def test_nested_batch_missing_and_foreign_paths(self):
+        client = self.client_for(self.customer)
+        response = client.post('/api/v1/batch', [
+            {'method': 'POST', 'path': '/api/v1/batch', 'body': []},
+            {'method': 'GET', 'path': '/api/v1/missing/'},
+        ], format='json')
+        self.assertEqual([result['status'] for result in response.json()], [400, 404])
+
+        response = client.post('/api/v1/batch', [{'method': 'GET', 'path': '/admin/'}], format='json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_streaming_endpoint_fails_only_its_item(self):
+        response = self.client_for(self.customer).post('/api/v1/batch', [
+            {'method': 'GET', 'path': '/api/v1/orders/events'},
+            {'method': 'POST', 'path': '/api/v1/cart/menu-items', 'body': {'menuitem': self.menu_items[0].id, 'quantity': 1}},
+        ], format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([result['status'] for result in response.json()], [400, 200])
+
+    def test_body_that_is_not_json_fails_only_its_item(self):
+        client = self.client_for(self.customer)
+        with mock.patch.object(views, 'handle_items', return_value=HttpResponse(b'\x1f\x8b\x08\x00')), self.assertLogs('api.views', level='ERROR'):
+            response = client.post('/api/v1/batch', [
+                {'method': 'GET', 'path': '/api/v1/menu-items/'},
+                {'method': 'POST', 'path': '/api/v1/cart/menu-items', 'body': {'menuitem': self.menu_items[0].id, 'quantity': 1}},
+            ], format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([result['status'] for result in response.json()], [502, 200])
+
+
+class OrderEventsTests(TestCase):
+    def test_subscriber_gets_events_of_its_channel_only(self):
+        async def receive():
+            queue = broker.subscribe('user:1')
+            try:
+                # Published from a worker thread like the commit hooks of sync views
+                await asyncio.to_thread(broker.publish_local, 'user:2', {'type': 'order.assigned', 'order': {'id': 2}})
+                await asyncio.to_thread(broker.publish_local, 'user:1', {'type': 'order.assigned', 'order': {'id': 1}})
+                return await asyncio.wait_for(queue.get(), timeout=1)
+            finally:
+                broker.unsubscribe('user:1', queue)
+
+        with mock.patch.object(broker, '_started', True):
+            self.assertEqual(asyncio.run(receive())['order'], {'id': 1})
+
+    def test_events_reach_other_processes_only_while_they_listen(self):
+        publisher, listener = DatabaseFanout(), DatabaseFanout()
+        events = [('user:1', {'type': 'order.assigned', 'order': {'id': 1}}), ('user:1', {'type': 'order.assigned', 'order': {'id': 2}})]
+
+        with mock.patch('api.events.get_process_id', return_value='web:1'):
+            publisher.publish_many(events)
+        self.assertFalse(OrderEventMessage.objects.exists())
+
+        delivered = []
+        with mock.patch('api.events.get_process_id', return_value='web:2'):
+            listener.poll(lambda channel, event: delivered.append((channel, event['order']['id'])))
+        with mock.patch('api.events.get_process_id', return_value='web:1'):
+            publisher.listeners_checked_at = None  # the cached check has expired
+            publisher.publish_many(events)
+        self.assertEqual(OrderEventMessage.objects.count(), 1)
+
+        with mock.patch('api.events.get_process_id', return_value='web:2'):
+            listener.poll(lambda channel, event: delivered.append((channel, event['order']['id'])))
+        # Events of the publishing process were delivered by itself
+        with mock.patch('api.events.get_process_id', return_value='web:1'):
+            DatabaseFanout().poll(lambda channel, event: delivered.append('redelivered'))
+        self.assertEqual(delivered, [('user:1', 1), ('user:1', 2)])
+
+    def test_stopped_listeners_are_ignored_and_purged(self):
+        stopped_at = timezone.now() - datetime.timedelta(seconds=settings.ORDER_EVENTS_FANOUT_LISTENER_TIMEOUT + 1)
+        OrderEventListener.objects.create(origin='web:2', seen_at=stopped_at)
+        self.assertFalse(DatabaseFanout().is_listened())
+
+        purge_order_event_messages(age=datetime.timedelta(seconds=1))
+        self.assertFalse(OrderEventListener.objects.exists())
+
+
+class DispatcherTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.other_courier = User.objects.create_user('other-courier', password='password')
+        self.other_courier.groups.add(Group.objects.get(name=settings.DELIVERY_CREW_GROUP_NAME))
+
+    def dispatch(self, dispatcher: DeliveryDispatcher) -> tuple:
+        """Run a cycle and its commit hooks, returns (assigned count, recorded audit events)"""
+        # Commit hooks run when the last context exits
+        with mock.patch.object(audit_buffer, 'add') as add_audit_events, \
+                mock.patch.object(broker.fanout, 'is_listened', return_value=True), self.captureOnCommitCallbacks(execute=True):
+            assigned = dispatcher.dispatch()
+        return assigned, [event for call in add_audit_events.call_args_list for event in call.args[0]]
+
+    def test_orders_are_balanced_and_recorded_like_manual_assignments(self):
+        for _ in range(2):
+            self.create_order(delivery_crew=self.other_courier)
+        orders = [self.create_order() for _ in range(4)]
+
+        assigned, audit_events = self.dispatch(DeliveryDispatcher(batch_size=100, refresh_every=10))
+
+        self.assertEqual(assigned, 4)
+        self.assertEqual(Order.objects.filter(delivery_crew=self.courier).count(), 3)
+        self.assertEqual(Order.objects.filter(delivery_crew=self.other_courier).count(), 3)
+
+        # Payloads are built without a serializer pass but have to match it
+        payloads = {event.payload['id']: event.payload for event in WebhookEvent.objects.filter(event_type='order.assigned')}
+        self.assertEqual(set(payloads), {order.id for order in orders})
+        for order in Order.objects.filter(id__in=payloads):
+            self.assertEqual(payloads[order.id], orjson.loads(dumps(OrderSerializer(order).data)))
+
+        self.assertEqual(sorted(event['entity_id'] for event in audit_events), sorted(payloads))
+        messages = {message.channel: message.events for message in OrderEventMessage.objects.all()}
+        self.assertEqual(len(messages[f'user:{self.courier.id}']), 3)
+        self.assertEqual(len(messages[f'user:{self.other_courier.id}']), 1)
+
+    def test_order_changed_since_it_was_read_is_skipped(self):
+        orders = [self.create_order() for _ in range(3)]
+        dispatcher = DeliveryDispatcher(batch_size=100, refresh_every=10)
+        assign = dispatcher.assign
+
+        def assign_after_manager(order_ids):
+            assignments = assign(order_ids)
+            self.client_for(self.manager).put(f'/api/v1/orders/{orders[0].id}', {'username': 'other-courier'}, format='json')
+            return assignments
+
+        WebhookEvent.objects.all().delete()
+        with mock.patch.object(dispatcher, 'assign', side_effect=assign_after_manager):
+            assigned, _ = self.dispatch(dispatcher)
+
+        self.assertEqual(assigned, 2)
+        self.assertEqual(Order.objects.get(id=orders[0].id).delivery_crew_id, self.other_courier.id)
+        self.assertEqual(
+            sorted(event.payload['id'] for event in WebhookEvent.objects.all()), [order.id for order in orders]
+        )
+        # The manual assignment is counted at the next refresh, a skipped order is not counted at all
+        self.assertEqual(sum(dispatcher.loads.values()), 2)
+
+    def test_loop_keeps_going_after_a_failed_cycle(self):
+        for _ in range(2):
+            self.create_order()
+        save_assignments = DeliveryDispatcher.save_assignments
+        cycles = []
+
+        def fail_once(dispatcher, *args):
+            cycles.append(dispatcher.cycles)
+            if len(cycles) == 1:
+                raise OperationalError("database is locked")
+            return save_assignments(dispatcher, *args)
+
+        with mock.patch.object(DeliveryDispatcher, 'save_assignments', fail_once), \
+                mock.patch.object(dispatch_orders.time, 'sleep', side_effect=[None, None, KeyboardInterrupt]), \
+                mock.patch.object(audit_buffer, 'add'), self.captureOnCommitCallbacks(execute=True), \
+                self.assertLogs('api.management.commands.dispatch_orders', level='ERROR'):
+            with self.assertRaises(KeyboardInterrupt):
+                call_command('dispatch_orders', '--loop', '--interval', '0', stdout=io.StringIO())
+
+        # Loads counted for the failed cycle are reloaded by the next one
+        self.assertEqual(cycles, [1, 1])
+        self.assertFalse(Order.objects.filter(delivery_crew__isnull=True).exists())
+
+
+class BulkOrderTests(APITestCase):
+    def test_bulk_status_validates_every_item(self):
+        orders = [self.create_order() for _ in range(3)]
+        response = self.client_for(self.manager).patch('/api/v1/orders/', [
+            {'id': orders[0].id, 'status': [1]},
+            {'id': orders[1].id, 'status': {'value': 1}},
+            {'id': orders[2].id, 'status': '1'},
+            {'id': 999999, 'status': '1'},
+            {'id': orders[2].id, 'status': '0'},
+        ], format='json')
+
+        self.assertEqual(response.status_code, 207)
+        self.assertEqual([result['status_code'] for result in response.json()], [400, 400, 200, 404, 400])
+        self.assertEqual(list(Order.objects.order_by('id').values_list('status', 'version')), [(False, 0), (False, 0), (True, 1)])
+
+    def test_bulk_assignment_with_stale_version(self):
+        orders = [self.create_order() for _ in range(2)]
+        Order.objects.filter(id=orders[1].id).update(version=2)
+        response = self.client_for(self.manager).put('/api/v1/orders/', [
+            {'id': orders[0].id, 'username': 'courier', 'version': 0},
+            {'id': orders[1].id, 'username': 'courier', 'version': 0},
+            {'id': orders[0].id, 'username': 'customer'},
+        ], format='json')
+
+        self.assertEqual(response.status_code, 207)
+        self.assertEqual([result['status_code'] for result in response.json()], [200, 409, 400])
+        self.assertEqual(Order.objects.get(id=orders[0].id).delivery_crew_id, self.courier.id)
+        self.assertIsNone(Order.objects.get(id=orders[1].id).delivery_crew_id)
+
+    def test_update_reports_exactly_the_changed_orders_as_conflicts(self):
+        orders = [self.create_order() for _ in range(4)]
+        Order.objects.filter(id=orders[3].id).update(version=2)
+        # Changed by someone else to the version our update would have written
+        Order.objects.filter(id=orders[1].id).update(version=1, delivery_crew=self.manager)
+
+        versions = {orders[0].id: 0, orders[1].id: 0, orders[2].id: 0, orders[3].id: 2}
+        conflicts = update_orders_fields(versions=versions, chunk_size=2, delivery_crew_id=self.courier.id)
+
+        self.assertEqual(conflicts, {orders[1].id})
+        self.assertEqual(
+            list(Order.objects.order_by('id').values_list('delivery_crew_id', 'version')),
+            [(self.courier.id, 1), (self.manager.id, 1), (self.courier.id, 1), (self.courier.id, 3)]
+        )
+
+    def test_bulk_body_must_be_a_list(self):
+        response = self.client_for(self.manager).patch('/api/v1/orders/', {'id': 1, 'status': '1'}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+
+class JobQueueTests(TestCase):
+    def setUp(self):
+        # Load the jobs of api.tasks before registering test jobs
+        jobs.get_job_function('purge_jobs')
+
+    def test_job_is_claimed_once(self):
+        job = jobs.enqueue('purge_jobs')
+
+        self.assertEqual([claimed.id for claimed in jobs.claim_jobs('worker-1', limit=10)], [job.id])
+        self.assertEqual(jobs.claim_jobs('worker-2', limit=10), [])
+
+        # Lease of a lost worker expires and the job is claimed again
+        Job.objects.filter(id=job.id).update(locked_until=timezone.now() - datetime.timedelta(seconds=1))
+        reclaimed = jobs.claim_jobs('worker-2', limit=10)
+        self.assertEqual([claimed.id for claimed in reclaimed], [job.id])
+        self.assertEqual(reclaimed[0].attempts, 2)
+
+    def test_failed_job_is_retried_with_backoff_then_failed(self):
+        def always_fails():
+            raise RuntimeError("Boom")
+
+        with mock.patch.dict(jobs.JOBS, {'always_fails': always_fails}), self.assertLogs('api.jobs', level='ERROR'):
+            job = jobs.enqueue('always_fails', max_attempts=2)
+
+            claimed, = jobs.claim_jobs('worker-1', limit=1)
+            self.assertFalse(jobs.run_job(claimed))
+            job.refresh_from_db()
+            self.assertEqual(job.status, Job.STATUS_QUEUED)
+            self.assertGreater(job.run_at, timezone.now())
+            self.assertIn("Boom", job.last_error)
+            self.assertEqual(jobs.claim_jobs('worker-1', limit=1), [])
+
+            Job.objects.filter(id=job.id).update(run_at=timezone.now())
+            claimed, = jobs.claim_jobs('worker-1', limit=1)
+            self.assertFalse(jobs.run_job(claimed))
+            job.refresh_from_db()
+            self.assertEqual(job.status, Job.STATUS_FAILED)
+            self.assertEqual(job.attempts, 2)
+
+    def test_successful_job_is_done(self):
+        with mock.patch.dict(jobs.JOBS, {'noop': lambda: None}):
+            jobs.enqueue('noop')
+            claimed, = jobs.claim_jobs('worker-1', limit=1)
+            self.assertTrue(jobs.run_job(claimed))
+            claimed.refresh_from_db()
+            self.assertEqual(claimed.status, Job.STATUS_DONE)
+
+    def test_unknown_arguments_are_rejected_at_enqueue(self):
+        with self.assertRaises(ValueError):
+            jobs.enqueue('purge_jobs', kwargs={'age': 1})
+        self.assertFalse(Job.objects.exists())
+
+    def test_worker_keeps_polling_after_a_failed_poll(self):
+        claim_jobs, claims = jobs.claim_jobs, []
+
+        def claim_after_error(*args):
+            claims.append(args)
+            if len(claims) == 1:
+                raise OperationalError("database is locked")
+            return claim_jobs(*args)
+
+        with mock.patch.dict(jobs.JOBS, {'noop': lambda: None}):
+            job = jobs.enqueue('noop')
+            worker = jobs.Worker(concurrency=1, poll_interval=0)
+            with mock.patch.object(jobs, 'claim_jobs', claim_after_error), self.assertLogs('api.jobs', level='ERROR'), \
+                    mock.patch.object(jobs, 'run_job_in_thread', side_effect=lambda job: worker.stop()) as run_job:
+                self.assertEqual(worker.run(), 1)
+
+        self.assertEqual(len(claims), 2)
+        self.assertEqual(run_job.call_args.args[0].id, job.id)
+
+    def test_schedule_is_checked_when_the_worker_starts(self):
+        jobs.Scheduler(settings.JOBS_SCHEDULE)
+        for entry in ({'job': 'missing', 'cron': '0 * * * *'},
+                      {'job': 'purge_jobs', 'cron': '0 * * * *', 'kwargs': {'age': 1}},
+                      {'job': 'purge_jobs', 'cron': '0 25 * * *'}):
+            with self.assertRaisesMessage(ValueError, "Invalid JOBS_SCHEDULE entry 'hourly'"):
+                jobs.Scheduler({'hourly': entry})
+
+    def test_cron_schedule(self):
+        schedule = jobs.CronSchedule('*/15 9-17 * * 1-5')
+        friday_evening = datetime.datetime(2024, 5, 17, 17, 50)
+        self.assertEqual(schedule.next_after(friday_evening), datetime.datetime(2024, 5, 20, 9, 0))
+        with self.assertRaises(ValueError):
+            jobs.CronSchedule('61 * * * *')
+
+
+class JSONRenderingTests(APITestCase):
+    def test_decimals_and_dates_are_rendered_like_drf(self):
+        order = self.create_order()
+
+        response = self.client_for(self.customer).get('/api/v1/orders/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()[0]['id'], order.id)
+        self.assertEqual(response.json()[0]['total'], '2.50')
+        self.assertEqual(response.json()[0]['date'], datetime.date.today().isoformat())
+        self.assertEqual(
+            dumps({'price': Decimal('1E+1'), 'date': datetime.date(2024, 1, 2), 'title': 'a\u2028b'}),
+            b'{"price":"10","date":"2024-01-02","title":"a\\u2028b"}'
+        )
+
+    def test_posted_number_is_parsed_to_an_exact_decimal(self):
+        response = self.client_for(self.manager).post(
+            '/api/v1/menu-items/', f'{{"title": "Soup", "price": 5.26, "featured": false, "category_id": {self.category.id}}}',
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['price'], '5.26')
+        self.assertEqual(MenuItem.objects.get(title='Soup').price, Decimal('5.26'))
+
+
+class SparseFieldsetTests(APITestCase):
+    def test_only_requested_fields_are_selected_and_returned(self):
+        client = self.client_for(self.customer)
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get('/api/v1/menu-items/?fields=id,price')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()[0], {'id': self.menu_items[0].id, 'price': '2.50'})
+        menu_item_queries = [query['sql'] for query in queries if 'FROM "api_menuitem"' in query['sql']]
+        self.assertTrue(menu_item_queries)
+        self.assertFalse([sql for sql in menu_item_queries if '"title"' in sql or 'api_category' in sql])
+
+        response = client.get('/api/v1/menu-items/?fields=title,category')
+        self.assertEqual(response.json()[0], {'title': 'Item 0', 'category': {'id': self.category.id, 'title': 'Main dish', 'slug': 'main-dish'}})
+
+    def test_unknown_and_write_only_fields_are_rejected(self):
+        client = self.client_for(self.customer)
+        for fields in ('id,secret', 'category_id', ','):
+            response = client.get(f'/api/v1/menu-items/?fields={fields}')
+            self.assertEqual(response.status_code, 400, fields)
+
+        self.create_order()
+        response = client.get('/api/v1/orders/?fields=id,status')
+        self.assertEqual(list(response.json()[0]), ['id', 'status'])
+
+
+class OrderEventStreamTests(APITestCase):
+    def test_status_change_is_published_to_customer_and_courier_after_commit(self):
+        order = self.create_order(delivery_crew=self.courier)
+
+        with mock.patch.object(broker, 'publish_many') as publish_many, self.captureOnCommitCallbacks(execute=True):
+            response = self.client_for(self.courier).patch(f'/api/v1/orders/{order.id}', {'status': '1'}, format='json')
+            self.assertEqual(response.status_code, 200)
+            publish_many.assert_not_called()
+
+        messages = publish_many.call_args.args[0]
+        self.assertEqual(sorted(channel for channel, event in messages), sorted([user_channel(self.customer.id), user_channel(self.courier.id)]))
+        self.assertEqual(orjson.loads(dumps(messages[0][1])), {'type': 'order.status_changed', 'order': response.json()})
+
+    def test_stream_sends_retry_then_events_of_its_channel(self):
+        async def receive():
+            stream = views.stream_order_events(user_channel(self.courier.id))
+            try:
+                chunks = [await anext(stream)]
+                await asyncio.to_thread(broker.publish, user_channel(self.customer.id), {'type': 'order.status_changed', 'order': {'id': 2}})
+                await asyncio.to_thread(broker.publish, user_channel(self.courier.id), {'type': 'order.assigned', 'order': {'id': 1}})
+                chunks.append(await asyncio.wait_for(anext(stream), timeout=1))
+                return chunks
+            finally:
+                await stream.aclose()
+
+        with mock.patch.object(broker, '_started', True), mock.patch.object(broker, 'fanout'):
+            chunks = asyncio.run(receive())
+        self.assertEqual(chunks, [
+            f"retry: {settings.ORDER_EVENTS_RETRY_MS}\n\n".encode(),
+            b'event: order.assigned\ndata: {"type":"order.assigned","order":{"id":1}}\n\n',
+        ])
+        self.assertFalse(broker._subscribers)
+
+    def test_stream_requires_a_token(self):
+        response = asyncio.run(self.async_client.get('/api/v1/orders/events'))
+        self.assertEqual(response.status_code, 401)
+
+
+@override_settings(ORDERS_PURGE_BATCH_SIZE=2, ORDERS_PURGE_MAX_BATCHES_PER_REQUEST=2, ORDERS_PURGE_PAUSE=0)
+class PurgeTests(APITestCase):
+    def test_purge_deletes_matching_orders_in_bounded_batches(self):
+        old_orders = [self.create_order() for _ in range(5)]
+        Order.objects.filter(id__in=[order.id for order in old_orders]).update(date=datetime.date(2020, 1, 1))
+        recent_order = self.create_order()
+        for order in old_orders + [recent_order]:
+            OrderItem.objects.create(order=order, menuitem=self.menu_items[0], quantity=1, unit_price='2.50', price='2.50')
+        client = self.client_for(self.manager)
+
+        response = client.post('/api/v1/orders/purge', {'end_date': '2020-12-31', 'dry_run': True}, format='json')
+        self.assertEqual(response.json(), {'matched': 5, 'deleted': 0, 'batches': 0, 'done': True, 'dry_run': True})
+
+        with mock.patch.object(audit_buffer, 'add') as audit_add, self.captureOnCommitCallbacks(execute=True):
+            response = client.post('/api/v1/orders/purge', {'end_date': '2020-12-31'}, format='json')
+        self.assertEqual(response.json(), {'matched': 4, 'deleted': 4, 'batches': 2, 'done': False, 'dry_run': False})
+        self.assertEqual(audit_add.call_args.args[0][0]['action'], 'purge')
+
+        response = client.post('/api/v1/orders/purge', {'end_date': '2020-12-31'}, format='json')
+        self.assertEqual(response.json()['done'], True)
+        self.assertEqual(list(Order.objects.values_list('id', flat=True)), [recent_order.id])
+        self.assertEqual(list(OrderItem.objects.values_list('order_id', flat=True)), [recent_order.id])
+
+    def test_purge_needs_valid_filters(self):
+        self.create_order()
+        client = self.client_for(self.manager)
+        for data in ({}, {'start_date': '2020-13-01'}, {'user_id': 'x'}, {'status': 2}):
+            response = client.post('/api/v1/orders/purge', data, format='json')
+            self.assertEqual(response.status_code, 400, data)
+        self.assertEqual(self.client_for(self.customer).post('/api/v1/orders/purge', {'status': 0}, format='json').status_code, 403)
+
+        with self.assertRaises(CommandError):
+            call_command('purge_orders', stdout=io.StringIO())
+        call_command('purge_orders', '--status', '0', stdout=io.StringIO())
+        self.assertFalse(Order.objects.exists())
+
+
+class RepricingTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.menu_item = self.menu_items[0]
+        self.cart_line = Cart.objects.create(
+            user=self.customer, menuitem=self.menu_item, quantity=1000, unit_price='2.50', price='2500.00'
+        )
+
+    def assertPrices(self, price: str, cart_line_price: str):
+        self.cart_line.refresh_from_db()
+        self.assertEqual(MenuItem.objects.get(id=self.menu_item.id).price, Decimal(price))
+        self.assertEqual((self.cart_line.unit_price, self.cart_line.price), (Decimal(price), Decimal(cart_line_price)))
+
+    def test_open_cart_lines_get_the_new_price(self):
+        client = self.client_for(self.manager)
+        with mock.patch.object(audit_buffer, 'add'):
+            response = client.patch(f'/api/v1/menu-items/{self.menu_item.id}/', {'price': '2.00'}, format='json')
+            self.assertEqual(response.status_code, 200)
+            self.assertPrices('2.00', '2000.00')
+
+            response = client.post('/api/v1/menu-items/prices/', {'category': 'main-dish', 'percent': '12.5'}, format='json')
+        self.assertEqual(response.json()['updated'], 3)
+        self.assertPrices('2.25', '2250.00')  # 2.00 * 1.125 rounded half up
+
+    def test_price_that_overflows_a_cart_line_is_rejected(self):
+        client = self.client_for(self.manager)
+        response = client.patch(f'/api/v1/menu-items/{self.menu_item.id}/', {'price': '10.00'}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('9999.99', str(response.json()['price']))
+        self.assertPrices('2.50', '2500.00')
+
+        response = client.post('/api/v1/menu-items/prices/', {'category': 'main-dish', 'percent': 400}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertPrices('2.50', '2500.00')
+        self.assertEqual(set(MenuItem.objects.values_list('price', flat=True)), {Decimal('2.50')})
+
+
+class PopularityTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        for top_sellers in TOP_SELLERS.values():
+            top_sellers.loaded_at = None
+
+    def checkout(self, quantities: dict) -> None:
+        client = self.client_for(self.customer)
+        for menu_item, quantity in quantities.items():
+            client.post('/api/v1/cart/menu-items', {'menuitem': menu_item.id, 'quantity': quantity}, format='json')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(client.post('/api/v1/orders/', format='json').status_code, 201)
+
+    def test_checkout_counts_sales_and_decay_drops_them_from_the_window(self):
+        first, second, third = self.menu_items
+        self.checkout({first: 2, second: 5})
+        self.checkout({first: 4})
+
+        response = self.client_for(self.customer).get('/api/v1/menu-items/top-sellers/?window=7d&limit=2')
+        self.assertEqual([(item['id'], item['popularity_7d']) for item in response.json()], [(first.id, 6), (second.id, 5)])
+        # Loaded top sellers follow checkouts of this process
+        self.checkout({third: 9})
+        self.assertEqual(TOP_SELLERS['all'].top(limit=1), [(third.id, 9)])
+
+        self.assertEqual(decay_popularity(datetime.date.today() + datetime.timedelta(days=6)), 0)
+        self.assertEqual(decay_popularity(datetime.date.today() + datetime.timedelta(days=7)), 3)
+        self.assertEqual(
+            list(MenuItem.objects.order_by('id').values_list('popularity', 'popularity_7d')), [(6, 0), (5, 0), (9, 0)]
+        )
+        self.assertFalse(MenuItemSales.objects.exists())
+
+    def test_top_sellers_keep_the_most_popular_only(self):
+        top_sellers = TopSellers(field='popularity', size=2, ttl=float('inf'))
+        top_sellers.loaded_at = 0  # loaded before anything was sold
+        for menu_item_id, score in ((1, 5), (2, 3), (3, 4), (2, 1), (1, 6)):
+            top_sellers.offer(menu_item_id, score)
+        self.assertEqual(top_sellers.top(limit=5), [(1, 6), (3, 4)])
+
+        response = self.client_for(self.customer).get('/api/v1/menu-items/top-sellers/?window=1d')
+        self.assertEqual(response.status_code, 400)
+
+
+class OrderSummaryTests(APITestCase):
+    def test_checkout_writes_the_summary_and_lists_do_not_join_items(self):
+        client = self.client_for(self.customer)
+        for menu_item, quantity in ((self.menu_items[0], 2), (self.menu_items[1], 1)):
+            client.post('/api/v1/cart/menu-items', {'menuitem': menu_item.id, 'quantity': quantity}, format='json')
+        self.assertEqual(client.post('/api/v1/orders/', format='json').status_code, 201)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get('/api/v1/orders/')
+        self.assertEqual((response.json()[0]['item_count'], response.json()[0]['items_preview']), (3, 'Item 0 x2, Item 1'))
+        self.assertFalse([query['sql'] for query in queries if 'api_orderitem' in query['sql']])
+
+    @override_settings(ORDER_ITEMS_PREVIEW_LENGTH=20)
+    def test_preview_fits_its_length(self):
+        self.assertEqual(summarize_order_items([('Tea', 1), ('Lemon', 3)]), (4, 'Tea, Lemon x3'))
+        self.assertEqual(summarize_order_items([('Tea', 1), ('Lemon', 3), ('Greek salad', 1)]), (5, 'Tea, +2 more'))
+        self.assertEqual(summarize_order_items([('Greek salad', 2), ('Tea', 1)]), (3, 'Greek sa..., +1 more'))
+
+    def test_backfill_fills_orders_without_summary(self):
+        orders = [self.create_order() for _ in range(3)]
+        for order, menu_item in zip(orders, self.menu_items[:2]):
+            OrderItem.objects.create(order=order, menuitem=menu_item, quantity=2, unit_price='2.50', price='5.00')
+
+        call_command('backfill_order_summaries', '--batch-size', '1', stdout=io.StringIO())
+        self.assertEqual(
+            list(Order.objects.order_by('id').values_list('item_count', 'items_preview')),
+            [(2, 'Item 0 x2'), (2, 'Item 1 x2'), (0, '')]
+        )
+
+
+@override_settings(SINGLE_FLIGHT_LOCK_TIMEOUT=0.3, SINGLE_FLIGHT_WAIT_TIMEOUT=5)
+class SingleFlightTests(APITestCase):
+    def test_concurrent_callers_share_one_computation(self):
+        computed, results = [], []
+
+        def compute():
+            computed.append(1)
+            time.sleep(0.1)
+            return {'items': [1, 2]}
+
+        threads = [threading.Thread(target=lambda: results.append(single_flight('menu-items', compute))) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual((len(computed), results), (1, [{'items': [1, 2]}] * 5))
+
+    def test_waiter_takes_over_when_the_lock_of_a_stuck_leader_expires(self):
+        # Leader of another process took the lock and never stored a result
+        cache.add('singleflight:menu-items:lock', 'other', settings.SINGLE_FLIGHT_LOCK_TIMEOUT)
+        compute = mock.Mock(return_value=[1, 2])
+
+        started = time.monotonic()
+        self.assertEqual(single_flight('menu-items', compute), [1, 2])
+        self.assertGreaterEqual(time.monotonic() - started, settings.SINGLE_FLIGHT_LOCK_TIMEOUT)
+        self.assertLess(time.monotonic() - started, settings.SINGLE_FLIGHT_WAIT_TIMEOUT)
+        self.assertIsNone(cache.get('singleflight:menu-items:lock'))
+
+        # Later callers get the stored result
+        self.assertEqual(single_flight('menu-items', compute), [1, 2])
+        compute.assert_called_once()
+
+
+class CatalogSnapshotTests(APITestCase):
+    paths = [
+        '/api/v1/menu-items/', '/api/v1/menu-items/?perpage=2&page=2', '/api/v1/menu-items/?category=MAIN-DISH',
+        '/api/v1/menu-items/?category=nope', '/api/v1/menu-items/?page=9', '/api/v1/category/',
+    ]
+
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        snapshot_settings = self.settings(CATALOG_SNAPSHOT_PATH=os.path.join(directory.name, 'catalog.snapshot'))
+        snapshot_settings.enable()
+        self.addCleanup(snapshot_settings.disable)
+        self.client = self.client_for(self.customer)
+
+    def get(self, path: str, **extra):
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(path, **extra)
+        catalog_queries = [query['sql'] for query in queries if 'api_menuitem' in query['sql'] or 'api_category' in query['sql']]
+        return response, catalog_queries
+
+    def test_snapshot_pages_are_the_database_pages(self):
+        database_pages = {path: self.get(path)[0].content for path in self.paths}
+        call_command('build_catalog_snapshot', stdout=io.StringIO())
+
+        for path in self.paths:
+            response, catalog_queries = self.get(path)
+            self.assertEqual((response.content, catalog_queries), (database_pages[path], []), path)
+        with self.settings(RESPONSE_COMPRESSION_MIN_SIZE=0):
+            response, _ = self.get('/api/v1/menu-items/?perpage=10', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(response.content), database_pages['/api/v1/menu-items/'])
+
+    def test_snapshot_behind_the_catalog_is_not_served(self):
+        call_command('build_catalog_snapshot', stdout=io.StringIO())
+        with mock.patch.object(audit_buffer, 'add'):
+            self.client_for(self.manager).patch(f'/api/v1/menu-items/{self.menu_items[0].id}/', {'title': 'Renamed'}, format='json')
+
+        response, catalog_queries = self.get('/api/v1/menu-items/')
+        self.assertEqual(response.json()[0]['title'], 'Renamed')
+        self.assertTrue(catalog_queries)
+
+        call_command('build_catalog_snapshot', stdout=io.StringIO())
+        response, catalog_queries = self.get('/api/v1/menu-items/')
+        self.assertEqual((response.json()[0]['title'], catalog_queries), ('Renamed', []))
+
+
+@override_settings(CART_EVICTION_PAUSE=0)
+class CartExpiryTests(APITestCase):
+    def expire(self, **filters) -> None:
+        Cart.objects.filter(**filters).update(updated_at=timezone.now() - datetime.timedelta(days=settings.CART_TTL_DAYS, seconds=1))
+
+    def test_expired_lines_are_invisible_before_they_are_evicted(self):
+        client = self.client_for(self.customer)
+        for menu_item in self.menu_items[:2]:
+            client.post('/api/v1/cart/menu-items', {'menuitem': menu_item.id, 'quantity': 2}, format='json')
+        self.expire(menuitem=self.menu_items[0])
+
+        response = client.get('/api/v1/cart/menu-items')
+        self.assertEqual([line['menuitem'] for line in response.json()], [self.menu_items[1].id])
+        # Adding an expired menu item again replaces its line
+        response = client.post('/api/v1/cart/menu-items', {'menuitem': self.menu_items[0].id, 'quantity': 3}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Cart.objects.get(menuitem=self.menu_items[0]).quantity, 3)
+
+        self.expire(menuitem=self.menu_items[1])
+        self.assertEqual(client.post('/api/v1/orders/', format='json').status_code, 201)
+        self.assertEqual(Order.objects.get().item_count, 3)
+
+    def test_eviction_deletes_expired_lines_in_batches(self):
+        Cart.objects.bulk_create(
+            Cart(user=user, menuitem=menu_item, quantity=1, unit_price='2.50', price='2.50')
+            for user in (self.customer, self.manager, self.courier) for menu_item in self.menu_items
+        )
+        self.expire(user__in=[self.customer, self.manager])
+
+        progress = mock.Mock()
+        self.assertEqual(evict_expired_cart_lines(batch_size=4, max_batches=1, progress=progress), 4)
+        progress.assert_called_once_with(1, 4)
+        self.assertEqual(evict_expired_cart_lines(batch_size=4), 2)
+        self.assertEqual(set(Cart.objects.values_list('user', flat=True)), {self.courier.id})
+
+
+class AuditLogTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        # Flushed by the tests instead of the flusher thread
+        flusher = mock.patch.object(audit_buffer, 'ensure_flusher')
+        flusher.start()
+        self.addCleanup(flusher.stop)
+        self.addCleanup(lambda: audit_buffer.events.clear())
+
+    def test_manager_changes_are_written_off_the_request_path(self):
+        client = self.client_for(self.manager)
+        with CaptureQueriesContext(connection) as queries, self.captureOnCommitCallbacks(execute=True):
+            response = client.patch(f'/api/v1/menu-items/{self.menu_items[0].id}/', {'price': '3.00'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse([query['sql'] for query in queries if 'api_auditevent' in query['sql']])
+
+        self.assertEqual(audit_buffer.flush(), 1)
+        response = client.get(f'/api/v1/audit/?actor={self.manager.id}&entity=menuitem&since=2020-01-01T00:00:00')
+        self.assertEqual(
+            [(event['action'], event['entity_id'], event['changes']) for event in response.json()],
+            [('update', self.menu_items[0].id, {'price': ['2.50', '3.00']})]
+        )
+        self.assertEqual(client.get('/api/v1/audit/?since=yesterday').status_code, 400)
+        self.assertEqual(self.client_for(self.customer).get('/api/v1/audit/').status_code, 403)
+
+    def test_failed_flush_keeps_the_events_for_the_next_one(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client_for(self.manager).delete(f'/api/v1/orders/{self.create_order().id}')
+
+        with mock.patch('api.audit.insert_rows', side_effect=OperationalError("database is locked")), self.assertLogs('api.audit', 'ERROR'):
+            self.assertEqual(audit_buffer.flush(), 0)
+        self.assertEqual(audit_buffer.flush(), 1)
+        self.assertEqual(list(AuditEvent.objects.values_list('actor', 'action', 'entity')), [(self.manager.id, 'delete', 'order')])
+
+
+@override_settings(WEBHOOK_COMMIT_GRACE=0, WEBHOOK_BATCH_SIZE=2)
+class WebhookTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.endpoint = WebhookEndpoint.objects.create(name='erp', url='https://erp.example.com/hooks', secret='s3cret')
+        self.session = mock.Mock()
+        # Endpoints are served in the test thread, pool threads can't see the test transaction
+        self.executor = mock.Mock(map=map)
+
+    def respond(self, status_code: int = 200):
+        self.session.post.reset_mock(side_effect=True)
+        self.session.post.return_value = mock.Mock(status_code=status_code, text='error')
+
+    def test_order_changes_are_written_to_the_outbox(self):
+        client = self.client_for(self.customer)
+        client.post('/api/v1/cart/menu-items', {'menuitem': self.menu_items[0].id, 'quantity': 1}, format='json')
+        self.assertEqual(client.post('/api/v1/orders/', format='json').status_code, 201)
+        order = Order.objects.get()
+        with mock.patch.object(audit_buffer, 'add'):
+            response = self.client_for(self.manager).put(f'/api/v1/orders/{order.id}', {'username': 'courier'}, format='json')
+
+        events = list(WebhookEvent.objects.order_by('id').values_list('event_type', 'payload'))
+        self.assertEqual([event_type for event_type, _ in events], ['order.created', 'order.assigned'])
+        self.assertEqual(events[1][1], response.json())
+        self.session.post.assert_not_called()
+
+    def test_batches_are_signed_and_move_the_cursor(self):
+        orders = [self.create_order() for _ in range(3)]
+        record_webhook_events(event_type='order.created', orders=orders)
+        self.respond(200)
+
+        self.assertEqual(dispatch_webhooks(self.session, self.executor), (2, True))
+        self.assertEqual(dispatch_webhooks(self.session, self.executor), (1, False))
+        self.assertEqual(dispatch_webhooks(self.session, self.executor), (0, False))
+
+        bodies = [orjson.loads(call.kwargs['data']) for call in self.session.post.call_args_list]
+        self.assertEqual([[event['data']['id'] for event in body['events']] for body in bodies], [[orders[0].id, orders[1].id], [orders[2].id]])
+        self.endpoint.refresh_from_db()
+        self.assertEqual(self.endpoint.last_event_id, WebhookEvent.objects.latest('id').id)
+
+        body, header = self.session.post.call_args.kwargs['data'], self.session.post.call_args.kwargs['headers'][SIGNATURE_HEADER]
+        self.assertTrue(verify_signature('s3cret', body, header))
+        self.assertFalse(verify_signature('other', body, header))
+        self.assertFalse(verify_signature('s3cret', body + b' ', header))
+        self.assertFalse(verify_signature('s3cret', body, sign('s3cret', int(time.time()) - 301, body)))
+        self.assertFalse(verify_signature('s3cret', body, 'v1=garbage'))
+
+    def test_failed_batch_is_retried_with_backoff(self):
+        record_webhook_events(event_type='order.created', orders=[self.create_order()])
+
+        self.respond(500)
+        self.assertEqual(dispatch_webhooks(self.session, self.executor), (0, False))
+        self.endpoint.refresh_from_db()
+        self.assertEqual((self.endpoint.failures, self.endpoint.last_error, self.endpoint.last_event_id), (1, 'HTTP 500: error', 0))
+        retry_in = (self.endpoint.next_attempt_at - timezone.now()).total_seconds()
+        self.assertAlmostEqual(retry_in, settings.WEBHOOK_RETRY_BACKOFF, delta=1)
+
+        # Not due until the backoff is over
+        dispatch_webhooks(self.session, self.executor)
+        self.assertEqual(self.session.post.call_count, 1)
+
+        WebhookEndpoint.objects.update(next_attempt_at=timezone.now())
+        self.session.post.side_effect = requests.ConnectionError("refused")
+        dispatch_webhooks(self.session, self.executor)
+        self.endpoint.refresh_from_db()
+        self.assertEqual(self.endpoint.failures, 2)
+        retry_in = (self.endpoint.next_attempt_at - timezone.now()).total_seconds()
+        self.assertAlmostEqual(retry_in, settings.WEBHOOK_RETRY_BACKOFF * 2, delta=1)
+
+        WebhookEndpoint.objects.update(next_attempt_at=timezone.now())
+        self.respond(204)
+        self.assertEqual(dispatch_webhooks(self.session, self.executor), (1, False))
+        self.endpoint.refresh_from_db()
+        self.assertEqual((self.endpoint.failures, self.endpoint.next_attempt_at, self.endpoint.last_error), (0, None, ''))
@@ -0,0 +1,16 @@
+from rest_framework.throttling import UserRateThrottle
+
+
+class BatchAwareUserRateThrottle(UserRateThrottle):
+    """User rate throttle that skips sub-requests of `batch`, the batch request itself is throttled once."""
+    def allow_request(self, request, view):
+        if getattr(request._request, 'is_batch_subrequest', False):
+            return True
+        return super().allow_request(request, view)
+
+
+class ManagerGroupThrottle(BatchAwareUserRateThrottle):
+    scope = 'manager'
+
+class DeliveryGroupThrottle(BatchAwareUserRateThrottle):
+    scope = 'delivery'
@@ -9,6 +9,11 @@ urlpatterns = [
     # Menu-Items endpoints
     path('menu-items/', views.menu_items, name='list of menu items and create new menu item'),
     path('menu-items/<int:item_id>/', views.single_menu_item, name='retrive single category by item_id, and manipulate'),
+    path('menu-items/prices/', views.menu_item_prices, name='change prices of category menu items by percent'),
+    path('menu-items/top-sellers/', views.menu_items_top_sellers, name='most sold menu items'),
+    path('menu-items/<int:item_id>/related/', views.related_menu_items, name='menu items frequently ordered together'),
+    # Catalog delta-sync endpoint
+    path('catalog/changes/', views.catalog_changes),
     # User group management endpoints
     path('groups/manager/users/', views.manage_manager_users),
     path('groups/manager/users/<int:user_id>/', views.manage_manager_user),
@@ -19,6 +24,15 @@ urlpatterns = [
     # Order management endpoints
     path('orders/', views.orders),
     path('orders/<int:order_id>', views.order),
+    path('orders/events', views.order_events),
+    path('orders/purge', views.orders_purge),
+    # Audit log endpoint
+    path('audit/', views.audit_events),
+    # Background jobs endpoints
+    path('jobs/', views.jobs),
+    path('jobs/<int:job_id>/', views.job),
+    # Batch requests endpoint
+    path('batch', views.batch),
     
     # Testing
     path('throttle/', views.throttle_test),
@@ -5,7 +5,7 @@ from django.shortcuts import get_object_or_404
 import datetime
 
 
-from api.models import Category, MenuItem, Cart, Order, OrderItem
+from api.models import Category, MenuItem, Cart, Order, OrderItem, MenuItemRelation
 from api.serializers import CategorySerializer, MenuItemSerializer, UserSerializer, CartSerializer, OrderSerializer, OrderItemSerializer
 from django.contrib.auth.models import User, Group
 
@@ -22,6 +22,76 @@ from django.core.paginator import Paginator, EmptyPage
 # Throttling
 from rest_framework.decorators import throttle_classes
 from rest_framework.throttling import UserRateThrottle
+from api.throttling import ManagerGroupThrottle, DeliveryGroupThrottle
+
+# Batch requests
+import io
+import json
+import logging
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from django.core.handlers.wsgi import WSGIRequest
+from django.db import connections, transaction
+from django.db.models import F, Q
+from django.urls import resolve, Resolver404
+from api.renderers import dumps
+
+# Catalog delta-sync
+from api.catalog import get_catalog_changes, get_latest_seq
+
+# Order events stream
+import asyncio
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.http import JsonResponse, StreamingHttpResponse
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.exceptions import AuthenticationFailed
+from api.events import broker, publish_order_event, publish_order_events, user_channel
+
+# Orders purge
+from api.purge import parse_purge_filters, purge_orders, delete_orders_batch
+
+# Stock tracking
+from api.stock import InsufficientStock, decrement_stock, get_stock_shortages
+
+# Bulk price changes
+from api.pricing import change_category_prices
+
+# Menu items popularity
+from api.popularity import TOP_SELLERS, record_sales
+
+# Order summary columns
+from api.order_summary import summarize_order_items
+
+# Single-flight request coalescing
+import hashlib
+from urllib.parse import urlencode
+from api.singleflight import single_flight
+
+# Catalog snapshot
+from django.http import HttpResponse
+from django.utils.cache import patch_vary_headers
+from api.catalog_snapshot import get_catalog_snapshot, menu_items_view_name
+from api.middleware import negotiate_encoding
+
+# Background jobs
+from api.models import Job
+from api.serializers import JobSerializer
+
+# Abandoned carts
+from api.carts import CartChanged, delete_expired_cart_line, get_active_cart_lines
+
+# Audit log
+from api.audit import get_field_changes, record_audit_event
+from api.models import AuditEvent
+from api.serializers import AuditEventSerializer
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+# Order webhooks outbox
+from api.webhooks import record_webhook_events
+
+# Order updates shared with the delivery dispatcher
+from api.orders import record_delivery_assignments, update_order_fields, update_orders_fields
 
 
 # for Custom class Permission
@@ -30,17 +100,12 @@ from rest_framework.permissions import BasePermission
 # Type hinting
 from django.contrib.auth.models import User
 from django.db.models import Model
-from rest_framework.serializers import ModelSerializer
+from rest_framework.serializers import ModelSerializer, BaseSerializer
 from django.http import HttpRequest
 from typing import Literal
 
 
-# Throttling
-class ManagerGroupThrottle(UserRateThrottle):
-    scope = 'manager'
-
-class DeliveryGroupThrottle(UserRateThrottle):
-    scope = 'delivery'
+logger = logging.getLogger(__name__)
 
 
 # TODO: apply Clean architecture, separate each services, helper functions and etc.
@@ -52,9 +117,9 @@ def is_group_has_permission(request: HttpRequest, group_name: str) -> bool:
     return any((user.groups.filter(name=group_name).exists(), user.is_staff))
 
 
-def get_list_of_item(items: Model, serializer_class: ModelSerializer) -> Response:
+def get_list_of_item(items: Model, serializer_class: ModelSerializer, fields: list=None) -> Response:
     """Get a list of items. Method: GET"""
-    serializer = serializer_class(items, many=True)
+    serializer = serializer_class(items, many=True, fields=fields)
     return Response(serializer.data, status=status.HTTP_200_OK)
 
 def create_new_item(request: HttpRequest, serializer_class: ModelSerializer) -> Response:
@@ -76,12 +141,18 @@ def retrieve_item(item: Model, serializer_class: ModelSerializer) -> Response:
     serializer = serializer_class(item)
     return Response(serializer.data, status=status.HTTP_200_OK)
 
+def record_item_update(request: HttpRequest, item: Model, changes: dict) -> None:
+    if changes:
+        record_audit_event(actor=request.user, action='update', entity=item._meta.model_name, entity_id=item.pk, changes=changes)
+
 def update_full_item(request: HttpRequest, item: Model, serializer_class: ModelSerializer) -> Response:
     """Update an existing item. Method: PUT"""
     serializer = serializer_class(item, data=request.data)
     try:
         serializer.is_valid(raise_exception=True)
+        changes = get_field_changes(instance=item, new_values=serializer.validated_data)
         serializer.save()
+        record_item_update(request=request, item=item, changes=changes)
         return Response(serializer.data)
     except ValidationError as e:
         return Response(
@@ -94,7 +165,9 @@ def partial_update_item(request: HttpRequest, item: Model, serializer_class: Mod
     serializer = serializer_class(item, data=request.data, partial=True)
     try:
         serializer.is_valid(raise_exception=True)
+        changes = get_field_changes(instance=item, new_values=serializer.validated_data)
         serializer.save()
+        record_item_update(request=request, item=item, changes=changes)
         return Response(serializer.data, status=status.HTTP_200_OK)
     except ValidationError as e:
         return Response(
@@ -248,24 +321,143 @@ def apply_query_params_pagination(request: HttpRequest, items):
     return items
 
 
+# Helper function for Sparse fieldsets
+def get_sparse_fields(request: HttpRequest, serializer_class: ModelSerializer) -> list:
+    """Parse `?fields=id,title,price` query param validated against serializer Meta.fields, None if it is not passed."""
+    fields_param = request.query_params.get('fields')
+    if fields_param is None:
+        return None
+    
+    available_fields = [
+        field_name for field_name, field in serializer_class().fields.items()
+        if field_name in serializer_class.Meta.fields and not field.write_only
+    ]
+    fields = [field.strip() for field in fields_param.split(',') if field.strip()]
+    invalid_fields = [field for field in fields if field not in available_fields]
+    
+    if not fields or invalid_fields:
+        raise ValueError(f"Invalid fields: {', '.join(invalid_fields) or repr(fields_param)}. Available fields: {', '.join(available_fields)}.")
+    return fields
+
+
+def apply_sparse_fieldset(items, serializer_class: ModelSerializer, fields: list):
+    """Select only columns of requested fields, related table is joined only when its nested serializer is requested."""
+    serializer = serializer_class(fields=fields)
+    field_sources = getattr(serializer_class.Meta, 'sparse_field_sources', {})
+    only_fields = []
+    related_fields = []
+    
+    for field_name, field in serializer.fields.items():
+        if field_name in field_sources:
+            only_fields.extend(field_sources[field_name])
+        elif isinstance(field, BaseSerializer):
+            related_fields.append(field.source)
+            only_fields.extend(
+                f"{field.source}__{nested_field.source}"
+                for nested_field in field.fields.values() if not nested_field.write_only
+            )
+        else:
+            only_fields.append(field.source.replace('.', '__'))
+    
+    items = items.select_related(None)
+    if related_fields:
+        items = items.select_related(*related_fields)
+    return items.only(*only_fields)
+
+
+def get_list_of_items(request: HttpRequest, model_class: Model, serializer_class: ModelSerializer) -> Response:
+    """Filter, sort, paginate and serialize list of items. Method: GET"""
+    try:
+        fields = get_sparse_fields(request=request, serializer_class=serializer_class)
+    except ValueError as e:
+        return Response(
+            {"status_code": status.HTTP_400_BAD_REQUEST, "error_message": str(e)},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    if model_class is MenuItem:
+        items = model_class.objects.select_related('category')
+        filtered_item = handle_menuitem_filtering(request=request, items=items)
+        ordered_item = multiple_params_ordering(request=request, items=filtered_item)
+        #items = items.order_by('title', 'price')
+    
+    if model_class is Category:
+        items = model_class.objects.all()
+        filtered_item = handle_category_filtering(request=request, items=items)
+        ordered_item = multiple_params_ordering(request=request, items=filtered_item)
+        #items = items.order_by('id', 'title')
+    
+    if fields:
+        ordered_item = apply_sparse_fieldset(items=ordered_item, serializer_class=serializer_class, fields=fields)
+    
+    paginated_items = apply_query_params_pagination(request=request, items=ordered_item)
+    
+    return get_list_of_item(items=paginated_items, serializer_class=serializer_class, fields=fields)
+
+
+def get_items_single_flight_key(request: HttpRequest, model_class: Model) -> str:
+    """Same list and query params at the same catalog sequence, any catalog change starts a new key"""
+    query = urlencode(sorted(request.query_params.lists()), doseq=True)
+    return f"{model_class._meta.model_name}:{get_latest_seq()}:{hashlib.sha1(query.encode()).hexdigest()}"
+
+
+CATALOG_SNAPSHOT_QUERY_PARAMS = {
+    Category: {'page', 'perpage'},
+    MenuItem: {'page', 'perpage', 'category'},
+}
+
+
+def get_catalog_snapshot_response(request: HttpRequest, model_class: Model) -> HttpResponse:
+    """Unfiltered page of categories or menu items copied from the catalog snapshot, None when it can't serve the request. Method: GET"""
+    if not set(request.query_params) <= CATALOG_SNAPSHOT_QUERY_PARAMS[model_class]:
+        return None
+    # Browsable API and indented JSON are rendered as usual
+    if request.accepted_renderer.format != 'json' or 'indent' in request.accepted_media_type:
+        return None
+    try:
+        page = int(request.query_params.get('page', 1))
+        perpage = int(request.query_params.get('perpage', 3))
+    except ValueError:
+        return None
+    if page < 1 or perpage < 1:
+        return None
+    
+    snapshot = get_catalog_snapshot()
+    # A snapshot behind the catalog is not served, until the builder catches up lists come from the database
+    if snapshot is None or snapshot.seq != get_latest_seq():
+        return None
+    
+    category_slug = request.query_params.get('category')
+    view_name = menu_items_view_name(category_slug) if category_slug else model_class._meta.model_name
+    content = snapshot.get_page(name=view_name, page=page, perpage=perpage)
+    response = HttpResponse(content, content_type='application/json')
+    patch_vary_headers(response, ('Accept',))
+    
+    # Whole list is sent pre-compressed, smaller pages are left to CompressionMiddleware,
+    # batch sub-request bodies are decoded and embedded in the batch response
+    is_whole_list = page == 1 and perpage >= snapshot.get_count(view_name)
+    if is_whole_list and not getattr(request._request, 'is_batch_subrequest', False) and len(content) >= settings.RESPONSE_COMPRESSION_MIN_SIZE:
+        patch_vary_headers(response, ('Accept-Encoding',))
+        if negotiate_encoding(request.META.get('HTTP_ACCEPT_ENCODING', '')) == 'gzip':
+            response.content = snapshot.get_compressed(view_name)
+            response['Content-Encoding'] = 'gzip'
+    return response
+
+
 def handle_items(request: HttpRequest, model_class: Model, serializer_class: ModelSerializer) -> Response:
     """Handle views for a list of items and create new item. Method: GET, POST"""
     if request.method == 'GET':
-        if model_class is MenuItem:
-            items = model_class.objects.select_related('category')
-            filtered_item = handle_menuitem_filtering(request=request, items=items)
-            ordered_item = multiple_params_ordering(request=request, items=filtered_item)
-            #items = items.order_by('title', 'price')
+        snapshot_response = get_catalog_snapshot_response(request=request, model_class=model_class)
+        if snapshot_response is not None:
+            return snapshot_response
         
-        if model_class is Category:
-            items = model_class.objects.all()
-            filtered_item = handle_category_filtering(request=request, items=items)
-            ordered_item = multiple_params_ordering(request=request, items=filtered_item)
-            #items = items.order_by('id', 'title')
+        # Concurrent identical list requests of all workers run the query and serialization once
+        def compute():
+            response = get_list_of_items(request=request, model_class=model_class, serializer_class=serializer_class)
+            return response.status_code, response.data
         
-        paginated_items = apply_query_params_pagination(request=request, items=ordered_item)
-        
-        return get_list_of_item(items=paginated_items, serializer_class=serializer_class)
+        status_code, data = single_flight(key=get_items_single_flight_key(request=request, model_class=model_class), compute=compute)
+        return Response(data, status=status_code)
     
     # Check Permissions for POST
     if not is_group_has_permission(request=request, group_name=settings.MANAGER_GROUP_NAME):
@@ -332,6 +524,155 @@ def single_menu_item(request: HttpRequest, item_id: int=None):
     return handle_item(request=request, item_id=item_id, model_class=MenuItem, serializer_class=MenuItemSerializer)
 
 
+def change_menu_item_prices(request: HttpRequest) -> Response:
+    """Manager changes prices of all menu items of a category by percent, e.g. {"category": "drink", "percent": 5}. Method: POST"""
+    if not is_group_has_permission(request=request, group_name=settings.MANAGER_GROUP_NAME):
+        return Response(
+            {"status_code": status.HTTP_403_FORBIDDEN, "error_message": "Permission Denied."},
+            status=status.HTTP_403_FORBIDDEN
+        )
+    
+    category_slug = request.data.get('category')
+    percent = request.data.get('percent')
+    
+    error_messages = {}
+    if not category_slug:
+        error_messages['category'] = 'This field is required.'
+    if percent is None:
+        error_messages['percent'] = 'This field is required.'
+    else:
+        try:
+            percent = Decimal(str(percent))
+            if not percent.is_finite() or percent <= -100:
+                raise InvalidOperation
+        except InvalidOperation:
+            error_messages['percent'] = 'Enter a valid number greater than -100.'
+    
+    if error_messages:
+        return Response(
+            {"status_code": status.HTTP_400_BAD_REQUEST, "detail": error_messages},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    category_id = Category.objects.filter(slug__iexact=category_slug).values_list('id', flat=True).first()
+    if category_id is None:
+        return Response(
+            {"status_code": status.HTTP_404_NOT_FOUND, "error_message": f"Category {category_slug!r} not found."},
+            status=status.HTTP_404_NOT_FOUND
+        )
+    
+    try:
+        menu_item_ids = change_category_prices(category_slug=category_slug, percent=percent)
+    except ValueError as e:
+        return Response(
+            {"status_code": status.HTTP_400_BAD_REQUEST, "error_message": str(e)},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    record_audit_event(
+        actor=request.user, action='change_prices', entity='category', entity_id=category_id,
+        changes={"percent": percent, "menu_items": menu_item_ids}
+    )
+    return Response({"updated": len(menu_item_ids), "menu_items": menu_item_ids}, status=status.HTTP_200_OK)
+
+
+@api_view(['POST'])
+@throttle_classes([ManagerGroupThrottle])
+def menu_item_prices(request: HttpRequest):
+    return change_menu_item_prices(request=request)
+
+
+def get_top_sellers(request: HttpRequest) -> Response:
+    """Most sold menu items all-time `?window=all` or in the last 7 days `?window=7d`, `?limit=10`. Method: GET"""
+    window = request.query_params.get('window', 'all')
+    if window not in TOP_SELLERS:
+        return Response(
+            {"status_code": status.HTTP_400_BAD_REQUEST, "error_message": f"Invalid window. Available windows: {', '.join(TOP_SELLERS)}."},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    try:
+        limit = int(request.query_params.get('limit', 10))
+        if not 0 < limit <= settings.MENU_TOP_SELLERS_SIZE:
+            raise ValueError
+    except ValueError:
+        return Response(
+            {"status_code": status.HTTP_400_BAD_REQUEST, "error_message": f"limit should be between 1 and {settings.MENU_TOP_SELLERS_SIZE}."},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    top_sellers = TOP_SELLERS[window].top(limit=limit)
+    menu_items = MenuItem.objects.select_related('category').in_bulk([menu_item_id for menu_item_id, _ in top_sellers])
+    serializer = MenuItemSerializer(
+        [menu_items[menu_item_id] for menu_item_id, _ in top_sellers if menu_item_id in menu_items], many=True
+    )
+    return Response(serializer.data, status=status.HTTP_200_OK)
+
+
+@api_view(['GET'])
+def menu_items_top_sellers(request: HttpRequest):
+    return get_top_sellers(request=request)
+
+
+def get_related_menu_items(request: HttpRequest, item_id: int) -> Response:
+    """Menu items most often ordered together with menu item, `?limit=`. Method: GET"""
+    try:
+        limit = int(request.query_params.get('limit', settings.RECOMMENDATIONS_TOP_K))
+        if not 0 < limit <= settings.RECOMMENDATIONS_TOP_K:
+            raise ValueError
+    except ValueError:
+        return Response(
+            {"status_code": status.HTTP_400_BAD_REQUEST, "error_message": f"limit should be between 1 and {settings.RECOMMENDATIONS_TOP_K}."},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    # Precomputed by `manage.py build_recommendations`, served from (menuitem, -score) index
+    relations = list(
+        MenuItemRelation.objects.filter(menuitem_id=item_id)
+        .select_related('related__category').order_by('-score')[:limit]
+    )
+    if not relations:
+        get_object_or_404(MenuItem.objects.only('id'), id=item_id)
+    
+    serializer = MenuItemSerializer([relation.related for relation in relations], many=True)
+    data = [
+        {**menu_item, "ordered_together": relation.score}
+        for menu_item, relation in zip(serializer.data, relations)
+    ]
+    return Response(data, status=status.HTTP_200_OK)
+
+
+@api_view(['GET'])
+def related_menu_items(request: HttpRequest, item_id: int):
+    return get_related_menu_items(request=request, item_id=item_id)
+
+
+# Catalog delta-sync
+def get_catalog_changes_since(request: HttpRequest) -> Response:
+    """Changed categories, menu items and deleted ids since `?since=<seq>` catalog sequence, `&full_sync=1` continues a full sync. Method: GET"""
+    try:
+        since = int(request.query_params.get('since', 0))
+        full_sync = request.query_params.get('full_sync') in ('1', 'true')
+        limit = min(int(request.query_params.get('limit', settings.CATALOG_SYNC_PAGE_SIZE)), settings.CATALOG_SYNC_MAX_PAGE_SIZE)
+        if since < 0 or limit < 1:
+            raise ValueError
+    except ValueError:
+        return Response(
+            {"status_code": status.HTTP_400_BAD_REQUEST, "error_message": "since and limit should be positive integers."},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    changes = get_catalog_changes(since=since, limit=limit, full_sync=full_sync)
+    changes['categories'] = CategorySerializer(changes['categories'], many=True).data
+    changes['menu_items'] = MenuItemSerializer(changes['menu_items'], many=True).data
+    return Response(changes, status=status.HTTP_200_OK)
+
+
+@api_view(['GET'])
+def catalog_changes(request: HttpRequest):
+    return get_catalog_changes_since(request=request)
+
+
 # User group management
 
 # Custom class Permission for Manager and Delivery Crew groups
@@ -364,12 +705,13 @@ def get_users_in_group(group_name: str) -> Response:
     serializer = UserSerializer(users, many=True)
     return Response(serializer.data, status=status.HTTP_200_OK)
 
-def assign_user_to_group(user: User, group_name: str) -> Response:
+def assign_user_to_group(user: User, group_name: str, actor: User=None) -> Response:
     """Assign the given user to the specified group. Method: POST"""
     group = Group.objects.get(name=group_name)
     
     if not user.groups.filter(name=group_name).exists():
         group.user_set.add(user)
+        record_audit_event(actor=actor, action='add_to_group', entity='user', entity_id=user.id, changes={"group": group_name})
         return Response(
             {"status_code": status.HTTP_201_CREATED, "detail": f"{user.username}, Was Successfully Added to {group_name} group."}, 
             status=status.HTTP_201_CREATED
@@ -379,13 +721,14 @@ def assign_user_to_group(user: User, group_name: str) -> Response:
         status=status.HTTP_400_BAD_REQUEST
     )
 
-def remove_user_from_group(user_id: int, group_name: str) -> Response:
+def remove_user_from_group(user_id: int, group_name: str, actor: User=None) -> Response:
     """Remove the specified user from the specified group using the user's ID. Method: DELETE"""
     user = get_object_or_404(User, id=user_id)
     group = Group.objects.get(name=group_name)
     
     if user.groups.filter(name=group_name).exists():
         group.user_set.remove(user)
+        record_audit_event(actor=actor, action='remove_from_group', entity='user', entity_id=user.id, changes={"group": group_name})
         return Response(
             {"status_code": status.HTTP_200_OK, "detail": f"{user.username}, Was Successfully Deleted from {group_name} group."}, 
             status=status.HTTP_200_OK
@@ -410,9 +753,9 @@ def assign_or_remove_user_from_group(
         )
 
     if action == 'assign':
-        return assign_user_to_group(user=user, group_name=group_name)
+        return assign_user_to_group(user=user, group_name=group_name, actor=request.user)
     elif action == 'remove':
-        return remove_user_from_group(user_id=user_id, group_name=group_name)
+        return remove_user_from_group(user_id=user_id, group_name=group_name, actor=request.user)
     else:
         return Response(
             {"status_code": status.HTTP_400_BAD_REQUEST, "error_message": "Invalid action."},
@@ -435,7 +778,7 @@ def handle_users_group_management(request: HttpRequest, group_name: str) -> Resp
 def handle_user_group_management(request: HttpRequest, user_id: int, group_name: str) -> Response:
     """Handle views for a user management actions for a single user in a group. Method: DELETE"""
     if request.method == 'DELETE':
-        return remove_user_from_group(user_id=user_id, group_name=group_name)
+        return remove_user_from_group(user_id=user_id, group_name=group_name, actor=request.user)
     else:
         return Response({"detail": "Invalid method for this endpoint."}, status=status.HTTP_405_METHOD_NOT_ALLOWED)
 
@@ -483,7 +826,7 @@ class IsOnlyCustomer(BasePermission):
 # Helper Function for Cart management
 def get_user_cart_items(request: HttpRequest) -> Response:
     """Get a list of cart items for the authenticated user."""
-    cart_items = Cart.objects.filter(user=request.user)
+    cart_items = get_active_cart_lines(user=request.user)
     
     if not cart_items.exists():
         return Response(
@@ -542,8 +885,11 @@ def add_menu_item_to_cart(request: HttpRequest) -> Response:
     else:
         try:
             quantity = Decimal(quantity)
-        except InvalidOperation:
+        except (InvalidOperation, TypeError, ValueError):
             error_messages['quantity'] = 'Enter a valid number.'
+        else:
+            if not quantity.is_finite() or quantity < 1:
+                error_messages['quantity'] = 'Ensure this value is greater than or equal to 1.'
 
     if error_messages:
         return Response(
@@ -553,7 +899,13 @@ def add_menu_item_to_cart(request: HttpRequest) -> Response:
     
     # Calculate total price
     menu_item = get_object_or_404(MenuItem, id=menu_item_id)
+    if menu_item.stock is not None and quantity > menu_item.stock:
+        return Response(
+            {"status_code": status.HTTP_400_BAD_REQUEST, "detail": {"quantity": f"Only {menu_item.stock} left in stock."}},
+            status=status.HTTP_400_BAD_REQUEST
+        )
     total_price = menu_item.price * quantity
+    delete_expired_cart_line(user=request.user, menu_item_id=menu_item.id)
     
     # Serialize data
     serializer = CartSerializer(data={
@@ -621,6 +973,8 @@ def permission_denied(request: HttpRequest=None, order_id: int=None) -> Response
 def process_request(request: HttpRequest, method_handlers: dict):
     """Dispatcher function to select the handler based on the user's role and HTTP method."""
     user_group_router = get_user_role(request=request)
+    # Keep role for handlers that apply per-row rules, so it is not queried again
+    request.user_role = user_group_router
     
     # Get the specific handlers for the current HTTP method
     request_handler = method_handlers[request.method]
@@ -633,21 +987,37 @@ def process_request(request: HttpRequest, method_handlers: dict):
     return method_handler
 
 
-def get_all_orders(request: HttpRequest=None) -> Response:
-    """Manager can retrieve all Orders of all users"""
-    order = Order.objects.select_related('user')
+def get_list_of_orders(request: HttpRequest, orders) -> Response:
+    """Filter, sort, paginate and serialize orders, `?fields=` narrows both the SELECT and the output"""
+    try:
+        fields = get_sparse_fields(request=request, serializer_class=OrderSerializer)
+    except ValueError as e:
+        return Response(
+            {"status_code": status.HTTP_400_BAD_REQUEST, "error_message": str(e)},
+            status=status.HTTP_400_BAD_REQUEST
+        )
     
-    filtered_orders = handle_order_filtering(request=request, items=order)
+    filtered_orders = handle_order_filtering(request=request, items=orders)
     sorted_orders = multiple_params_ordering(request=request, items=filtered_orders)
     #sorted_orders = filtered_orders.order_by('date', 'total', 'status')
     
+    if fields:
+        sorted_orders = apply_sparse_fieldset(items=sorted_orders, serializer_class=OrderSerializer, fields=fields)
+    
     paginated_orders = apply_query_params_pagination(request=request, items=sorted_orders)
     
-    serializer = OrderSerializer(paginated_orders, many=True)
+    serializer = OrderSerializer(paginated_orders, many=True, fields=fields)
     return Response(serializer.data, status=status.HTTP_200_OK)
 
+def get_all_orders(request: HttpRequest=None) -> Response:
+    """Manager can retrieve all Orders of all users"""
+    # Serializers need only user ids and the summary columns, no joins
+    order = Order.objects.all()
+    
+    return get_list_of_orders(request=request, orders=order)
+
 def get_delivery_orders(request: HttpRequest) -> Response:
-    order = Order.objects.select_related('user')
+    order = Order.objects.all()
     delivery_orders = order.filter(delivery_crew=request.user)
     
     if not delivery_orders.exists():
@@ -656,18 +1026,11 @@ def get_delivery_orders(request: HttpRequest) -> Response:
             status=status.HTTP_200_OK
         )
     
-    filtered_orders = handle_order_filtering(request=request, items=delivery_orders)
-    sorted_orders = multiple_params_ordering(request=request, items=filtered_orders)
-    #orders = orders.order_by('date', 'total', 'status')
-    
-    paginated_orders = apply_query_params_pagination(request=request, items=sorted_orders)
-    
-    serializer = OrderSerializer(paginated_orders, many=True)
-    return Response(serializer.data, status=status.HTTP_200_OK)
+    return get_list_of_orders(request=request, orders=delivery_orders)
 
 def get_user_orders(request: HttpRequest) -> Response:
     """Customer can view created Orders"""
-    order = Order.objects.select_related('user')
+    order = Order.objects.all()
     user_orders = order.filter(user=request.user)
     
     if not user_orders.exists():
@@ -676,21 +1039,20 @@ def get_user_orders(request: HttpRequest) -> Response:
             status=status.HTTP_200_OK
         )
 
-    filtered_orders = handle_order_filtering(request=request, items=user_orders)
-    sorted_orders = multiple_params_ordering(request=request, items=filtered_orders)
-    #orders = orders.order_by('date', 'total', 'status')
-    
-    paginated_orders = apply_query_params_pagination(request=request, items=sorted_orders)
-
-    serializer = OrderSerializer(paginated_orders, many=True)
-    return Response(serializer.data, status=status.HTTP_200_OK)
+    return get_list_of_orders(request=request, orders=user_orders)
 
 
 def create_new_order(request: HttpRequest) -> Response:
-    """Current Customer creates new order item, by gets user customer cart items and adds those items to order items table, then it deleted"""
-    cart_items = Cart.objects.filter(user=request.user)
+    """
+    Current Customer creates new order item, by gets user customer cart items and adds those items to order items table, then it deleted
+    
+    Stock of all cart items is decremented in the same transaction, checkout fails as a whole when any item is short.
+    """
+    cart_items = list(get_active_cart_lines(user=request.user).select_related('menuitem').only(
+        'id', 'quantity', 'unit_price', 'price', 'menuitem__title'
+    ))
 
-    if not cart_items.exists():
+    if not cart_items:
         return Response(
             {"detail": "Your cart is empty. Please add your cart something tasty."},
             status=status.HTTP_200_OK
@@ -698,27 +1060,61 @@ def create_new_order(request: HttpRequest) -> Response:
     
     # Calculate total price
     total_price = sum(item.price for item in cart_items)
-    
-    # Order model Instance
-    order = Order.objects.create(
-        user=request.user,
-        date=datetime.date.today(),
-        total=total_price,
-        status=False
+    quantities = {cart_item.menuitem_id: cart_item.quantity for cart_item in cart_items}
+    item_count, items_preview = summarize_order_items(
+        (cart_item.menuitem.title, cart_item.quantity) for cart_item in cart_items
     )
     
-    # OrderItem model Instance
-    for cart_item in cart_items:
-        OrderItem.objects.create(
-            order=order,
-            menuitem=cart_item.menuitem,
-            quantity=cart_item.quantity,
-            unit_price=cart_item.unit_price,
-            price=cart_item.price
+    try:
+        with transaction.atomic():
+            # Lines are deleted first, a concurrent checkout of the same cart waits here and then deletes nothing
+            deleted, _ = Cart.objects.filter(id__in=[cart_item.id for cart_item in cart_items]).delete()
+            if deleted != len(cart_items):
+                raise CartChanged()
+            
+            decrement_stock(quantities=quantities)
+            record_sales(quantities=quantities)
+            
+            # Order model Instance
+            order = Order.objects.create(
+                user=request.user,
+                date=datetime.date.today(),
+                total=total_price,
+                status=False,
+                item_count=item_count,
+                items_preview=items_preview
+            )
+            
+            # OrderItem model Instance
+            OrderItem.objects.bulk_create(
+                OrderItem(
+                    order=order,
+                    menuitem_id=cart_item.menuitem_id,
+                    quantity=cart_item.quantity,
+                    unit_price=cart_item.unit_price,
+                    price=cart_item.price
+                )
+                for cart_item in cart_items
+            )
+            record_webhook_events(event_type='order.created', orders=[order])
+    except CartChanged:
+        return Response(
+            {"status_code": status.HTTP_409_CONFLICT, "error_message": "Your cart changed during checkout, please try again."},
+            status=status.HTTP_409_CONFLICT
+        )
+    except InsufficientStock:
+        shortages = get_stock_shortages(quantities=quantities)
+        return Response(
+            {
+                "status_code": status.HTTP_409_CONFLICT,
+                "error_message": "Not enough stock for some items in your cart.",
+                "detail": {
+                    str(menu_item_id): f"Only {stock} left in stock, requested {quantities[menu_item_id]}."
+                    for menu_item_id, stock in shortages.items()
+                },
+            },
+            status=status.HTTP_409_CONFLICT
         )
-    
-    
-    cart_items.delete()
     
     return Response({"message": "Order created successfully"}, status=status.HTTP_201_CREATED)
 
@@ -754,6 +1150,42 @@ def get_user_order_items(request: HttpRequest, order_id: int) -> Response:
     return Response(serializer.data, status=status.HTTP_200_OK)
 
 
+# Helper Function for Optimistic concurrency control of Order updates
+def order_etag(version: int) -> str:
+    return f'"{version}"'
+
+
+def get_expected_order_version(request: HttpRequest, order: Order) -> tuple:
+    """
+    Version of the order the client based its change on and status code for a conflict:
+    `If-Match` header with 412, `version` field with 409, otherwise the version read by this request with 409.
+    """
+    if_match = request.headers.get('If-Match')
+    if if_match:
+        try:
+            return int(if_match.strip().removeprefix('W/').strip('"')), status.HTTP_412_PRECONDITION_FAILED
+        except ValueError:
+            raise ValueError("If-Match should be the order ETag (version).")
+    
+    version = request.data.get('version')
+    if version not in (None, ''):
+        try:
+            return int(version), status.HTTP_409_CONFLICT
+        except (TypeError, ValueError):
+            raise ValueError("version should be an integer.")
+    
+    return order.version, status.HTTP_409_CONFLICT
+
+
+def order_version_conflict(order_id: int, status_code: int) -> Response:
+    current_version = Order.objects.filter(id=order_id).values_list('version', flat=True).first()
+    return Response(
+        {"status_code": status_code, "error_message": "Order was changed by another request, reload it and retry.", "version": current_version},
+        status=status_code,
+        headers={'ETag': order_etag(current_version)} if current_version is not None else None
+    )
+
+
 def set_delivery_to_order(request: HttpRequest, order_id: int) -> Response:
     """Manager put specific Delivery by username to deliver this specific order by id of order"""
     try:
@@ -778,11 +1210,22 @@ def set_delivery_to_order(request: HttpRequest, order_id: int) -> Response:
         
         
     order = get_object_or_404(Order, id=order_id)
-    order.delivery_crew = user
-    order.save()
+    try:
+        expected_version, conflict_status = get_expected_order_version(request=request, order=order)
+    except ValueError as e:
+        return Response(
+            {"status_code": status.HTTP_400_BAD_REQUEST, "error_message": str(e)},
+            status=status.HTTP_400_BAD_REQUEST
+        )
     
-    serializer = OrderSerializer(order)
-    return Response(serializer.data, status=status.HTTP_200_OK)
+    previous_delivery_crew_id = order.delivery_crew_id
+    with transaction.atomic():
+        if not update_order_fields(order=order, expected_version=expected_version, delivery_crew_id=user.id):
+            return order_version_conflict(order_id=order.id, status_code=conflict_status)
+        order_data, = record_delivery_assignments(
+            actor=request.user, orders=[order], previous_delivery_crew_ids={order.id: previous_delivery_crew_id}
+        )
+    return Response(order_data, status=status.HTTP_200_OK, headers={'ETag': order_etag(order.version)})
 
 
 def update_order_status(request: HttpRequest, order_id: int) -> Response:
@@ -802,11 +1245,24 @@ def update_order_status(request: HttpRequest, order_id: int) -> Response:
             raise KeyError("Status field is required.")
         
         if status_data is not None and status_data in [str(0), str(1)]:
-            order.status = status_data
-            order.save()
+            try:
+                expected_version, conflict_status = get_expected_order_version(request=request, order=order)
+            except ValueError as e:
+                return Response(
+                    {"status_code": status.HTTP_400_BAD_REQUEST, "error_message": str(e)},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            
+            with transaction.atomic():
+                if not update_order_fields(order=order, expected_version=expected_version, status=status_data == str(1)):
+                    return order_version_conflict(order_id=order.id, status_code=conflict_status)
+                record_webhook_events(event_type='order.status_changed', orders=[order])
 
             serializer = OrderSerializer(order)
-            return Response(serializer.data, status=status.HTTP_200_OK)
+            publish_order_event(
+                user_ids=[order.user_id, order.delivery_crew_id], event_type='order.status_changed', order=serializer.data
+            )
+            return Response(serializer.data, status=status.HTTP_200_OK, headers={'ETag': order_etag(order.version)})
         return Response(
             {'error': 'Invalid status value. It should be 0 (in process) or 1 (delivered).'}, 
             status=status.HTTP_400_BAD_REQUEST
@@ -820,13 +1276,273 @@ def update_order_status(request: HttpRequest, order_id: int) -> Response:
 
 def delete_single_order(order_id: int, request: HttpRequest=None) -> Response:
     """Only Manager and Admin can delete order and orderitem using order_id"""
-    order = get_object_or_404(Order, id=order_id)
-    order_items = OrderItem.objects.filter(order=order)
-    order.delete()
-    order_items.delete()
+    order = get_object_or_404(Order.objects.only('id'), id=order_id)
+    delete_orders_batch(order_ids=[order.id])
+    record_audit_event(actor=getattr(request, 'user', None), action='delete', entity='order', entity_id=order.id)
     return Response(status=status.HTTP_204_NO_CONTENT)
 
 
+def purge_orders_by_filter(request: HttpRequest) -> Response:
+    """
+    Manager deletes orders by start_date, end_date, user_id and status filters in batches. Method: POST
+    
+    `dry_run=1` only counts matching orders. A single request deletes at most
+    `ORDERS_PURGE_MAX_BATCHES_PER_REQUEST` batches, repeat it while `done` is false.
+    """
+    try:
+        filters = parse_purge_filters(request.data)
+    except ValueError as e:
+        return Response(
+            {"status_code": status.HTTP_400_BAD_REQUEST, "error_message": str(e)},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    dry_run = str(request.data.get('dry_run', '0')).lower() in ('1', 'true')
+    result = purge_orders(
+        filters=filters,
+        batch_size=settings.ORDERS_PURGE_BATCH_SIZE,
+        dry_run=dry_run,
+        max_batches=settings.ORDERS_PURGE_MAX_BATCHES_PER_REQUEST,
+    )
+    if result['deleted']:
+        record_audit_event(
+            actor=request.user, action='purge', entity='order',
+            changes={"filters": filters, "deleted": result['deleted']}
+        )
+    return Response({**result, "dry_run": dry_run}, status=status.HTTP_200_OK)
+
+
+# Helper Function for Background jobs
+def enqueue_job(request: HttpRequest) -> Response:
+    """Manager enqueues a job of api.tasks by name, it runs in `manage.py runworker`. Method: POST"""
+    serializer = JobSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(
+            {"status_code": status.HTTP_400_BAD_REQUEST, "detail": serializer.errors},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    serializer.save()
+    return Response(serializer.data, status=status.HTTP_202_ACCEPTED)
+
+
+def get_job(job_id: int) -> Response:
+    """Status, attempts and last error of a job. Method: GET"""
+    job = get_object_or_404(Job, pk=job_id)
+    return Response(JobSerializer(job).data, status=status.HTTP_200_OK)
+
+
+# Helper Function for Audit log
+def parse_audit_filters(query_params) -> dict:
+    """Validate actor, entity, entity_id, action, since and until query params, raises ValueError"""
+    filters = {}
+    for param, lookup in (('actor', 'actor_id'), ('entity_id', 'entity_id')):
+        if query_params.get(param):
+            try:
+                filters[lookup] = int(query_params[param])
+            except ValueError:
+                raise ValueError(f"{param} should be an integer.")
+    for param in ('entity', 'action'):
+        if query_params.get(param):
+            filters[param] = query_params[param]
+    for param, lookup in (('since', 'created_at__gte'), ('until', 'created_at__lt')):
+        if query_params.get(param):
+            moment = parse_datetime(query_params[param])
+            if moment is None:
+                raise ValueError(f"{param} should be an ISO 8601 date time, e.g. 2024-01-31T12:00:00Z.")
+            filters[lookup] = moment if timezone.is_aware(moment) else timezone.make_aware(moment)
+    return filters
+
+
+def get_audit_events(request: HttpRequest) -> Response:
+    """
+    Manager lists audit events newest first, filtered by actor, entity (with entity_id), action
+    and since/until time range. Method: GET
+    
+    Events are written in batches, the last `AUDIT_FLUSH_INTERVAL` seconds may be missing.
+    """
+    try:
+        filters = parse_audit_filters(request.query_params)
+    except ValueError as e:
+        return Response(
+            {"status_code": status.HTTP_400_BAD_REQUEST, "error_message": str(e)},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    events = AuditEvent.objects.filter(**filters).order_by('-created_at', '-id')
+    paginated_events = apply_query_params_pagination(request=request, items=events)
+    return Response(AuditEventSerializer(paginated_events, many=True).data, status=status.HTTP_200_OK)
+
+
+# Helper Function for bulk Order updates
+ORDER_STATUS_VALUES = {'0': False, '1': True, 0: False, 1: True, False: False, True: True}
+
+
+def validate_bulk_order_items(data, value_field: str) -> list:
+    """Validate bulk body, a list of {"id": order_id, value_field: value}"""
+    if not isinstance(data, list) or not data:
+        raise ValueError(f"Expected a non-empty list of {{\"id\", \"{value_field}\"}} objects.")
+    if len(data) > settings.ORDERS_BULK_MAX_ITEMS:
+        raise ValueError(f"Too many items, maximum is {settings.ORDERS_BULK_MAX_ITEMS}.")
+    return data
+
+
+def parse_bulk_order_item(item, value_field: str, seen_ids: set) -> tuple:
+    """Returns (order_id, value) of bulk item or raises ValueError with the item error message"""
+    if not isinstance(item, dict):
+        raise ValueError("Item should be an object.")
+    try:
+        order_id = int(item['id'])
+    except (KeyError, TypeError, ValueError):
+        raise ValueError("id field is required.")
+    if order_id in seen_ids:
+        raise ValueError("Duplicate order id.")
+    if item.get(value_field) in (None, ''):
+        raise ValueError(f"{value_field} field is required.")
+    return order_id, item[value_field]
+
+
+def is_bulk_item_version_current(item: dict, version: int) -> bool:
+    """Bulk item may carry `version` the client based its change on"""
+    return item.get('version') in (None, '') or str(item['version']) == str(version)
+
+
+def bulk_version_conflict_result(order_id: int, version: int) -> dict:
+    return {"id": order_id, "status_code": status.HTTP_409_CONFLICT, "error_message": "Order was changed by another request, reload it and retry.", "version": version}
+
+
+def apply_bulk_version_conflicts(results: list, conflicts: set) -> list:
+    """Replace results of orders changed concurrently between validation and update"""
+    if not conflicts:
+        return results
+    current_versions = dict(Order.objects.filter(id__in=conflicts).values_list('id', 'version'))
+    return [
+        bulk_version_conflict_result(order_id=result['id'], version=current_versions.get(result['id']))
+        if result['status_code'] == status.HTTP_200_OK and result['id'] in conflicts else result
+        for result in results
+    ]
+
+
+def bulk_results_response(results: list) -> Response:
+    """Per-item results, 207 Multi-Status when some of items failed"""
+    all_succeeded = all(result['status_code'] == status.HTTP_200_OK for result in results)
+    return Response(results, status=status.HTTP_200_OK if all_succeeded else status.HTTP_207_MULTI_STATUS)
+
+
+def bulk_update_orders_status(request: HttpRequest) -> Response:
+    """Manager or Delivery updates status of many orders [{"id", "status"}], Delivery crew only its assigned orders. Method: PATCH"""
+    try:
+        items = validate_bulk_order_items(data=request.data, value_field='status')
+    except ValueError as e:
+        return Response(
+            {"status_code": status.HTTP_400_BAD_REQUEST, "error_message": str(e)},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    # Validate whole batch with one query
+    order_ids = [item.get('id') for item in items if isinstance(item, dict) and str(item.get('id', '')).isdigit()]
+    orders = {
+        order_id: (user_id, delivery_crew_id, version)
+        for order_id, user_id, delivery_crew_id, version in Order.objects.filter(id__in=order_ids).values_list('id', 'user_id', 'delivery_crew_id', 'version')
+    }
+    
+    results = []
+    ids_by_status = {False: [], True: []}
+    seen_ids = set()
+    for item in items:
+        try:
+            order_id, status_data = parse_bulk_order_item(item=item, value_field='status', seen_ids=seen_ids)
+        except ValueError as e:
+            results.append({"id": item.get('id') if isinstance(item, dict) else None, "status_code": status.HTTP_400_BAD_REQUEST, "error_message": str(e)})
+            continue
+        seen_ids.add(order_id)
+        
+        if order_id not in orders:
+            results.append({"id": order_id, "status_code": status.HTTP_404_NOT_FOUND, "error_message": "Not found."})
+        elif request.user_role == 'delivery' and orders[order_id][1] != request.user.id:
+            results.append({"id": order_id, "status_code": status.HTTP_403_FORBIDDEN, "error_message": "Permission Denied. This order is not assigned to you."})
+        elif not isinstance(status_data, (str, int)) or status_data not in ORDER_STATUS_VALUES:
+            results.append({"id": order_id, "status_code": status.HTTP_400_BAD_REQUEST, "error_message": "Invalid status value. It should be 0 (in process) or 1 (delivered)."})
+        elif not is_bulk_item_version_current(item=item, version=orders[order_id][2]):
+            results.append(bulk_version_conflict_result(order_id=order_id, version=orders[order_id][2]))
+        else:
+            ids_by_status[ORDER_STATUS_VALUES[status_data]].append(order_id)
+            results.append({"id": order_id, "status_code": status.HTTP_200_OK, "status": ORDER_STATUS_VALUES[status_data], "version": orders[order_id][2] + 1})
+    
+    conflicts = set()
+    with transaction.atomic():
+        for status_value, ids in ids_by_status.items():
+            if ids:
+                conflicts |= update_orders_fields(versions={order_id: orders[order_id][2] for order_id in ids}, status=status_value)
+        # Webhook and SSE events carry the order as the single order endpoints send it
+        updated_ids = [order_id for ids in ids_by_status.values() for order_id in ids if order_id not in conflicts]
+        updated_orders = record_webhook_events(
+            event_type='order.status_changed', orders=Order.objects.filter(id__in=updated_ids).order_by('id')
+        )
+    results = apply_bulk_version_conflicts(results=results, conflicts=conflicts)
+    
+    publish_order_events([
+        ([order['user'], order['delivery_crew']], 'order.status_changed', order) for order in updated_orders
+    ])
+    
+    return bulk_results_response(results=results)
+
+
+def bulk_set_delivery_to_orders(request: HttpRequest) -> Response:
+    """Manager assigns Delivery crew by username to many orders [{"id", "username"}]. Method: PUT"""
+    try:
+        items = validate_bulk_order_items(data=request.data, value_field='username')
+    except ValueError as e:
+        return Response(
+            {"status_code": status.HTTP_400_BAD_REQUEST, "error_message": str(e)},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    # Validate whole batch with one query for orders and one for delivery crew members
+    order_ids = [item.get('id') for item in items if isinstance(item, dict) and str(item.get('id', '')).isdigit()]
+    usernames = {str(item.get('username')) for item in items if isinstance(item, dict)}
+    orders = {
+        order_id: (delivery_crew_id, version)
+        for order_id, delivery_crew_id, version in Order.objects.filter(id__in=order_ids).values_list('id', 'delivery_crew_id', 'version')
+    }
+    delivery_crew = dict(
+        User.objects.filter(username__in=usernames, groups__name=settings.DELIVERY_CREW_GROUP_NAME).values_list('username', 'id')
+    )
+    
+    results = []
+    ids_by_delivery_crew = defaultdict(list)
+    seen_ids = set()
+    for item in items:
+        try:
+            order_id, username = parse_bulk_order_item(item=item, value_field='username', seen_ids=seen_ids)
+        except ValueError as e:
+            results.append({"id": item.get('id') if isinstance(item, dict) else None, "status_code": status.HTTP_400_BAD_REQUEST, "error_message": str(e)})
+            continue
+        seen_ids.add(order_id)
+        
+        if order_id not in orders:
+            results.append({"id": order_id, "status_code": status.HTTP_404_NOT_FOUND, "error_message": "Not found."})
+        elif str(username) not in delivery_crew:
+            results.append({"id": order_id, "status_code": status.HTTP_400_BAD_REQUEST, "error_message": f"The specified user is not a part of the '{settings.DELIVERY_CREW_GROUP_NAME}' group."})
+        elif not is_bulk_item_version_current(item=item, version=orders[order_id][1]):
+            results.append(bulk_version_conflict_result(order_id=order_id, version=orders[order_id][1]))
+        else:
+            ids_by_delivery_crew[delivery_crew[str(username)]].append(order_id)
+            results.append({"id": order_id, "status_code": status.HTTP_200_OK, "delivery_crew": delivery_crew[str(username)], "version": orders[order_id][1] + 1})
+    
+    conflicts = set()
+    with transaction.atomic():
+        for delivery_crew_id, ids in ids_by_delivery_crew.items():
+            conflicts |= update_orders_fields(versions={order_id: orders[order_id][1] for order_id in ids}, delivery_crew_id=delivery_crew_id)
+        updated_ids = [order_id for ids in ids_by_delivery_crew.values() for order_id in ids if order_id not in conflicts]
+        record_delivery_assignments(
+            actor=request.user, orders=Order.objects.filter(id__in=updated_ids).order_by('id'),
+            previous_delivery_crew_ids={order_id: orders[order_id][0] for order_id in updated_ids}
+        )
+    results = apply_bulk_version_conflicts(results=results, conflicts=conflicts)
+    
+    return bulk_results_response(results=results)
+
+
 def handle_orders(request: HttpRequest) -> Response:
     method_handlers: dict = {
         'GET': {
@@ -838,7 +1554,17 @@ def handle_orders(request: HttpRequest) -> Response:
             'manager': permission_denied,
             'delivery': permission_denied,
             'customer': create_new_order,
-        }
+        },
+        'PUT': {
+            'manager': bulk_set_delivery_to_orders,
+            'delivery': permission_denied,
+            'customer': permission_denied,
+        },
+        'PATCH': {
+            'manager': bulk_update_orders_status,
+            'delivery': bulk_update_orders_status,
+            'customer': permission_denied,
+        },
     }
     
     # Dispatching Using a Dictionary for request.method and has_permissions group/role by executing function with passed arguments
@@ -876,7 +1602,7 @@ def handle_order(request: HttpRequest, order_id: int) -> Response:
     return dict_dispatcher_method(request=request, order_id=order_id)
 
 
-@api_view(['GET', 'POST'])
+@api_view(['GET', 'POST', 'PUT', 'PATCH'])
 def orders(request: HttpRequest):
     return handle_orders(request=request)
 
@@ -886,6 +1612,244 @@ def order(request: HttpRequest, order_id: int):
     return handle_order(request=request, order_id=order_id)
 
 
+@api_view(['POST'])
+@permission_classes([IsGroupManager])
+@throttle_classes([ManagerGroupThrottle])
+def orders_purge(request: HttpRequest):
+    return purge_orders_by_filter(request=request)
+
+
+@api_view(['GET'])
+@permission_classes([IsGroupManager])
+@throttle_classes([ManagerGroupThrottle])
+def audit_events(request: HttpRequest):
+    return get_audit_events(request=request)
+
+
+@api_view(['POST'])
+@permission_classes([IsGroupManager])
+@throttle_classes([ManagerGroupThrottle])
+def jobs(request: HttpRequest):
+    return enqueue_job(request=request)
+
+
+@api_view(['GET'])
+@permission_classes([IsGroupManager])
+@throttle_classes([ManagerGroupThrottle])
+def job(request: HttpRequest, job_id: int):
+    return get_job(job_id=job_id)
+
+
+# Order events stream
+async def authenticate_stream_request(request: HttpRequest) -> User:
+    """Token authentication for async views that can not use DRF api_view, None if not authenticated."""
+    keyword, _, key = request.headers.get('Authorization', '').partition(' ')
+    if keyword != 'Token' or not key:
+        return None
+    try:
+        user, _ = await sync_to_async(TokenAuthentication().authenticate_credentials)(key)
+    except AuthenticationFailed:
+        return None
+    return user
+
+
+def format_server_sent_event(event: dict) -> bytes:
+    return b"event: " + event['type'].encode() + b"\ndata: " + dumps(event) + b"\n\n"
+
+
+async def stream_order_events(channel: str):
+    """Yield events of channel as Server-Sent Events, comment heartbeats keep idle connections open."""
+    queue = broker.subscribe(channel)
+    try:
+        yield f"retry: {settings.ORDER_EVENTS_RETRY_MS}\n\n".encode()
+        while True:
+            try:
+                event = await asyncio.wait_for(queue.get(), timeout=settings.ORDER_EVENTS_HEARTBEAT)
+            except asyncio.TimeoutError:
+                yield b": heartbeat\n\n"
+                continue
+            yield format_server_sent_event(event)
+    finally:
+        broker.unsubscribe(channel, queue)
+
+
+async def order_events(request: HttpRequest):
+    """
+    Server-Sent Events stream of the authenticated user orders, serve with the ASGI app. Method: GET
+    
+    Delivery crew receives `order.assigned`, `order.unassigned` and `order.status_changed`
+    events instead of polling `orders/`, customers receive `order.status_changed` of their orders.
+    """
+    if request.method != 'GET':
+        return JsonResponse({"detail": "Invalid method for this endpoint."}, status=status.HTTP_405_METHOD_NOT_ALLOWED)
+    
+    user = await authenticate_stream_request(request=request)
+    if user is None:
+        return JsonResponse({"detail": "Authentication credentials were not provided."}, status=status.HTTP_401_UNAUTHORIZED)
+    
+    response = StreamingHttpResponse(stream_order_events(user_channel(user.id)), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+# Batch requests
+BATCH_SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+BATCH_ALLOWED_METHODS = BATCH_SAFE_METHODS + ('POST', 'PUT', 'PATCH', 'DELETE')
+BATCH_PATH_PREFIX = '/api/v1/'
+
+_batch_executor = None
+
+
+def get_batch_executor() -> ThreadPoolExecutor:
+    """Thread pool shared by batch requests of this worker process for concurrent read sub-requests."""
+    global _batch_executor
+    if _batch_executor is None:
+        _batch_executor = ThreadPoolExecutor(max_workers=settings.BATCH_MAX_WORKERS, thread_name_prefix='batch')
+    return _batch_executor
+
+
+def validate_batch_requests(data) -> list:
+    """Validate batch body, list of {"method", "path", "body"} or {"requests": [...]}"""
+    sub_requests = data.get('requests') if isinstance(data, dict) else data
+    
+    if not isinstance(sub_requests, list) or not sub_requests:
+        raise ValueError("Expected a non-empty list of sub-requests.")
+    if len(sub_requests) > settings.BATCH_MAX_REQUESTS:
+        raise ValueError(f"Too many sub-requests, maximum is {settings.BATCH_MAX_REQUESTS}.")
+    
+    for index, sub_request in enumerate(sub_requests):
+        if not isinstance(sub_request, dict) or not isinstance(sub_request.get('path'), str):
+            raise ValueError(f"Sub-request {index}: path field is required.")
+        
+        sub_request['method'] = str(sub_request.get('method', 'GET')).upper()
+        if sub_request['method'] not in BATCH_ALLOWED_METHODS:
+            raise ValueError(f"Sub-request {index}: method {sub_request['method']} is not allowed.")
+        
+        # Relative paths are resolved against the API root, `category/` -> `/api/v1/category/`
+        if not sub_request['path'].startswith('/'):
+            sub_request['path'] = BATCH_PATH_PREFIX + sub_request['path']
+        if not sub_request['path'].startswith(BATCH_PATH_PREFIX):
+            raise ValueError(f"Sub-request {index}: only {BATCH_PATH_PREFIX} endpoints can be batched.")
+    
+    return sub_requests
+
+
+def build_subrequest(request: HttpRequest, sub_request: dict) -> HttpRequest:
+    """Build a Django request for a sub-request, it reuses the already authenticated user of the batch request."""
+    path, _, query_string = sub_request['path'].partition('?')
+    body = dumps(sub_request['body']) if sub_request.get('body') is not None else b''
+    
+    environ = request._request.META.copy()
+    # Sub-request bodies are embedded in the batch response, which is compressed as a whole
+    environ.pop('HTTP_ACCEPT_ENCODING', None)
+    environ.update({
+        'REQUEST_METHOD': sub_request['method'],
+        'PATH_INFO': path,
+        'QUERY_STRING': query_string,
+        'CONTENT_TYPE': 'application/json',
+        'CONTENT_LENGTH': str(len(body)),
+        'wsgi.input': io.BytesIO(body),
+    })
+    subrequest = WSGIRequest(environ)
+    
+    # DRF skips authenticators when user is forced, and throttles skip batched sub-requests
+    subrequest._force_auth_user = request.user
+    subrequest._force_auth_token = request.auth
+    subrequest.is_batch_subrequest = True
+    return subrequest
+
+
+def dispatch_subrequest(request: HttpRequest, sub_request: dict) -> dict:
+    """Dispatch a single sub-request through the URL resolver and return its status and body."""
+    result = {"method": sub_request['method'], "path": sub_request['path']}
+    subrequest = build_subrequest(request=request, sub_request=sub_request)
+    
+    try:
+        match = resolve(subrequest.path_info)
+    except Resolver404:
+        return {**result, "status": status.HTTP_404_NOT_FOUND, "body": {"detail": "Not found."}}
+    
+    if match.func is batch:
+        return {**result, "status": status.HTTP_400_BAD_REQUEST, "body": {"detail": "Nested batch requests are not allowed."}}
+    # e.g. the orders events stream, it would only return a coroutine here
+    if iscoroutinefunction(match.func):
+        return {**result, "status": status.HTTP_400_BAD_REQUEST, "body": {"detail": "Streaming endpoints can not be batched."}}
+    
+    try:
+        response = match.func(subrequest, *match.args, **match.kwargs)
+    except Exception:
+        logger.exception("Batch sub-request %s %s failed", sub_request['method'], sub_request['path'])
+        return {**result, "status": status.HTTP_500_INTERNAL_SERVER_ERROR, "body": {"detail": "Internal server error."}}
+    
+    if getattr(response, 'streaming', False):
+        response.close()
+        return {**result, "status": status.HTTP_400_BAD_REQUEST, "body": {"detail": "Streaming endpoints can not be batched."}}
+    
+    try:
+        if hasattr(response, 'data'):
+            body = response.data
+        elif not response.content:
+            body = None
+        else:
+            body = json.loads(response.content)
+    except ValueError:
+        # Not JSON, e.g. a compressed or HTML body
+        logger.exception("Batch sub-request %s %s returned a body that is not JSON", sub_request['method'], sub_request['path'])
+        return {**result, "status": status.HTTP_502_BAD_GATEWAY, "body": {"detail": "Response body is not JSON."}}
+    return {**result, "status": response.status_code, "body": body}
+
+
+def dispatch_subrequest_in_thread(request: HttpRequest, sub_request: dict) -> dict:
+    try:
+        return dispatch_subrequest(request=request, sub_request=sub_request)
+    finally:
+        # Pool threads get their own DB connections, close them like request_finished does
+        connections.close_all()
+
+
+def handle_batch(request: HttpRequest) -> Response:
+    """Run sub-requests in order, consecutive read sub-requests run concurrently in the thread pool. Method: POST"""
+    try:
+        sub_requests = validate_batch_requests(request.data)
+    except ValueError as e:
+        return Response(
+            {"status_code": status.HTTP_400_BAD_REQUEST, "error_message": str(e)},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    results = []
+    pending_reads = []
+    
+    def flush_reads():
+        if len(pending_reads) == 1:
+            results.append(dispatch_subrequest(request=request, sub_request=pending_reads[0]))
+        elif pending_reads:
+            executor = get_batch_executor()
+            futures = [
+                executor.submit(dispatch_subrequest_in_thread, request, sub_request)
+                for sub_request in pending_reads
+            ]
+            results.extend(future.result() for future in futures)
+        pending_reads.clear()
+    
+    # Writes are barriers so a read after a write sees its result
+    for sub_request in sub_requests:
+        if sub_request['method'] in BATCH_SAFE_METHODS:
+            pending_reads.append(sub_request)
+        else:
+            flush_reads()
+            results.append(dispatch_subrequest(request=request, sub_request=sub_request))
+    flush_reads()
+    
+    return Response(results, status=status.HTTP_200_OK)
+
+
+@api_view(['POST'])
+def batch(request: HttpRequest):
+    return handle_batch(request=request)
+
+
 # Testing
 def throttle_based_on_user_group(view_func):
     """Decorator"""
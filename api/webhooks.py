@@ -0,0 +1,179 @@
+"""
+Order webhooks through a transactional outbox.
+
+Order changes insert a `WebhookEvent` row in their own transaction (`record_webhook_events()`),
+nothing is sent from the request. `manage.py dispatch_webhooks --loop` reads the outbox and
+sends every active `WebhookEndpoint` the events after its cursor, up to `WEBHOOK_BATCH_SIZE`
+per `POST` as {"events": [...]}, over one pooled `requests.Session`. Endpoints are served by
+a thread pool, a slow endpoint delays only itself.
+
+A 2xx response moves the endpoint cursor past the batch. Anything else keeps the cursor and
+retries the same batch after `WEBHOOK_RETRY_BACKOFF * 2 ** (failures - 1)` seconds, capped
+by `WEBHOOK_RETRY_BACKOFF_MAX`, so every endpoint gets every event at least once and in order.
+Receivers deduplicate by event id.
+
+Requests are signed: `X-Webhook-Signature: t=<unix time>,v1=<hex HMAC-SHA256 of "<t>.<body>">`
+with the endpoint secret, receivers check it with `verify_signature()`.
+"""
+import datetime
+import hashlib
+import hmac
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import Min
+from django.utils import timezone
+from requests.adapters import HTTPAdapter
+
+from api.db import insert_rows
+from api.models import WebhookEndpoint, WebhookEvent
+from api.renderers import dumps
+from api.serializers import OrderSerializer
+
+
+SIGNATURE_HEADER = 'X-Webhook-Signature'
+
+
+# Fields that are not plain JSON values are rendered by the serializer fields themselves
+ORDER_FIELDS = OrderSerializer().fields
+# Order columns of a payload, `values_list(*ORDER_PAYLOAD_COLUMNS, named=True)` rows work like instances
+ORDER_PAYLOAD_COLUMNS = ['id', 'user_id', 'status', 'delivery_crew_id', 'date', 'total', 'version', 'item_count', 'items_preview']
+
+
+def get_orders_payloads(orders) -> list:
+    """Orders or their named rows as `OrderSerializer` renders them, without its per field overhead on thousands of orders."""
+    to_date, to_total = ORDER_FIELDS['date'].to_representation, ORDER_FIELDS['total'].to_representation
+    return [
+        {
+            'id': order.id, 'user': order.user_id, 'status': order.status, 'delivery_crew': order.delivery_crew_id,
+            'date': to_date(order.date), 'total': to_total(order.total), 'version': order.version,
+            'item_count': order.item_count, 'items_preview': order.items_preview,
+        }
+        for order in orders
+    ]
+
+
+# One payload builder per event type, every source of an event type sends the same shape
+PAYLOAD_BUILDERS = {
+    'order.created': get_orders_payloads,
+    'order.status_changed': get_orders_payloads,
+    'order.assigned': get_orders_payloads,
+}
+
+
+def record_webhook_events(event_type: str, orders) -> list:
+    """Add events of changed orders to the outbox, call it inside the transaction of the change. Returns the payloads."""
+    payloads = PAYLOAD_BUILDERS[event_type](orders)
+    if not payloads:
+        return payloads
+
+    # A dispatcher cycle writes thousands of events, bulk_create() spends more time per row than the database does
+    created_at = timezone.now()
+    insert_rows(WebhookEvent, [
+        {'event_type': event_type, 'payload': payload, 'created_at': created_at} for payload in payloads
+    ])
+    return payloads
+
+
+def sign(secret: str, timestamp: int, body: bytes) -> str:
+    digest = hmac.new(secret.encode(), f"{timestamp}.".encode() + body, hashlib.sha256).hexdigest()
+    return f"t={timestamp},v1={digest}"
+
+
+def verify_signature(secret: str, body: bytes, header: str, tolerance: int = 300) -> bool:
+    """Check the signature header of a webhook request, requests older than `tolerance` seconds are rejected."""
+    try:
+        parts = dict(part.split('=', 1) for part in header.split(','))
+        timestamp = int(parts['t'])
+    except (KeyError, ValueError):
+        return False
+    if abs(time.time() - timestamp) > tolerance:
+        return False
+    return hmac.compare_digest(sign(secret, timestamp, body), f"t={timestamp},v1={parts.get('v1', '')}")
+
+
+def get_session() -> requests.Session:
+    """Session with a keep-alive connection pool per endpoint host."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=settings.WEBHOOK_POOL_SIZE, pool_maxsize=settings.WEBHOOK_POOL_SIZE)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    session.headers['Content-Type'] = 'application/json'
+    return session
+
+
+def get_retry_delay(failures: int) -> float:
+    return min(settings.WEBHOOK_RETRY_BACKOFF * 2 ** (failures - 1), settings.WEBHOOK_RETRY_BACKOFF_MAX)
+
+
+def get_pending_events(endpoint: WebhookEndpoint) -> list:
+    # Recent rows are left for the next cycle, a transaction that got a lower id may not have committed yet
+    settled = timezone.now() - datetime.timedelta(seconds=settings.WEBHOOK_COMMIT_GRACE)
+    events = WebhookEvent.objects.filter(id__gt=endpoint.last_event_id, created_at__lte=settled)
+    if endpoint.event_types:
+        events = events.filter(event_type__in=endpoint.event_types)
+    return list(events.order_by('id')[:settings.WEBHOOK_BATCH_SIZE])
+
+
+def deliver_batch(session: requests.Session, endpoint: WebhookEndpoint, events: list) -> bool:
+    """Send one batch and move the cursor or schedule a retry, True when the endpoint accepted it."""
+    body = dumps({
+        'events': [
+            {'id': event.id, 'type': event.event_type, 'created_at': event.created_at, 'data': event.payload}
+            for event in events
+        ]
+    })
+    try:
+        response = session.post(
+            endpoint.url, data=body, timeout=settings.WEBHOOK_TIMEOUT,
+            headers={SIGNATURE_HEADER: sign(endpoint.secret, int(time.time()), body)},
+        )
+        error = '' if 200 <= response.status_code < 300 else f"HTTP {response.status_code}: {response.text[:500]}"
+    except requests.RequestException as e:
+        error = f"{type(e).__name__}: {e}"
+
+    endpoints = WebhookEndpoint.objects.filter(id=endpoint.id)
+    if not error:
+        endpoints.update(last_event_id=events[-1].id, failures=0, next_attempt_at=None, last_error='')
+        return True
+
+    failures = endpoint.failures + 1
+    endpoints.update(
+        failures=failures, last_error=error,
+        next_attempt_at=timezone.now() + datetime.timedelta(seconds=get_retry_delay(failures)),
+    )
+    return False
+
+
+def dispatch_endpoint(session: requests.Session, endpoint: WebhookEndpoint) -> tuple:
+    """Deliver the next batch of an endpoint, returns (events sent, more events may be waiting)."""
+    try:
+        events = get_pending_events(endpoint)
+        if not events:
+            return 0, False
+        if not deliver_batch(session, endpoint, events):
+            return 0, False
+        return len(events), len(events) == settings.WEBHOOK_BATCH_SIZE
+    finally:
+        close_old_connections()
+
+
+def dispatch_webhooks(session: requests.Session, executor: ThreadPoolExecutor) -> tuple:
+    """One batch for every due endpoint, returns (events sent, some endpoint has a backlog)."""
+    now = timezone.now()
+    endpoints = WebhookEndpoint.objects.filter(is_active=True).exclude(next_attempt_at__gt=now)
+    results = list(executor.map(lambda endpoint: dispatch_endpoint(session, endpoint), endpoints))
+    return sum(sent for sent, _ in results), any(backlog for _, backlog in results)
+
+
+def purge_webhook_events(age: datetime.timedelta) -> int:
+    """Delete events older than `age` that every active endpoint has received. Returns deleted count."""
+    delivered_id = WebhookEndpoint.objects.filter(is_active=True).aggregate(id=Min('last_event_id'))['id']
+    events = WebhookEvent.objects.filter(created_at__lt=timezone.now() - age)
+    if delivered_id is not None:
+        events = events.filter(id__lte=delivered_id)
+    deleted, _ = events.delete()
+    return deleted
@@ -0,0 +1,91 @@
+"""
+Throughput of cache backends: `config.cache.SQLiteCache` against Django `FileBasedCache`
+(the other cross-process backend without an external service) and per-process `LocMemCache`.
+
+Every backend works in its own temporary directory with the same keys and values,
+a value is a list of serialized menu items of about 1 KB. Reported per operation:
+get of an existing key, get of a missing key, set and incr.
+
+Usage:
+    python benchmarks/cache_backends.py --keys 1000 --operations 20000
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+BACKENDS = {
+    'sqlite': 'config.cache.SQLiteCache',
+    'filebased': 'django.core.cache.backends.filebased.FileBasedCache',
+    'locmem': 'django.core.cache.backends.locmem.LocMemCache',
+}
+
+
+def make_value(index: int) -> list:
+    return [
+        {'id': index * 10 + i, 'title': f'Menu item {i}', 'price': '9.99', 'featured': bool(i % 2), 'category': {'id': 1, 'slug': 'main'}}
+        for i in range(10)
+    ]
+
+
+def run_backend(backend: str, location: str, keys: int, operations: int) -> dict:
+    from django.utils.module_loading import import_string
+
+    cache = import_string(backend)(location, {'OPTIONS': {'MAX_ENTRIES': keys * 10}, 'TIMEOUT': 3600})
+    names = [f'bench:{index}' for index in range(keys)]
+    for index, name in enumerate(names):
+        cache.set(name, make_value(index))
+    cache.set('bench:counter', 0)
+
+    def timed(operation) -> float:
+        started = time.perf_counter()
+        for _ in range(operations):
+            operation()
+        return operations / (time.perf_counter() - started)
+
+    value = make_value(0)
+    results = {
+        'get': timed(lambda: cache.get(random.choice(names))),
+        'get miss': timed(lambda: cache.get('bench:missing')),
+        'set': timed(lambda: cache.set(random.choice(names), value)),
+        'incr': timed(lambda: cache.incr('bench:counter')),
+    }
+    cache.close()
+    return results
+
+
+def parse_args(argv: list) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--keys', type=int, default=1000)
+    parser.add_argument('--operations', type=int, default=20000, help='operations per measurement')
+    parser.add_argument('--backend', action='append', choices=BACKENDS, help='backends to run, all by default')
+    return parser.parse_args(argv)
+
+
+def main(argv: list = None) -> None:
+    args = parse_args(argv)
+    sys.path.insert(0, str(BASE_DIR))
+    from django.conf import settings
+    settings.configure()
+
+    results = {}
+    for name in args.backend or BACKENDS:
+        with tempfile.TemporaryDirectory() as directory:
+            location = os.path.join(directory, 'cache.sqlite3') if name == 'sqlite' else directory
+            results[name] = run_backend(BACKENDS[name], location, args.keys, args.operations)
+
+    operations = list(next(iter(results.values())))
+    print(f"{'backend':<10}" + ''.join(f"{operation + ' op/s':>16}" for operation in operations))
+    for name, result in results.items():
+        print(f"{name:<10}" + ''.join(f"{result[operation]:>16,.0f}" for operation in operations))
+
+
+if __name__ == '__main__':
+    main()
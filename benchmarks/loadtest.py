@@ -0,0 +1,358 @@
+"""
+Load testing tool that replays the Insomnia collection from `docs/API`.
+
+Requests are taken from the exported collection by name and grouped into weighted
+scenarios per role (customer, delivery crew, manager). Every worker thread keeps its
+own keep-alive connection to the server and picks scenarios by weight until the
+duration is over, then throughput, latency percentiles and error rates are printed
+per endpoint.
+
+Only the standard library is used and nothing leaves the target host, so it runs fully offline.
+
+Usage:
+    python manage.py runserver --noreload
+    python benchmarks/loadtest.py --base-url http://127.0.0.1:8000 --concurrency 16 --duration 30
+
+Note: `DEFAULT_THROTTLE_RATES` in `config/settings.py` will answer most requests with 429
+under load, raise the rates on the server you test against to measure the API itself.
+"""
+
+import argparse
+import http.client
+import json
+import random
+import re
+import threading
+import time
+from collections import defaultdict
+from pathlib import Path
+from urllib.parse import urlencode, urlsplit
+
+
+DEFAULT_COLLECTION = Path(__file__).resolve().parent.parent / 'docs' / 'API' / 'Insomnia_2024-01-23.json'
+
+# Accounts used for each role, passwords are looked up in the collection login/sign up requests
+DEFAULT_ACCOUNTS = {
+    'customer': 'jessica',
+    'delivery': 'robert',
+    'manager': 'johndoe',
+}
+
+LOGIN_PATH = '/token/login/'
+
+
+# Scenario steps reference collection requests by their name in Insomnia,
+# `method`, `params` and `data` override what is saved in the collection.
+SCENARIOS = {
+    'browse_menu': {
+        'role': 'customer',
+        'weight': 5,
+        'steps': [
+            {'request': 'category'},
+            {'request': 'menu items'},
+            {'request': 'menu items', 'params': {'page': 2}},
+        ],
+    },
+    'add_to_cart': {
+        'role': 'customer',
+        'weight': 3,
+        'steps': [
+            {'request': 'menu items'},
+            {'request': 'cart', 'method': 'DELETE', 'params': {}},
+            {'request': 'cart', 'method': 'POST', 'params': {}, 'data': {'menuitem': '{menuitem}', 'quantity': 1}},
+            {'request': 'cart'},
+        ],
+    },
+    'checkout': {
+        'role': 'customer',
+        'weight': 1,
+        'steps': [
+            {'request': 'cart', 'method': 'DELETE', 'params': {}},
+            {'request': 'cart', 'method': 'POST', 'params': {}, 'data': {'menuitem': '{menuitem}', 'quantity': 2}},
+            {'request': 'orders customer', 'method': 'POST', 'path': '/api/v1/orders/', 'params': {}},
+        ],
+    },
+    'delivery_polling': {
+        'role': 'delivery',
+        'weight': 4,
+        'steps': [
+            {'request': 'orders delivery'},
+        ],
+    },
+    'manager_reports': {
+        'role': 'manager',
+        'weight': 1,
+        'steps': [
+            {'request': 'orders manager'},
+            {'request': 'orders manager', 'params': {'status': 0, 'delivery_set_status': 0, 'ordering': '-id'}},
+            {'request': 'delivery crew users'},
+        ],
+    },
+}
+
+
+class Collection:
+    """Requests and credentials parsed from an Insomnia v4 export."""
+    def __init__(self, path: Path) -> None:
+        with open(path, encoding='utf-8') as file:
+            export = json.load(file)
+
+        self.requests = {}
+        self.credentials = {}
+
+        for resource in export['resources']:
+            if resource['_type'] != 'request':
+                continue
+            self.requests[resource['name']] = resource
+            self._collect_credentials(resource)
+
+    def _collect_credentials(self, resource: dict) -> None:
+        """Pair username/password body params, the login request wins over sign up requests."""
+        body_params = resource.get('body', {}).get('params', [])
+        is_login = '/token/login' in resource['url']
+        username = None
+        for param in body_params:
+            if param['name'] == 'username':
+                username = param['value']
+            elif param['name'] == 'password' and username:
+                if is_login or username not in self.credentials:
+                    self.credentials[username] = param['value']
+                username = None
+
+    def get(self, name: str) -> dict:
+        try:
+            return self.requests[name]
+        except KeyError:
+            raise SystemExit(f"Request '{name}' is not in the collection, available: {', '.join(self.requests)}")
+
+
+class Stats:
+    """Thread safe latency and status code counters per endpoint."""
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.status_codes = defaultdict(lambda: defaultdict(int))
+
+    def record(self, endpoint: str, latency: float, status_code: int) -> None:
+        with self.lock:
+            self.latencies[endpoint].append(latency)
+            self.status_codes[endpoint][status_code] += 1
+
+
+def percentile(sorted_values: list, percent: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(int(round(percent / 100 * len(sorted_values) + 0.5)) - 1, 0)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+
+def endpoint_key(method: str, path: str) -> str:
+    """Group statistics by route instead of by concrete id in the url."""
+    return f"{method} {re.sub(r'/[0-9]+', '/<id>', path)}"
+
+
+class Client:
+    """Keep-alive HTTP connection of a single worker."""
+    def __init__(self, base_url: str, timeout: float) -> None:
+        parts = urlsplit(base_url)
+        connection_class = http.client.HTTPSConnection if parts.scheme == 'https' else http.client.HTTPConnection
+        self.connection = connection_class(parts.hostname, parts.port, timeout=timeout)
+
+    def request(self, method: str, path: str, token: str = None, data: dict = None) -> tuple:
+        headers = {'Accept': 'application/json'}
+        body = None
+        if token:
+            headers['Authorization'] = f"Token {token}"
+        if data is not None:
+            body = urlencode(data)
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+
+        try:
+            self.connection.request(method, path, body=body, headers=headers)
+            response = self.connection.getresponse()
+            return response.status, response.read()
+        except (OSError, http.client.HTTPException):
+            # Connection was dropped, reconnect on the next request
+            self.connection.close()
+            return 0, b''
+
+
+def login(base_url: str, username: str, password: str) -> str:
+    """Get a token through djoser `token/login/`."""
+    status_code, body = Client(base_url, timeout=10).request(
+        'POST', LOGIN_PATH, data={'username': username, 'password': password}
+    )
+    if status_code != 200:
+        raise SystemExit(f"Login failed for '{username}' with status {status_code}: {body[:200]!r}")
+    return json.loads(body)['auth_token']
+
+
+def build_step(collection: Collection, step: dict) -> dict:
+    """Resolve a scenario step against the collection into method, path and form data."""
+    resource = collection.get(step['request'])
+    url = urlsplit(resource['url'])
+
+    params = {
+        param['name']: param['value']
+        for param in resource.get('parameters', [])
+        if not param.get('disabled') and param.get('value') != ''
+    }
+    if 'params' in step:
+        params = {**params, **step['params']} if step['params'] else {}
+
+    path = step.get('path', url.path)
+    if params:
+        path = f"{path}?{urlencode(params)}"
+
+    return {
+        'method': step.get('method', resource['method']),
+        'path': path,
+        'endpoint': endpoint_key(step.get('method', resource['method']), step.get('path', url.path)),
+        'data': step.get('data'),
+    }
+
+
+def discover_menu_item_ids(base_url: str, token: str) -> list:
+    status_code, body = Client(base_url, timeout=10).request('GET', '/api/v1/menu-items/?perpage=100', token=token)
+    if status_code != 200:
+        return []
+    return [item['id'] for item in json.loads(body)]
+
+
+def worker(base_url: str, scenarios: list, weights: list, tokens: dict, menu_item_ids: list,
+           stats: Stats, deadline: float, timeout: float) -> None:
+    client = Client(base_url, timeout=timeout)
+
+    while time.perf_counter() < deadline:
+        scenario = random.choices(scenarios, weights=weights)[0]
+        token = tokens[scenario['role']]
+
+        for step in scenario['steps']:
+            data = step['data']
+            if data:
+                data = {
+                    key: random.choice(menu_item_ids) if value == '{menuitem}' else value
+                    for key, value in data.items()
+                }
+
+            started = time.perf_counter()
+            status_code, _ = client.request(step['method'], step['path'], token=token, data=data)
+            stats.record(step['endpoint'], time.perf_counter() - started, status_code)
+
+
+def print_report(stats: Stats, elapsed: float) -> None:
+    header = f"{'endpoint':<42} {'requests':>9} {'req/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7}  status codes"
+    print(header)
+    print('-' * len(header))
+
+    total_requests = 0
+    total_errors = 0
+    for endpoint in sorted(stats.latencies):
+        latencies = sorted(stats.latencies[endpoint])
+        status_codes = stats.status_codes[endpoint]
+        errors = sum(count for code, count in status_codes.items() if code == 0 or code >= 400)
+        total_requests += len(latencies)
+        total_errors += errors
+
+        codes = ' '.join(f"{code}:{count}" for code, count in sorted(status_codes.items()))
+        print(
+            f"{endpoint:<42} {len(latencies):>9} {len(latencies) / elapsed:>9.1f} "
+            f"{percentile(latencies, 50) * 1000:>8.1f} {percentile(latencies, 95) * 1000:>8.1f} "
+            f"{percentile(latencies, 99) * 1000:>8.1f} {errors / len(latencies):>7.1%}  {codes}"
+        )
+
+    print('-' * len(header))
+    if total_requests:
+        print(
+            f"total: {total_requests} requests in {elapsed:.1f}s, "
+            f"{total_requests / elapsed:.1f} req/s, error rate {total_errors / total_requests:.1%}"
+        )
+
+
+def parse_args(argv: list) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--base-url', default='http://127.0.0.1:8000')
+    parser.add_argument('--collection', type=Path, default=DEFAULT_COLLECTION)
+    parser.add_argument('--concurrency', type=int, default=8, help='number of worker threads')
+    parser.add_argument('--duration', type=float, default=30, help='seconds to run')
+    parser.add_argument('--timeout', type=float, default=30, help='socket timeout in seconds')
+    parser.add_argument(
+        '--scenario', action='append', metavar='NAME[=WEIGHT]',
+        help=f"run only these scenarios, optionally overriding weight. Available: {', '.join(SCENARIOS)}"
+    )
+    parser.add_argument(
+        '--account', action='append', metavar='ROLE=USERNAME[:PASSWORD]',
+        help='account for a role, password defaults to the one saved in the collection'
+    )
+    parser.add_argument('--seed', type=int, help='random seed to make scenario choice reproducible')
+    return parser.parse_args(argv)
+
+
+def main(argv: list = None) -> None:
+    args = parse_args(argv)
+    if args.seed is not None:
+        random.seed(args.seed)
+
+    collection = Collection(args.collection)
+
+    selected = {}
+    for option in args.scenario or [f"{name}={scenario['weight']}" for name, scenario in SCENARIOS.items()]:
+        name, _, weight = option.partition('=')
+        if name not in SCENARIOS:
+            raise SystemExit(f"Unknown scenario '{name}', available: {', '.join(SCENARIOS)}")
+        selected[name] = float(weight) if weight else SCENARIOS[name]['weight']
+
+    accounts = {role: (username, collection.credentials.get(username)) for role, username in DEFAULT_ACCOUNTS.items()}
+    for option in args.account or []:
+        role, _, credentials = option.partition('=')
+        username, _, password = credentials.partition(':')
+        accounts[role] = (username, password or collection.credentials.get(username))
+
+    # Log in once per role that is actually used, workers share the tokens
+    tokens = {}
+    for name in selected:
+        role = SCENARIOS[name]['role']
+        if role in tokens:
+            continue
+        username, password = accounts[role]
+        if not password:
+            raise SystemExit(f"No password for '{username}', pass it with --account {role}={username}:PASSWORD")
+        tokens[role] = login(args.base_url, username, password)
+
+    scenarios = []
+    for name in selected:
+        scenario = SCENARIOS[name]
+        scenarios.append({
+            'role': scenario['role'],
+            'steps': [build_step(collection, step) for step in scenario['steps']],
+        })
+    weights = list(selected.values())
+
+    menu_item_ids = discover_menu_item_ids(args.base_url, tokens.get('customer') or next(iter(tokens.values())))
+    if not menu_item_ids:
+        menu_item_ids = [9]  # menu item saved in the collection cart request
+
+    stats = Stats()
+    print(f"Running {', '.join(selected)} with {args.concurrency} workers for {args.duration:.0f}s against {args.base_url}")
+
+    started = time.perf_counter()
+    deadline = started + args.duration
+    threads = [
+        threading.Thread(
+            target=worker,
+            args=(args.base_url, scenarios, weights, tokens, menu_item_ids, stats, deadline, args.timeout),
+            daemon=True,
+        )
+        for _ in range(args.concurrency)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    print_report(stats, time.perf_counter() - started)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,131 @@
+"""
+Per-request cost of the middleware stack for token authenticated API requests.
+
+Requests go in-process through the Django handler (no network, no server) with the
+stock Django middleware list and with `MIDDLEWARE` from `config/settings.py`, which
+skips session, CSRF, auth and messages middleware for `/api/v1/` token requests.
+Database is a fresh temporary SQLite file seeded with a few menu items.
+
+A path that does not exist (404) runs no view and no queries and shows the cost of the stack alone.
+
+Usage:
+    python benchmarks/middleware_profiles.py --requests 5000 --path "/api/v1/menu-items/?perpage=3"
+    python benchmarks/middleware_profiles.py --requests 20000 --path /api/v1/missing/
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+import warnings
+from pathlib import Path
+
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+FULL_MIDDLEWARE = [
+    'django.middleware.security.SecurityMiddleware',
+    'api.middleware.CompressionMiddleware',
+    'django.contrib.sessions.middleware.SessionMiddleware',
+    'django.middleware.common.CommonMiddleware',
+    'django.middleware.csrf.CsrfViewMiddleware',
+    'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'django.contrib.messages.middleware.MessageMiddleware',
+    'django.middleware.clickjacking.XFrameOptionsMiddleware',
+]
+
+
+def setup(database_path: str) -> str:
+    """Migrate and seed a fresh database, returns a customer token."""
+    os.environ['DJANGO_DATABASE_NAME'] = database_path
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+    sys.path.insert(0, str(BASE_DIR))
+    import django
+    django.setup()
+
+    from django.conf import settings
+    # Benchmark measures the stack, not the throttle
+    settings.REST_FRAMEWORK['DEFAULT_THROTTLE_RATES'] = {key: '1000000/minute' for key in ('user', 'delivery', 'manager')}
+    settings.ALLOWED_HOSTS = ['testserver']
+    settings.DEBUG = False  # debug 404 page and query log are not a production cost
+
+    from django.contrib.auth.models import User
+    from django.core.management import call_command
+    from rest_framework.authtoken.models import Token
+    from api.models import Category, MenuItem
+
+    call_command('migrate', verbosity=0)
+    category = Category.objects.create(slug='main', title='Main')
+    MenuItem.objects.bulk_create(
+        MenuItem(title=f'Item {i}', price='9.99', featured=False, category=category) for i in range(10)
+    )
+    user = User.objects.create_user('benchmark', password='benchmark')
+    return Token.objects.create(user=user).key
+
+
+def make_client(middleware: list, path: str, token: str):
+    """Client whose handler has loaded `middleware`, the chain is built on the first request."""
+    from django.test import Client, override_settings
+
+    client = Client(HTTP_AUTHORIZATION=f'Token {token}')
+    with override_settings(MIDDLEWARE=middleware):
+        response = client.get(path)
+    if response.status_code not in (200, 404):
+        raise SystemExit(f"{path} answered {response.status_code}: {response.content[:200]!r}")
+    return client
+
+
+def measure(clients: dict, path: str, requests: int, rounds: int = 20) -> dict:
+    """Profiles take turns in rounds so CPU frequency and cache drift hit all of them alike."""
+    for client in clients.values():
+        for _ in range(min(200, requests)):  # warm up
+            client.get(path)
+
+    timings = {name: [] for name in clients}
+    for _ in range(rounds):
+        for name, client in clients.items():
+            for _ in range(max(1, requests // rounds)):
+                started = time.perf_counter()
+                client.get(path)
+                timings[name].append(time.perf_counter() - started)
+
+    for values in timings.values():
+        values.sort()
+    return timings
+
+
+def parse_args(argv: list) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=5000, help='requests per profile')
+    parser.add_argument('--path', default='/api/v1/menu-items/?perpage=3')
+    return parser.parse_args(argv)
+
+
+def main(argv: list = None) -> None:
+    args = parse_args(argv)
+    # Unordered pagination warning of menu items would be timed as well
+    warnings.simplefilter('ignore')
+    with tempfile.TemporaryDirectory() as directory:
+        token = setup(os.path.join(directory, 'bench.sqlite3'))
+
+        from django.conf import settings
+        profiles = {'full': FULL_MIDDLEWARE, 'token-lean': settings.MIDDLEWARE}
+        clients = {name: make_client(middleware, args.path, token) for name, middleware in profiles.items()}
+        results = measure(clients, args.path, args.requests)
+
+    print(f"{'profile':<12} {'mean us':>9} {'p50 us':>9} {'p99 us':>9} {'req/s':>9}")
+    for name, timings in results.items():
+        mean = sum(timings) / len(timings)
+        print(
+            f"{name:<12} {mean * 1e6:>9.0f} {timings[len(timings) // 2] * 1e6:>9.0f} "
+            f"{timings[int(len(timings) * 0.99)] * 1e6:>9.0f} {1 / mean:>9.0f}"
+        )
+
+    full_mean = sum(results['full']) / len(results['full'])
+    lean_mean = sum(results['token-lean']) / len(results['token-lean'])
+    print(f"saved per request: {(full_mean - lean_mean) * 1e6:.0f} us ({(1 - lean_mean / full_mean) * 100:.1f}%)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,189 @@
+"""
+Mixed read/write benchmark of the SQLite database profiles from `config/settings.py`.
+
+Every profile runs in its own process against a fresh database file (migrated and seeded
+with menu items), worker threads emulate requests: reads list menu items and a user's orders,
+writes run a checkout transaction (stock decrement, popularity counters, order and order items).
+Connections are opened and closed around every request the same way Django request signals do,
+so `CONN_MAX_AGE` takes effect. Throughput, latency percentiles and "database is locked" errors
+are printed per profile.
+
+Usage:
+    python benchmarks/sqlite_profiles.py --concurrency 16 --duration 20 --write-ratio 0.2
+"""
+
+import argparse
+import datetime
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+PROFILES = ['development', 'production']
+MENU_ITEMS = 50
+USERS = 20
+
+
+def percentile(sorted_values: list, fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+
+def seed():
+    from django.contrib.auth.models import User
+    from api.models import Category, MenuItem
+
+    category = Category.objects.create(slug='main', title='Main')
+    MenuItem.objects.bulk_create(
+        MenuItem(title=f'Item {i}', price='9.99', featured=False, category=category, stock=10 ** 6)
+        for i in range(MENU_ITEMS)
+    )
+    User.objects.bulk_create(User(username=f'user{i}') for i in range(USERS))
+    return list(MenuItem.objects.values_list('id', flat=True)), list(User.objects.values_list('id', flat=True))
+
+
+def read_request(user_id: int) -> None:
+    from api.models import MenuItem, Order
+
+    list(MenuItem.objects.select_related('category').order_by('-popularity')[:20])
+    list(Order.objects.filter(user_id=user_id).order_by('-id')[:10])
+
+
+def write_request(user_id: int, menu_item_ids: list) -> None:
+    from django.db import transaction
+    from api.models import Order, OrderItem
+    from api.popularity import record_sales
+    from api.stock import decrement_stock
+
+    quantities = {menu_item_id: random.randint(1, 3) for menu_item_id in random.sample(menu_item_ids, 3)}
+    with transaction.atomic():
+        decrement_stock(quantities=quantities)
+        record_sales(quantities=quantities)
+        order = Order.objects.create(user_id=user_id, date=datetime.date.today(), total=10, status=False)
+        OrderItem.objects.bulk_create(
+            OrderItem(order=order, menuitem_id=menu_item_id, quantity=quantity, unit_price='9.99', price='9.99')
+            for menu_item_id, quantity in quantities.items()
+        )
+
+
+def run_worker(args: argparse.Namespace) -> None:
+    """Runs inside a subprocess with `DJANGO_DATABASE_PROFILE` and `DJANGO_DATABASE_NAME` set."""
+    sys.path.insert(0, str(BASE_DIR))
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+    import django
+    django.setup()
+
+    from django.core.management import call_command
+    from django.db import OperationalError, close_old_connections, connection
+
+    call_command('migrate', verbosity=0)
+    menu_item_ids, user_ids = seed()
+    connection.close()
+
+    lock = threading.Lock()
+    latencies = {'read': [], 'write': []}
+    errors = {'read': 0, 'write': 0}
+    connects = [0]
+    deadline = time.perf_counter() + args.duration
+
+    def worker():
+        while time.perf_counter() < deadline:
+            kind = 'write' if random.random() < args.write_ratio else 'read'
+            user_id = random.choice(user_ids)
+            started = time.perf_counter()
+            close_old_connections()
+            if connection.connection is None:
+                with lock:
+                    connects[0] += 1
+            try:
+                if kind == 'write':
+                    write_request(user_id, menu_item_ids)
+                else:
+                    read_request(user_id)
+                failed = False
+            except OperationalError:
+                failed = True
+            finally:
+                close_old_connections()
+            elapsed = time.perf_counter() - started
+            with lock:
+                if failed:
+                    errors[kind] += 1
+                else:
+                    latencies[kind].append(elapsed)
+
+    threads = [threading.Thread(target=worker) for _ in range(args.concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    result = {'connections': connects[0]}
+    for kind, values in latencies.items():
+        values.sort()
+        result[kind] = {
+            'ok': len(values),
+            'errors': errors[kind],
+            'per_second': len(values) / args.duration,
+            'p50_ms': percentile(values, 0.50) * 1000,
+            'p99_ms': percentile(values, 0.99) * 1000,
+        }
+    print(json.dumps(result))
+
+
+def run_profile(profile: str, args: argparse.Namespace) -> dict:
+    with tempfile.TemporaryDirectory() as directory:
+        env = {
+            **os.environ,
+            'DJANGO_DATABASE_PROFILE': profile,
+            'DJANGO_DATABASE_NAME': os.path.join(directory, 'bench.sqlite3'),
+        }
+        command = [
+            sys.executable, __file__, '--worker',
+            '--concurrency', str(args.concurrency), '--duration', str(args.duration), '--write-ratio', str(args.write_ratio),
+        ]
+        output = subprocess.run(command, env=env, check=True, capture_output=True, text=True).stdout
+        return json.loads(output.strip().splitlines()[-1])
+
+
+def print_report(results: dict) -> None:
+    print(f"{'profile':<12} {'kind':<6} {'ok/s':>9} {'errors':>7} {'p50 ms':>8} {'p99 ms':>8} {'connections':>12}")
+    for profile, result in results.items():
+        for kind in ('read', 'write'):
+            stats = result[kind]
+            print(
+                f"{profile:<12} {kind:<6} {stats['per_second']:>9.1f} {stats['errors']:>7} "
+                f"{stats['p50_ms']:>8.2f} {stats['p99_ms']:>8.2f} {result['connections']:>12}"
+            )
+
+
+def parse_args(argv: list) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--concurrency', type=int, default=16, help='number of worker threads')
+    parser.add_argument('--duration', type=float, default=20, help='seconds per profile')
+    parser.add_argument('--write-ratio', type=float, default=0.2, help='share of checkout requests')
+    parser.add_argument('--profile', action='append', choices=PROFILES, help='profiles to run, all by default')
+    parser.add_argument('--worker', action='store_true', help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+
+def main(argv: list = None) -> None:
+    args = parse_args(argv)
+    if args.worker:
+        run_worker(args)
+        return
+
+    results = {profile: run_profile(profile, args) for profile in args.profile or PROFILES}
+    print_report(results)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,218 @@
+"""
+Cache backend shared by all worker processes of a host, stored in a WAL-mode SQLite file.
+
+    CACHES = {'default': {'BACKEND': 'config.cache.SQLiteCache', 'LOCATION': '/path/to/cache.sqlite3'}}
+
+Every process (and thread) keeps its own connection to the file, SQLite locking makes
+`add`, `incr` and `set` atomic across processes: `add` is a single conditional upsert and
+`incr` a single `UPDATE ... RETURNING`, so they can back counters, throttling and locks.
+Integers are stored as SQLite integers for that, any other value is pickled.
+
+Expired entries are ignored on read and deleted when the cache is culled. Every
+`CULL_EVERY` writes the entry count is checked against `MAX_ENTRIES`, then the least
+recently used `1 / CULL_FREQUENCY` part is evicted. Access time is written back at most
+once per `ACCESS_RESOLUTION` seconds per entry, so reads of hot keys stay read-only.
+"""
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+
+class SQLiteCache(BaseCache):
+    pickle_protocol = pickle.HIGHEST_PROTOCOL
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self.location = str(location)
+        self.busy_timeout = int(options.get('BUSY_TIMEOUT', 5000))
+        self.access_resolution = float(options.get('ACCESS_RESOLUTION', 10))
+        self.cull_every = int(options.get('CULL_EVERY', 1000))
+        self._local = threading.local()
+        self._writes = 0
+
+    # Connection
+    def _connect(self) -> sqlite3.Connection:
+        directory = os.path.dirname(self.location)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        connection = sqlite3.connect(
+            self.location, timeout=self.busy_timeout / 1000, isolation_level=None, check_same_thread=False
+        )
+        connection.execute(f"PRAGMA busy_timeout = {self.busy_timeout}")
+        connection.execute("PRAGMA journal_mode = WAL")
+        connection.execute("PRAGMA synchronous = NORMAL")
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            "key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL, accessed REAL NOT NULL)"
+        )
+        connection.execute("CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed)")
+        connection.execute("CREATE INDEX IF NOT EXISTS cache_expires ON cache (expires)")
+        return connection
+
+    @property
+    def _connection(self) -> sqlite3.Connection:
+        # A forked worker must not share the parent's connection
+        if getattr(self._local, 'pid', None) != os.getpid():
+            self._local.connection = self._connect()
+            self._local.pid = os.getpid()
+        return self._local.connection
+
+    # Values
+    def _encode(self, value):
+        if type(value) is int and -2 ** 63 <= value < 2 ** 63:
+            return value
+        return pickle.dumps(value, self.pickle_protocol)
+
+    @staticmethod
+    def _decode(value):
+        if type(value) is int:
+            return value
+        return pickle.loads(value)
+
+    def _touch_accessed(self, keys: list, now: float) -> None:
+        placeholders = ', '.join('?' * len(keys))
+        self._connection.execute(
+            f"UPDATE cache SET accessed = ? WHERE key IN ({placeholders})", [now, *keys]
+        )
+
+    def _after_write(self) -> None:
+        self._writes += 1
+        if self._writes % self.cull_every == 0:
+            self._cull()
+
+    def _cull(self) -> None:
+        connection = self._connection
+        now = time.time()
+        connection.execute("DELETE FROM cache WHERE expires IS NOT NULL AND expires <= ?", [now])
+        (count,) = connection.execute("SELECT COUNT(*) FROM cache").fetchone()
+        if count < self._max_entries:
+            return
+
+        evict = count // self._cull_frequency if self._cull_frequency else count
+        connection.execute(
+            "DELETE FROM cache WHERE key IN (SELECT key FROM cache ORDER BY accessed LIMIT ?)", [max(evict, 1)]
+        )
+
+    # Cache API
+    def get(self, key, default=None, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        now = time.time()
+        row = self._connection.execute(
+            "SELECT value, accessed FROM cache WHERE key = ? AND (expires IS NULL OR expires > ?)", [key, now]
+        ).fetchone()
+        if row is None:
+            return default
+
+        value, accessed = row
+        if now - accessed > self.access_resolution:
+            self._touch_accessed([key], now)
+        return self._decode(value)
+
+    def get_many(self, keys, version=None):
+        key_map = {self.make_and_validate_key(key, version=version): key for key in keys}
+        if not key_map:
+            return {}
+
+        now = time.time()
+        placeholders = ', '.join('?' * len(key_map))
+        rows = self._connection.execute(
+            f"SELECT key, value, accessed FROM cache WHERE key IN ({placeholders}) AND (expires IS NULL OR expires > ?)",
+            [*key_map, now]
+        ).fetchall()
+
+        stale_keys = [key for key, _, accessed in rows if now - accessed > self.access_resolution]
+        if stale_keys:
+            self._touch_accessed(stale_keys, now)
+        return {key_map[key]: self._decode(value) for key, value, _ in rows}
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        self._connection.execute(
+            "INSERT OR REPLACE INTO cache (key, value, expires, accessed) VALUES (?, ?, ?, ?)",
+            [key, self._encode(value), self.get_backend_timeout(timeout), time.time()]
+        )
+        self._after_write()
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        expires = self.get_backend_timeout(timeout)
+        now = time.time()
+        rows = [
+            (self.make_and_validate_key(key, version=version), self._encode(value), expires, now)
+            for key, value in data.items()
+        ]
+        connection = self._connection
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            connection.executemany("INSERT OR REPLACE INTO cache (key, value, expires, accessed) VALUES (?, ?, ?, ?)", rows)
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        self._after_write()
+        return []
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        now = time.time()
+        # Inserts a new key or replaces an expired one in one statement
+        cursor = self._connection.execute(
+            "INSERT INTO cache (key, value, expires, accessed) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT (key) DO UPDATE SET value = excluded.value, expires = excluded.expires, accessed = excluded.accessed "
+            "WHERE cache.expires IS NOT NULL AND cache.expires <= ?",
+            [key, self._encode(value), self.get_backend_timeout(timeout), now, now]
+        )
+        added = cursor.rowcount == 1
+        if added:
+            self._after_write()
+        return added
+
+    def incr(self, key, delta=1, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        row = self._connection.execute(
+            "UPDATE cache SET value = value + ? "
+            "WHERE key = ? AND typeof(value) = 'integer' AND (expires IS NULL OR expires > ?) RETURNING value",
+            [delta, key, time.time()]
+        ).fetchone()
+        if row is None:
+            raise ValueError("Key '%s' not found" % key)
+        return row[0]
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        now = time.time()
+        cursor = self._connection.execute(
+            "UPDATE cache SET expires = ?, accessed = ? WHERE key = ? AND (expires IS NULL OR expires > ?)",
+            [self.get_backend_timeout(timeout), now, key, now]
+        )
+        return cursor.rowcount == 1
+
+    def has_key(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        row = self._connection.execute(
+            "SELECT 1 FROM cache WHERE key = ? AND (expires IS NULL OR expires > ?)", [key, time.time()]
+        ).fetchone()
+        return row is not None
+
+    def delete(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        cursor = self._connection.execute("DELETE FROM cache WHERE key = ?", [key])
+        return cursor.rowcount == 1
+
+    def delete_many(self, keys, version=None):
+        keys = [self.make_and_validate_key(key, version=version) for key in keys]
+        if keys:
+            placeholders = ', '.join('?' * len(keys))
+            self._connection.execute(f"DELETE FROM cache WHERE key IN ({placeholders})", keys)
+
+    def clear(self):
+        self._connection.execute("DELETE FROM cache")
+
+    def close(self, **kwargs):
+        # Called at the end of every request, the connection is kept for the next one
+        pass
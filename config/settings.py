@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.0/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -45,16 +46,21 @@ INSTALLED_APPS = [
     'api.apps.ApiConfig',
 ]
 
+# Session, CSRF, auth and messages middleware are skipped for `TOKEN_API_PATH_PREFIX` requests
+# with `Authorization: Token` header, see api.middleware.TokenAPIBypassMixin
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
-    'django.contrib.sessions.middleware.SessionMiddleware',
+    'api.middleware.CompressionMiddleware',
+    'api.middleware.TokenAPISessionMiddleware',
     'django.middleware.common.CommonMiddleware',
-    'django.middleware.csrf.CsrfViewMiddleware',
-    'django.contrib.auth.middleware.AuthenticationMiddleware',
-    'django.contrib.messages.middleware.MessageMiddleware',
+    'api.middleware.TokenAPICsrfViewMiddleware',
+    'api.middleware.TokenAPIAuthenticationMiddleware',
+    'api.middleware.TokenAPIMessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+TOKEN_API_PATH_PREFIX = '/api/v1/'
+
 ROOT_URLCONF = 'config.urls'
 
 TEMPLATES = [
@@ -82,7 +88,48 @@ WSGI_APPLICATION = 'config.wsgi.application'
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'NAME': os.environ.get('DJANGO_DATABASE_NAME', BASE_DIR / 'db.sqlite3'),
+    }
+}
+
+# Production SQLite profile `DJANGO_DATABASE_PROFILE=production`
+# WAL lets readers run alongside a writer, writers wait for each other up to busy_timeout
+# instead of failing with "database is locked", connections are reused between requests.
+DATABASE_PROFILE = os.environ.get('DJANGO_DATABASE_PROFILE', 'development')
+
+if DATABASE_PROFILE == 'production':
+    DATABASES['default'].update({
+        'ENGINE': 'config.sqlite_backend',
+        'CONN_MAX_AGE': int(os.environ.get('DJANGO_CONN_MAX_AGE', 600)),
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'timeout': 20,  # seconds, sqlite3 module busy handler
+            'transaction_mode': 'IMMEDIATE',
+            'pragmas': {
+                'journal_mode': 'WAL',
+                'synchronous': 'NORMAL',  # WAL is still durable against application crashes
+                'busy_timeout': 20000,
+                'cache_size': -64000,  # KiB per connection
+                'mmap_size': 268435456,  # 256 MiB
+                'temp_store': 'MEMORY',
+            },
+        },
+    })
+
+
+# Cache shared by all worker processes of the host, LocMemCache would be per process
+# https://docs.djangoproject.com/en/5.0/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': 'config.cache.SQLiteCache',
+        'LOCATION': os.environ.get('DJANGO_CACHE_LOCATION', BASE_DIR / 'var' / 'cache.sqlite3'),
+        'OPTIONS': {
+            'MAX_ENTRIES': 100000,
+            'CULL_FREQUENCY': 10,  # evict least recently used 1/10 when full
+            'CULL_EVERY': 1000,  # writes between entry count checks
+            'ACCESS_RESOLUTION': 10,  # seconds, LRU access time precision
+        },
     }
 }
 
@@ -138,14 +185,142 @@ REST_FRAMEWORK = {
         'rest_framework.authentication.SessionAuthentication'
     ],
     'DEFAULT_THROTTLE_CLASSES': [
-        'rest_framework.throttling.UserRateThrottle'
+        'api.throttling.BatchAwareUserRateThrottle'
     ],
     'DEFAULT_THROTTLE_RATES': {
         'user': '20/minute',
         'delivery': '30/minute',
         'manager': '50/minute',
     },
+    # orjson renderer and parser, swap back to rest_framework.renderers.JSONRenderer and
+    # rest_framework.parsers.JSONParser for stdlib json
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'api.renderers.ORJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
+    # Decimal and date objects are encoded by the renderer, prices stay fixed-point strings
+    'COERCE_DECIMAL_TO_STRING': False,
+    'DATE_FORMAT': None,
+}
+
+# Catalog snapshot served for unfiltered menu-items/ and category/ lists, `manage.py build_catalog_snapshot --loop`
+CATALOG_SNAPSHOT_PATH = os.environ.get('DJANGO_CATALOG_SNAPSHOT_PATH', BASE_DIR / 'var' / 'catalog.snapshot')
+CATALOG_SNAPSHOT_MAX_AGE = 60  # seconds, an older snapshot is ignored and lists are read from the database
+CATALOG_SNAPSHOT_REFRESH = 20  # seconds, rebuilt at least this often, popularity counters are not catalog changes
+CATALOG_SNAPSHOT_INTERVAL = 1  # seconds between checks of the catalog change feed
+
+# Admin changelists of orders, order items and carts (api.admin.EstimatedCountPaginator)
+ADMIN_EXACT_COUNT_LIMIT = 10000  # rows counted at most, bigger unfiltered tables report an estimate
+
+# Background jobs `manage.py runworker` (api.jobs), job functions are in api.tasks
+JOBS_WORKER_CONCURRENCY = 2  # threads per worker process
+JOBS_POLL_INTERVAL = 1  # seconds between polls of the queue
+JOBS_LEASE = 60  # seconds, a job of a worker that stopped extending its lease is claimed again
+JOBS_MAX_ATTEMPTS = 5
+JOBS_RETRY_BACKOFF = 10  # seconds before the first retry, doubles every attempt
+JOBS_RETRY_BACKOFF_MAX = 3600
+JOBS_RETENTION_DAYS = 7  # done and failed jobs are deleted by the `purge_jobs` job
+# Periodic jobs, `minute hour day month weekday` in TIME_ZONE, every slot runs once across all workers
+JOBS_SCHEDULE = {
+    'decay_popularity': {'job': 'decay_popularity', 'cron': '5 0 * * *'},
+    'compact_catalog_changes': {'job': 'compact_catalog_changes', 'cron': '30 3 * * *'},
+    'build_recommendations': {'job': 'build_recommendations', 'cron': '0 4 * * *'},
+    'delete_expired_tokens': {'job': 'delete_expired_tokens', 'cron': '15 4 * * *'},
+    'evict_expired_carts': {'job': 'evict_expired_carts', 'cron': '20 * * * *'},
+    'purge_jobs': {'job': 'purge_jobs', 'cron': '45 4 * * *'},
+    'purge_webhook_events': {'job': 'purge_webhook_events', 'cron': '50 4 * * *'},
+    'purge_order_event_messages': {'job': 'purge_order_event_messages', 'cron': '*/10 * * * *'},
 }
+AUTH_TOKEN_MAX_AGE_DAYS = None  # days, tokens are deleted by the `delete_expired_tokens` job, None keeps them
+
+# Audit log of manager actions (api.audit), GET /api/v1/audit/
+AUDIT_BUFFER_SIZE = 100  # buffered events that trigger a flush
+AUDIT_FLUSH_INTERVAL = 2  # seconds between flushes of a partly filled buffer
+AUDIT_MAX_BUFFERED = 10000  # events kept while the database is unavailable, the oldest are dropped
+
+# Order webhooks (api.webhooks), endpoints are WebhookEndpoint rows, `manage.py dispatch_webhooks --loop`
+WEBHOOK_BATCH_SIZE = 100  # events per POST to an endpoint
+WEBHOOK_TIMEOUT = 5  # seconds per request
+WEBHOOK_RETRY_BACKOFF = 5  # seconds before the first retry of a batch, doubles on every failure
+WEBHOOK_RETRY_BACKOFF_MAX = 600
+WEBHOOK_COMMIT_GRACE = 1  # seconds an outbox row waits, transactions with lower ids can commit meanwhile
+WEBHOOK_DISPATCH_INTERVAL = 1  # seconds between dispatch cycles
+WEBHOOK_DISPATCH_WORKERS = 8  # endpoints served at once
+WEBHOOK_POOL_SIZE = 8  # keep-alive connections per endpoint host
+WEBHOOK_EVENTS_RETENTION_DAYS = 7  # delivered events are deleted by the `purge_webhook_events` job
+
+# Single-flight coalescing of identical menu-items/ and category/ list requests (api.singleflight)
+SINGLE_FLIGHT_RESULT_TTL = 5  # seconds a computed list is shared with requests of other workers
+SINGLE_FLIGHT_LOCK_TIMEOUT = 10  # seconds before a lock of a crashed or stuck leader expires
+SINGLE_FLIGHT_WAIT_TIMEOUT = 3  # seconds a waiting request waits past SINGLE_FLIGHT_LOCK_TIMEOUT before computing the list itself
+SINGLE_FLIGHT_POLL_INTERVAL = 0.01  # seconds, first poll interval for the result of another worker, doubles up to 0.25
+
+# Catalog delta-sync /api/v1/catalog/changes/?since=<seq>
+CATALOG_SYNC_PAGE_SIZE = 500
+CATALOG_SYNC_MAX_PAGE_SIZE = 5000
+CATALOG_TOMBSTONE_RETENTION_DAYS = 30  # `manage.py compact_catalog_changes`
+
+# Menu items popularity, `manage.py decay_popularity` should run daily
+MENU_POPULARITY_WINDOW_DAYS = 7  # sliding window of `popularity_7d`
+MENU_TOP_SELLERS_SIZE = 50  # menu items kept in the in-process top sellers heap, max `?limit=`
+MENU_TOP_SELLERS_TTL = 60  # seconds before the top sellers heap is reloaded from the database
+
+# "Frequently ordered together" recommendations, `manage.py build_recommendations` needs numpy and scipy
+RECOMMENDATIONS_MATRIX_PATH = BASE_DIR / 'var' / 'cooccurrence.npz'  # co-occurrence matrix and last folded order id
+RECOMMENDATIONS_TOP_K = 10  # related menu items stored per menu item
+RECOMMENDATIONS_CHUNK_SIZE = 1000000  # order items folded into the matrix at once
+
+# Order events stream /api/v1/orders/events (Server-Sent Events, run with the ASGI app)
+ORDER_EVENTS_HEARTBEAT = 15  # seconds
+ORDER_EVENTS_RETRY_MS = 3000
+ORDER_EVENTS_QUEUE_SIZE = 100  # per connection, events for a client that does not read are dropped
+# Cross-process fan-out, subclass api.events.BaseFanout to deliver events between worker processes.
+# DatabaseFanout also delivers events of `manage.py dispatch_orders`, BaseFanout keeps them in the publishing process
+ORDER_EVENTS_FANOUT = 'api.events.DatabaseFanout'
+ORDER_EVENTS_FANOUT_POLL_INTERVAL = 0.5  # seconds
+ORDER_EVENTS_FANOUT_BATCH_SIZE = 1000  # messages per poll, a message is the events of one channel published together
+ORDER_EVENTS_FANOUT_RETENTION = 300  # seconds, older messages are deleted by the `purge_order_event_messages` job
+ORDER_EVENTS_FANOUT_HEARTBEAT_INTERVAL = 10  # seconds, processes with SSE subscribers announce themselves to publishers
+ORDER_EVENTS_FANOUT_LISTENER_TIMEOUT = 30  # seconds without a heartbeat after which publishers stop writing for a process
+
+# Bulk order updates PATCH/PUT /api/v1/orders/
+ORDERS_BULK_MAX_ITEMS = 500
+ORDERS_BULK_UPDATE_CHUNK = 200  # orders per conditional `UPDATE ... WHERE id IN (...) AND version=?`
+
+# Order summary columns `Order.item_count` and `items_preview`
+ORDER_ITEMS_PREVIEW_LENGTH = 255  # max_length of `items_preview`
+ORDER_SUMMARY_BACKFILL_BATCH_SIZE = 1000  # orders per transaction of `manage.py backfill_order_summaries`
+
+# Abandoned carts (api.carts), expired lines are hidden at once and deleted by the `evict_expired_carts` job
+CART_TTL_DAYS = 7  # days since a cart line was last added or changed
+CART_EVICTION_BATCH_SIZE = 1000  # cart lines per DELETE
+CART_EVICTION_PAUSE = 0.05  # seconds between batches
+
+# Orders purge POST /api/v1/orders/purge and `manage.py purge_orders`
+ORDERS_PURGE_BATCH_SIZE = 500  # orders per DELETE transaction
+ORDERS_PURGE_PAUSE = 0.05  # seconds between batches to let other writers take the lock
+ORDERS_PURGE_MAX_BATCHES_PER_REQUEST = 20
+
+# Delivery dispatcher `manage.py dispatch_orders --loop`
+DELIVERY_DISPATCH_BATCH_SIZE = 10000  # orders per cycle
+DELIVERY_DISPATCH_INTERVAL = 5  # seconds between cycles
+DELIVERY_DISPATCH_REFRESH_EVERY = 12  # cycles between full reloads of couriers loads
+DELIVERY_DISPATCH_UPDATE_CHUNK = 500  # orders per conditional UPDATE statement
+
+# Batch requests endpoint /api/v1/batch
+BATCH_MAX_REQUESTS = 20
+BATCH_MAX_WORKERS = 4  # threads per worker process for concurrent read sub-requests
+
+# Response compression (api.middleware.CompressionMiddleware)
+# brotli is used when `brotli` package is installed, otherwise gzip
+RESPONSE_COMPRESSION_MIN_SIZE = 1024  # bytes
+RESPONSE_COMPRESSION_GZIP_LEVEL = 6
+RESPONSE_COMPRESSION_BROTLI_QUALITY = 5
 
 DJOSER = {
     "USER_ID_FIELD": "username",
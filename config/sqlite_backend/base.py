@@ -0,0 +1,30 @@
+"""
+SQLite backend for concurrent production load, `ENGINE: 'config.sqlite_backend'`.
+
+Django 5.0 sqlite3 backend has neither `init_command` nor `transaction_mode` options, this one adds:
+
+- `OPTIONS['pragmas']` executed on every new connection, e.g. {'journal_mode': 'WAL', 'busy_timeout': 5000}
+- `OPTIONS['transaction_mode']` used by `transaction.atomic()`, 'IMMEDIATE' takes the write lock
+  when the transaction starts. With a deferred BEGIN two transactions that read and then write
+  both hold read locks and one of them fails with "database is locked" without waiting for busy_timeout.
+"""
+from django.db.backends.sqlite3 import base
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def get_connection_params(self):
+        kwargs = super().get_connection_params()
+        self.pragmas = kwargs.pop('pragmas', {})
+        self.transaction_mode = kwargs.pop('transaction_mode', None)
+        return kwargs
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        for name, value in self.pragmas.items():
+            conn.execute(f"PRAGMA {name} = {value}")
+        return conn
+
+    def _start_transaction_under_autocommit(self):
+        if self.transaction_mode is None:
+            return super()._start_transaction_under_autocommit()
+        self.cursor().execute(f"BEGIN {self.transaction_mode}")